@@ -0,0 +1,138 @@
+"""
+Checkpoints for long per-trace mining runs.
+The file is JSON Lines: a header with the mining parameters, then one line per
+mined trace with its pid and the episodes found in it (activities and objects
+per step). Lines are only appended, so writing a checkpoint costs no more than
+the new traces, and a torn last line after a crash is simply ignored on resume.
+"""
+
+import json
+import os
+import time
+
+from algorithms.emma.phase3_episode_mining import EpisodeAggregator, episode_structure
+
+
+class MiningCheckpoint:
+    """
+    Appends the per-trace results of a mining run to path and replays them into
+    an aggregator on resume. Buffered lines are flushed to disk every
+    flush_every traces or flush_seconds seconds, whichever comes first.
+    """
+
+    def __init__(
+        self, path, params=None, resume=True, flush_every=1000, flush_seconds=30
+    ):
+        self.path = path
+        self.params = {name: repr(value) for name, value in (params or {}).items()}
+        self.resume = resume
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.processed = set()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._file = None
+
+    def open(self, aggregator=None):
+        """
+        Replays an existing checkpoint into aggregator (if resuming) and opens the
+        file for appending. Returns the aggregator.
+        """
+        aggregator = aggregator if aggregator is not None else EpisodeAggregator()
+        if self.resume and os.path.exists(self.path):
+            valid_size = self._replay(aggregator)
+            self._file = open(self.path, "r+b")
+            # Drop a torn last line, so new lines start on a clean boundary
+            self._file.truncate(valid_size)
+            self._file.seek(valid_size)
+        else:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "wb")
+            self._file.write(self._line({"params": self.params}))
+            self._file.flush()
+        return aggregator
+
+    @staticmethod
+    def _line(entry):
+        return (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+
+    def _replay(self, aggregator):
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            header = json.loads(f.readline())
+            if header.get("params") != self.params:
+                raise ValueError(
+                    f"The checkpoint {self.path} was written with other parameters: "
+                    f"{header.get('params')}"
+                )
+            valid_size = f.tell()
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                episodes = [
+                    {
+                        "Episode": [
+                            {"activity": activity, "objects": objects}
+                            for activity, objects in steps
+                        ]
+                    }
+                    for steps in entry["e"]
+                ]
+                aggregator.add_trace(entry["p"], episodes)
+                self.processed.add(entry["p"])
+                valid_size = f.tell()
+        return valid_size
+
+    def record(self, pid, episodes):
+        # Episodes with the same structure are merged, like in EpisodeAggregator
+        merged = {}
+        for ep in episodes:
+            objects = merged.setdefault(
+                episode_structure(ep), [set() for _ in ep["Episode"]]
+            )
+            for step_objects, step in zip(objects, ep["Episode"]):
+                step_objects.update(step["objects"])
+        steps = [
+            [
+                [list(activity), sorted(objs)]
+                for activity, objs in zip(structure, objects)
+            ]
+            for structure, objects in merged.items()
+        ]
+        self._buffer.append(self._line({"p": pid, "e": steps}))
+        self.processed.add(pid)
+        if (
+            len(self._buffer) >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_seconds
+        ):
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.writelines(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Closes and deletes the checkpoint, e.g. once the run has finished."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,193 @@
+"""
+Pre-flight cost estimation for per-trace episode mining.
+Profiles the traces without mining them (trace lengths, activity frequencies and
+pair co-occurrences within the window) and estimates how many episode
+occurrences the mining enumerates, how many distinct episodes it keeps and how
+much memory that needs. The episode length can then be capped to fit a budget.
+"""
+
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+from algorithms.emma.phase3_episode_mining import window_to_seconds
+
+MEMORY_BUDGET_BYTES = int(os.environ.get("EMMA_MEMORY_BUDGET_MB", 2048)) * 1024**2
+
+# Rough sizes of a mined occurrence (result dict of one trace) and of an aggregated
+# episode step (structure tuple, object set and pid set entry)
+BYTES_PER_OCCURRENCE = 1_000
+BYTES_PER_EPISODE_STEP = 500
+
+# Above this many (event, later event) pairs a trace counts all ordered activity
+# pairs as co-occurring instead of scanning the windows
+PAIR_SCAN_LIMIT = 1_000_000
+
+
+@dataclass
+class LogProfile:
+    """
+    Window dependent profile of the traces:
+        - trace_lengths: number of events per trace
+        - activity_frequencies: number of traces containing each activity
+        - pair_counts: number of traces in which b follows a within the window
+        - reachable: later timestamps within the window, one entry per timestamp
+          of every trace
+        - trace_reachable: the same per trace, to find the most expensive trace
+    """
+
+    trace_lengths: np.ndarray
+    activity_frequencies: Counter
+    pair_counts: Counter
+    reachable: np.ndarray
+    trace_reachable: list
+
+
+@dataclass
+class CostEstimate:
+    occurrences: float
+    peak_trace_occurrences: float
+    candidate_episodes: float
+    frequent_activities: int
+    frequent_pairs: int
+    peak_memory_bytes: float
+
+    def exceeds(self, memory_budget=MEMORY_BUDGET_BYTES):
+        return self.peak_memory_bytes > memory_budget
+
+
+def _reachable_per_timestamp(times, maxwin):
+    """Number of later distinct timestamps inside the window of every timestamp."""
+    window_seconds = window_to_seconds(maxwin)
+    positions = np.arange(len(times))
+    if window_seconds is None:
+        last = np.minimum(positions + maxwin - 1, len(times) - 1)
+    else:
+        last = np.searchsorted(times, times + window_seconds, side="right") - 1
+    return last - positions
+
+
+def _trace_pairs(times, activities, maxwin):
+    """Ordered activity pairs (a, b) of a trace where b follows a within the window."""
+    window_seconds = window_to_seconds(maxwin)
+    unique_times, rank = np.unique(times, return_inverse=True)
+    if window_seconds is None:
+        ends = rank + maxwin - 1
+    else:
+        ends = np.searchsorted(unique_times, times + window_seconds, side="right") - 1
+    # Events are sorted by time, so the events of timestamp rank r start at first[r]
+    first = np.searchsorted(rank, np.arange(len(unique_times) + 1), side="left")
+    starts = first[rank + 1]
+    stops = first[np.minimum(ends, len(unique_times) - 1) + 1]
+
+    if int(np.sum(stops - starts)) > PAIR_SCAN_LIMIT:
+        distinct = set(activities)
+        return {(a, b) for a in distinct for b in distinct}
+
+    pairs = set()
+    for activity, start, stop in zip(activities, starts.tolist(), stops.tolist()):
+        pairs.update((activity, follower) for follower in set(activities[start:stop]))
+    return pairs
+
+
+def profile_traces(pid_traces, maxwin):
+    """Profiles (pid, trace) pairs as yielded by group_by_pid or the batch iterator."""
+    trace_lengths = []
+    activity_frequencies = Counter()
+    pair_counts = Counter()
+    trace_reachable = []
+
+    for _, trace in pid_traces:
+        trace = sorted(trace, key=lambda event: event[0])
+        times = np.fromiter((event[0] for event in trace), dtype=np.int64)
+        activities = [event[1] for event in trace]
+
+        trace_lengths.append(len(trace))
+        activity_frequencies.update(set(activities))
+        pair_counts.update(_trace_pairs(times, activities, maxwin))
+        trace_reachable.append(_reachable_per_timestamp(np.unique(times), maxwin))
+
+    return LogProfile(
+        trace_lengths=np.asarray(trace_lengths, dtype=np.int64),
+        activity_frequencies=activity_frequencies,
+        pair_counts=pair_counts,
+        reachable=(
+            np.concatenate(trace_reachable)
+            if trace_reachable
+            else np.empty(0, dtype=np.int64)
+        ),
+        trace_reachable=trace_reachable,
+    )
+
+
+def _occurrences(reachable, max_length):
+    """
+    Serial episodes starting at a timestamp with m reachable timestamps: one per
+    subset of at most max_length - 1 of them, i.e. 2^m without a length cap.
+    """
+    values, counts = np.unique(reachable, return_counts=True)
+    total = 0.0
+    for m, count in zip(values.tolist(), counts.tolist()):
+        if max_length is None or max_length > m:
+            per_start = 2.0 ** min(m, 1023)
+        else:
+            per_start = float(sum(math.comb(m, k) for k in range(max_length)))
+        total += count * per_start
+    return total
+
+
+def estimate_cost(profile, minsup, max_length=None):
+    """Estimates the mining cost of a profiled log for minsup and an optional cap."""
+    if len(profile.trace_lengths) == 0:
+        return CostEstimate(0.0, 0.0, 0.0, 0, 0, 0.0)
+
+    occurrences = _occurrences(profile.reachable, max_length)
+    peak_trace_occurrences = max(
+        _occurrences(reachable, max_length) for reachable in profile.trace_reachable
+    )
+
+    # Distinct episodes grow level by level with the average number of followers
+    # of an activity, and never beyond the enumerated occurrences
+    n_activities = len(profile.activity_frequencies)
+    branching = len(profile.pair_counts) / n_activities
+    longest = int(profile.reachable.max()) + 1
+    levels = longest if max_length is None else min(max_length, longest)
+    by_level, level_size = 0.0, float(n_activities)
+    for _ in range(levels):
+        by_level += level_size
+        if by_level >= occurrences:
+            break
+        level_size *= branching
+    candidate_episodes = min(occurrences, by_level)
+
+    average_length = min(levels, 1 + branching)
+    peak_memory_bytes = (
+        peak_trace_occurrences * BYTES_PER_OCCURRENCE
+        + candidate_episodes * average_length * BYTES_PER_EPISODE_STEP
+    )
+    return CostEstimate(
+        occurrences=occurrences,
+        peak_trace_occurrences=peak_trace_occurrences,
+        candidate_episodes=candidate_episodes,
+        frequent_activities=sum(
+            count >= minsup for count in profile.activity_frequencies.values()
+        ),
+        frequent_pairs=sum(count >= minsup for count in profile.pair_counts.values()),
+        peak_memory_bytes=peak_memory_bytes,
+    )
+
+
+def episode_length_cap(profile, minsup, memory_budget=MEMORY_BUDGET_BYTES):
+    """
+    Largest maximum episode length whose estimate fits the memory budget, or None
+    if mining without a cap fits. Never returns less than 1.
+    """
+    if not estimate_cost(profile, minsup).exceeds(memory_budget):
+        return None
+    max_length = 1
+    while not estimate_cost(profile, minsup, max_length + 1).exceeds(memory_budget):
+        max_length += 1
+    return max_length
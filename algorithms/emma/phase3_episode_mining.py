@@ -4,15 +4,60 @@ Performs mining of frequent serial episodes using projected bound lists.
 Uses the encoded database and bound lists from Phase 2.
 """
 
+import math
+import re
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
 from algorithms.emma.phase2_encoding import (
     encode_itemsets_from_table,
     extract_boundlists_from_indexDB,
 )
 from prototypes.draft.functions import normalize_timestamps
 
+UNITLESS_NUMBER_REGEX_PATTERN = re.compile(r"^\s*[+-]?(\d+\.?\d*|\.\d+)\s*$")
+
+
+def window_to_seconds(maxwin):
+    """
+    Interprets maxwin either as a number of distinct timestamps (int) or as a duration
+    such as "2 days" (str, pd.Timedelta, datetime.timedelta).
+
+    Returns:
+        int | None: The window length in seconds, or None if maxwin counts timestamps.
+
+    Raises:
+        ValueError: If maxwin is a string without a unit (pandas would read "2" as
+            nanoseconds), a float, or a duration shorter than one second.
+    """
+    if isinstance(maxwin, (int, np.integer)):
+        return None
+    if isinstance(maxwin, (float, np.floating)):
+        raise ValueError(f"Window {maxwin!r} needs a unit, e.g. '2 days'")
+    if isinstance(maxwin, str) and UNITLESS_NUMBER_REGEX_PATTERN.match(maxwin):
+        raise ValueError(f"Window {maxwin!r} needs a unit, e.g. '{maxwin} days'")
+    seconds = int(pd.Timedelta(maxwin).total_seconds())
+    if seconds <= 0:
+        raise ValueError(f"Window {maxwin!r} must be at least one second")
+    return seconds
+
+
+def build_time_index(flat_data):
+    """Sorted int64 array of the distinct epoch timestamps of a trace."""
+    return np.unique(
+        np.fromiter((t for t, *_ in flat_data), dtype=np.int64, count=len(flat_data))
+    )
+
+
+def compute_projected_boundlist(boundlist, maxwin, max_time, times=None):
+    if times is not None:
+        return compute_projected_boundlist_by_time(boundlist, maxwin, times)
 
-def compute_projected_boundlist(boundlist, maxwin, max_time):
     projected = []
     for ts, te in boundlist:
         ts_proj = te + 1
@@ -22,7 +67,27 @@ def compute_projected_boundlist(boundlist, maxwin, max_time):
     return projected
 
 
-def get_local_frequent_ids(pbl, encoded_db, minsup):
+def compute_projected_boundlist_by_time(boundlist, maxwin, times):
+    """
+    Real-time variant of compute_projected_boundlist: bounds are epoch seconds and
+    the window reaches up to maxwin seconds after the episode start. Window ends are
+    looked up by binary search in the sorted timestamp index of the trace.
+    """
+    if not boundlist:
+        return []
+    starts = np.fromiter((ts for ts, _ in boundlist), dtype=np.int64)
+    ends = np.fromiter((te for _, te in boundlist), dtype=np.int64)
+    first = np.searchsorted(times, ends, side="right")
+    last = np.searchsorted(times, starts + maxwin, side="right") - 1
+
+    projected = []
+    for lo, hi in zip(first.tolist(), last.tolist()):
+        if lo <= hi:
+            projected.append((int(times[lo]), int(times[hi])))
+    return projected
+
+
+def get_local_frequent_ids(pbl, encoded_db, minsup, times=None):
     """
     Get frequent IDs appearing within the given projected bound list (1-based indexing) in the encoded database.
 
@@ -36,6 +101,16 @@ def get_local_frequent_ids(pbl, encoded_db, minsup):
     """
     count_dict = defaultdict(int)
 
+    if times is not None:
+        # Only visit the timestamps that actually occur inside each bound
+        for start, end in pbl:
+            lo = np.searchsorted(times, start, side="left")
+            hi = np.searchsorted(times, end, side="right")
+            for t in times[lo:hi].tolist():
+                for item_id in encoded_db.get(t - 1, ()):
+                    count_dict[item_id] += 1
+        return [item_id for item_id, count in count_dict.items() if count >= minsup]
+
     for start, end in pbl:
         for i in range(start, end + 1):
             idx = i - 1  # adjust for 1-based indexing
@@ -46,10 +121,11 @@ def get_local_frequent_ids(pbl, encoded_db, minsup):
     return [item_id for item_id, count in count_dict.items() if count >= minsup]
 
 
-def temporal_join(episode_boundlist, f_boundlist, maxwin):
+def temporal_join(episode_boundlist, f_boundlist, maxwin, times=None):
     new_boundlist = []
     for ts_i, te_i in episode_boundlist:
-        window_end = ts_i + maxwin - 1
+        # A real-time window includes everything up to maxwin seconds after the start
+        window_end = ts_i + maxwin if times is not None else ts_i + maxwin - 1
         for ts_f, _ in f_boundlist:
             if te_i < ts_f <= window_end:
                 new_boundlist.append((ts_i, ts_f))
@@ -57,15 +133,26 @@ def temporal_join(episode_boundlist, f_boundlist, maxwin):
 
 
 def emmajoin(
-    episode, boundlist, maxwin, max_time, encoded_db, minsup, itemset_table, results
+    episode,
+    boundlist,
+    maxwin,
+    max_time,
+    encoded_db,
+    minsup,
+    itemset_table,
+    results,
+    times=None,
+    max_length=None,
 ):
-    pbl = compute_projected_boundlist(boundlist, maxwin, max_time)
-    LFP = get_local_frequent_ids(pbl, encoded_db, minsup)
+    if max_length is not None and len(episode) >= max_length:
+        return
+    pbl = compute_projected_boundlist(boundlist, maxwin, max_time, times)
+    LFP = get_local_frequent_ids(pbl, encoded_db, minsup, times)
 
     for eid in LFP:
         item = next(item for item in itemset_table if item["ID"] == eid)
-        tempBoundlist = temporal_join(boundlist, item["Boundlist"], maxwin)
-        temp_pbl = compute_projected_boundlist(tempBoundlist, maxwin, max_time)
+        tempBoundlist = temporal_join(boundlist, item["Boundlist"], maxwin, times)
+        temp_pbl = compute_projected_boundlist(tempBoundlist, maxwin, max_time, times)
         support = len(temp_pbl)
         new_episode = episode + (eid,)
         episode_structured = [
@@ -94,20 +181,32 @@ def emmajoin(
                 minsup,
                 itemset_table,
                 results,
+                times,
+                max_length,
             )
 
 
-def run_emma(flat_data, minsup, maxwin):
+def build_emma_index(flat_data, minsup):
+    """Phase 1 and 2: frequent itemsets with their bound lists and the encoded db."""
     itemset_table = extract_boundlists_from_indexDB(flat_data, minsup)
     encoded_db = encode_itemsets_from_table(itemset_table)
+    return itemset_table, encoded_db
+
+
+def mine_episodes(
+    itemset_table, encoded_db, minsup, maxwin, times=None, max_length=None
+):
+    """
+    Phase 3 on a prebuilt index, which can be reused for several windows.
+    Episodes are extended up to max_length steps if given.
+    """
     max_time = len(encoded_db)
 
     results = []
-
     for row in itemset_table:
         fid = row["ID"]
         boundlist = row["Boundlist"]
-        pbl = compute_projected_boundlist(boundlist, maxwin, max_time)
+        pbl = compute_projected_boundlist(boundlist, maxwin, max_time, times)
         support = len(pbl)
 
         if support >= minsup:
@@ -135,10 +234,22 @@ def run_emma(flat_data, minsup, maxwin):
                 minsup,
                 itemset_table,
                 results,
+                times,
+                max_length,
             )
     return results
 
 
+def run_emma(flat_data, minsup, maxwin, times=None, max_length=None):
+    """
+    Mines serial episodes from flat_data. If times (sorted epoch seconds, see
+    build_time_index) is given, the timestamps of flat_data are epoch seconds and
+    maxwin is a window length in seconds instead of a number of distinct timestamps.
+    """
+    itemset_table, encoded_db = build_emma_index(flat_data, minsup)
+    return mine_episodes(itemset_table, encoded_db, minsup, maxwin, times, max_length)
+
+
 def group_by_pid(flat_data):
     pid_map = defaultdict(list)
     for time, event, pid, objs in flat_data:
@@ -146,58 +257,290 @@ def group_by_pid(flat_data):
     return pid_map
 
 
-def run_emma_per_trace(flat_data, minsup, maxwin):
-    pid_traces = group_by_pid(flat_data)
-    episode_counts = defaultdict(set)
-    episode_objects = defaultdict(list)
-    global_pattern_registry = {}
-    next_id = 1
+def prepare_trace(trace, time_window):
+    """
+    Builds the window independent structures of a trace (local minsup of 1):
+    itemset table, encoded db and, for duration windows, the time index.
+    """
+    if not time_window:
+        return (*build_emma_index(normalize_timestamps(trace), 1), None)
+    return (*build_emma_index(trace, 1), build_time_index(trace))
+
+
+def mine_prepared_trace(prepared, maxwin, max_length=None):
+    itemset_table, encoded_db, times = prepared
+    window_seconds = window_to_seconds(maxwin)
+    if window_seconds is None:
+        return mine_episodes(
+            itemset_table, encoded_db, 1, maxwin, max_length=max_length
+        )
+    return mine_episodes(
+        itemset_table, encoded_db, 1, window_seconds, times, max_length
+    )
+
+
+def mine_trace(trace, maxwin, max_length=None):
+    """
+    Mines all episodes of a single process execution (local minsup of 1).
+    maxwin is either a number of distinct timestamps (int) or a duration such as
+    "2 days", in which case the trace must carry epoch seconds.
+    """
+    prepared = prepare_trace(trace, window_to_seconds(maxwin) is not None)
+    return mine_prepared_trace(prepared, maxwin, max_length)
+
+
+def episode_structure(episode):
+    """Unique structure key: sorted tuple of sorted activities per step."""
+    return tuple(tuple(sorted(step["activity"])) for step in episode["Episode"])
 
-    # Go through each process execution (trace)
-    for pid, trace in pid_traces.items():
-        if len(trace) < 2:
-            continue
 
-        norm_trace = normalize_timestamps(trace)
-        episodes = run_emma(norm_trace, minsup=1, maxwin=maxwin)
+class EpisodeAggregator:
+    """
+    Collects the episodes mined per trace and reports the globally frequent ones,
+    i.e. those that occur in at least minsup process executions.
+    """
+
+    def __init__(self):
+        self.pattern_ids = {}
+        self.episode_pids = defaultdict(set)
+        # Objects are deduplicated per step right away instead of per occurrence
+        self.episode_objects = {}
+
+    def add_trace(self, pid, episodes):
         for ep in episodes:
-            # Define unique structure key: sorted tuple of sorted activities per step
-            structure = tuple(tuple(sorted(step["activity"])) for step in ep["Episode"])
+            structure = episode_structure(ep)
 
             # Register globally if not yet seen
-            if structure not in global_pattern_registry:
-                global_pattern_registry[structure] = next_id
-                next_id += 1
+            if structure not in self.pattern_ids:
+                self.pattern_ids[structure] = len(self.pattern_ids) + 1
+                self.episode_objects[structure] = [set() for _ in structure]
 
             # Collect info
-            episode_counts[structure].add(pid)
-            episode_objects[structure].append(ep["Episode"])
-
-    # Aggregate and return globally frequent episodes
-    results = []
-    for structure, pids in episode_counts.items():
-        if len(pids) >= minsup:
-            pattern_id = global_pattern_registry[structure]
-
-            # Merge activities and deduplicate objects
-            episode_steps = []
-            num_steps = len(structure)
-            for i in range(num_steps):
-                activities = list(structure[i])
-                all_objects = [
-                    obj for ep in episode_objects[structure] for obj in ep[i]["objects"]
+            self.episode_pids[structure].add(pid)
+            for objects, step in zip(self.episode_objects[structure], ep["Episode"]):
+                objects.update(step["objects"])
+
+    def merge(self, other):
+        """Adds the episodes of another aggregator, e.g. of a later chunk of traces."""
+        for structure in other.pattern_ids:
+            if structure not in self.pattern_ids:
+                self.pattern_ids[structure] = len(self.pattern_ids) + 1
+                self.episode_objects[structure] = [set() for _ in structure]
+            self.episode_pids[structure].update(other.episode_pids[structure])
+            for objects, other_objects in zip(
+                self.episode_objects[structure], other.episode_objects[structure]
+            ):
+                objects.update(other_objects)
+        return self
+
+    def results(self, minsup):
+        # Aggregate and return globally frequent episodes
+        results = []
+        for structure, pids in self.episode_pids.items():
+            if len(pids) >= minsup:
+                episode_steps = [
+                    {"activity": list(activities), "objects": list(objects)}
+                    for activities, objects in zip(
+                        structure, self.episode_objects[structure]
+                    )
                 ]
-                unique_objects = list(set(all_objects))
-                episode_steps.append(
-                    {"activity": activities, "objects": unique_objects}
+                results.append(
+                    {
+                        "PatternID": self.pattern_ids[structure],
+                        "Episode": episode_steps,
+                        "Support": len(pids),
+                    }
                 )
+        return results
 
-            results.append(
+
+def filter_by_support(episodes, minsup):
+    """
+    Keeps the aggregated episodes with a support of at least minsup. Traces are
+    always mined with a local minsup of 1, so the results for any minsup are a
+    subset of results(1) with unchanged PatternIDs.
+    """
+    return [ep for ep in episodes if ep["Support"] >= minsup]
+
+
+def mine_traces(
+    pid_traces,
+    maxwin,
+    aggregator,
+    on_progress=None,
+    max_length=None,
+    checkpoint=None,
+):
+    """
+    Feeds every trace with at least two events into the aggregator. If given,
+    on_progress(traces_done, episodes_found) is called after each trace; raising
+    from it aborts the mining. max_length caps the number of episode steps.
+    Traces already in the checkpoint (see MiningCheckpoint) are skipped and newly
+    mined ones are recorded in it.
+    """
+    traces_done = 0
+    # Go through each process execution (trace)
+    for pid, trace in pid_traces:
+        traces_done += 1
+        resumed = checkpoint is not None and pid in checkpoint.processed
+        if len(trace) >= 2 and not resumed:
+            episodes = mine_trace(trace, maxwin, max_length)
+            aggregator.add_trace(pid, episodes)
+            if checkpoint is not None:
+                checkpoint.record(pid, episodes)
+        if on_progress is not None:
+            on_progress(traces_done, len(aggregator.pattern_ids))
+    return aggregator
+
+
+def run_emma_per_trace(
+    flat_data, minsup, maxwin, on_progress=None, max_length=None, checkpoint=None
+):
+    """
+    Mines episodes per process execution and keeps those occurring in at least
+    minsup executions. maxwin is either a number of distinct timestamps (int) or a
+    duration such as "2 days", in which case flat_data must carry epoch seconds.
+    """
+    return _mine_with_checkpoint(
+        group_by_pid(flat_data).items(),
+        minsup,
+        maxwin,
+        on_progress,
+        max_length,
+        checkpoint,
+    )
+
+
+def _mine_with_checkpoint(
+    pid_traces, minsup, maxwin, on_progress, max_length, checkpoint
+):
+    if checkpoint is None:
+        aggregator = mine_traces(
+            pid_traces, maxwin, EpisodeAggregator(), on_progress, max_length
+        )
+        return aggregator.results(minsup)
+
+    # Resumes from the traces recorded in the checkpoint
+    aggregator = checkpoint.open(EpisodeAggregator())
+    try:
+        mine_traces(pid_traces, maxwin, aggregator, on_progress, max_length, checkpoint)
+    finally:
+        checkpoint.close()
+    return aggregator.results(minsup)
+
+
+def _mine_chunk(pid_traces, maxwin, max_length):
+    return mine_traces(pid_traces, maxwin, EpisodeAggregator(), max_length=max_length)
+
+
+def run_emma_per_trace_parallel(
+    flat_data, minsup, maxwin, workers, max_length=None, chunk_size=None
+):
+    """
+    Same as run_emma_per_trace, but mines chunks of consecutive traces in worker
+    processes. The partial aggregators are merged in chunk order, so the
+    PatternIDs match those of the sequential run.
+    """
+    pid_traces = list(group_by_pid(flat_data).items())
+    if chunk_size is None:
+        # A few chunks per worker to balance traces of different lengths
+        chunk_size = max(1, math.ceil(len(pid_traces) / (workers * 4)))
+    chunks = [
+        pid_traces[i : i + chunk_size] for i in range(0, len(pid_traces), chunk_size)
+    ]
+
+    aggregator = EpisodeAggregator()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(
+            _mine_chunk, chunks, repeat(maxwin), repeat(max_length)
+        ):
+            aggregator.merge(partial)
+    return aggregator.results(minsup)
+
+
+def iter_traces_from_batches(batches):
+    """
+    Yields (pid, trace) from an iterable of flat_data batches that is ordered by
+    pid. A trace that continues in the next batch is carried over, so a batch can
+    be released as soon as the following one has been read.
+    """
+    pid, trace = None, []
+    for flat_data in batches:
+        for event in flat_data:
+            if event[2] != pid:
+                if trace:
+                    yield pid, trace
+                pid, trace = event[2], []
+            trace.append(event)
+    if trace:
+        yield pid, trace
+
+
+def run_emma_per_trace_batches(
+    batches, minsup, maxwin, on_progress=None, max_length=None, checkpoint=None
+):
+    """
+    Same as run_emma_per_trace for a log that arrives as pid-ordered batches, so
+    memory is bounded by the batch size plus the aggregated episodes.
+    """
+    return _mine_with_checkpoint(
+        iter_traces_from_batches(batches),
+        minsup,
+        maxwin,
+        on_progress,
+        max_length,
+        checkpoint,
+    )
+
+
+def sweep_emma_per_trace(flat_data, minsups, maxwins):
+    """
+    Mines a grid of (minsup, maxwin) settings. Each trace is indexed once and
+    re-projected for every maxwin; the minsups are derived by filter_by_support.
+
+    Returns:
+        Tuple[Dict[Tuple, List[dict]], pd.DataFrame]: the episodes per
+        (minsup, maxwin) and a summary with pattern counts and timings per grid
+        point. The preparation time is shared by all grid points.
+    """
+    aggregators = {maxwin: EpisodeAggregator() for maxwin in maxwins}
+    mining_seconds = dict.fromkeys(maxwins, 0.0)
+    preparation_seconds = 0.0
+    time_windows = {window_to_seconds(maxwin) is not None for maxwin in maxwins}
+
+    for pid, trace in group_by_pid(flat_data).items():
+        if len(trace) < 2:
+            continue
+        start = perf_counter()
+        prepared = {mode: prepare_trace(trace, mode) for mode in time_windows}
+        preparation_seconds += perf_counter() - start
+
+        for maxwin in maxwins:
+            start = perf_counter()
+            mode = window_to_seconds(maxwin) is not None
+            aggregators[maxwin].add_trace(
+                pid, mine_prepared_trace(prepared[mode], maxwin)
+            )
+            mining_seconds[maxwin] += perf_counter() - start
+
+    episodes, rows = {}, []
+    for maxwin in maxwins:
+        start = perf_counter()
+        all_episodes = aggregators[maxwin].results(1)
+        collect_seconds = perf_counter() - start
+        for minsup in minsups:
+            start = perf_counter()
+            episodes[(minsup, maxwin)] = filter_by_support(all_episodes, minsup)
+            rows.append(
                 {
-                    "PatternID": pattern_id,
-                    "Episode": episode_steps,
-                    "Support": len(pids),
+                    "Min Support": minsup,
+                    "Max Window": maxwin,
+                    "Patterns": len(episodes[(minsup, maxwin)]),
+                    "Mining Time (s)": mining_seconds[maxwin]
+                    + collect_seconds
+                    + perf_counter()
+                    - start,
+                    "Preparation Time (s)": preparation_seconds,
                 }
             )
-
-    return results
+    return episodes, pd.DataFrame(rows)
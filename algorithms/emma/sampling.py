@@ -0,0 +1,172 @@
+"""
+Approximate per-trace episode mining on a random sample of process executions.
+Supports are extrapolated to the whole log with a confidence interval; the top
+candidates can optionally be verified with exact supports from the full log.
+"""
+
+import math
+import random
+from collections import defaultdict
+from statistics import NormalDist
+
+from algorithms.emma.phase3_episode_mining import (
+    EpisodeAggregator,
+    episode_structure,
+    group_by_pid,
+    mine_prepared_trace,
+    mine_traces,
+    prepare_trace,
+    window_to_seconds,
+)
+
+
+def support_interval(sample_support, sample_size, population, confidence=0.95):
+    """
+    Wilson score interval for the number of process executions containing an
+    episode, from its support in a simple random sample of them. Includes the
+    finite population correction, so the interval collapses to the exact support
+    if the whole population is sampled.
+
+    Returns:
+        Tuple[float, float, float]: estimated support, lower and upper bound.
+    """
+    if sample_size >= population:
+        return float(sample_support), float(sample_support), float(sample_support)
+
+    share = sample_support / sample_size
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    fpc = math.sqrt((population - sample_size) / (population - 1))
+    denominator = 1 + z**2 / sample_size
+    center = (share + z**2 / (2 * sample_size)) / denominator
+    spread = math.sqrt(share * (1 - share) / sample_size + z**2 / (4 * sample_size**2))
+    half_width = z / denominator * spread * fpc
+
+    # The sampled traces are known, only the unsampled ones are uncertain
+    low = max(sample_support, (center - half_width) * population)
+    high = min(
+        sample_support + population - sample_size, (center + half_width) * population
+    )
+    return share * population, low, high
+
+
+def run_emma_per_trace_sampled(
+    flat_data,
+    minsup,
+    maxwin,
+    sample_fraction,
+    seed=None,
+    confidence=0.95,
+    verify_top=0,
+    max_length=None,
+):
+    """
+    Mines a random sample_fraction of the process executions and keeps the
+    episodes whose extrapolated support reaches minsup. Every episode carries
+    "Support" (estimate), "SupportLow", "SupportHigh" and "Verified".
+
+    With verify_top > 0 the candidates with the highest estimated support are
+    counted exactly on the unsampled traces.
+    """
+    pid_map = group_by_pid(flat_data)
+    pids = list(pid_map)
+    sample_size = min(len(pids), max(1, math.ceil(sample_fraction * len(pids))))
+    sampled = random.Random(seed).sample(pids, sample_size) if pids else []
+
+    aggregator = mine_traces(
+        ((pid, pid_map[pid]) for pid in sampled),
+        maxwin,
+        EpisodeAggregator(),
+        max_length=max_length,
+    )
+    candidates = []
+    for ep in aggregator.results(1):
+        support, low, high = support_interval(
+            ep["Support"], sample_size, len(pids), confidence
+        )
+        candidates.append(
+            {
+                **ep,
+                "Support": round(support),
+                "SupportLow": math.floor(low),
+                "SupportHigh": math.ceil(high),
+                "Verified": sample_size == len(pids),
+            }
+        )
+    candidates.sort(key=lambda ep: ep["Support"], reverse=True)
+
+    if verify_top > 0 and sample_size < len(pids):
+        unsampled = {pid: pid_map[pid] for pid in set(pids).difference(sampled)}
+        verify_exact_support(
+            candidates[:verify_top], aggregator, unsampled, maxwin, max_length
+        )
+
+    return [ep for ep in candidates if ep["Support"] >= minsup]
+
+
+def candidate_structures_in_trace(trace, structures, maxwin):
+    """
+    Returns which of the episode structures occur in a single trace. Only the
+    itemsets that are steps of these structures are indexed and joined within the
+    window, so no other episode of the trace is ever built.
+    """
+    activities = {event for _, event, _, _ in trace}
+    structures = [
+        structure
+        for structure in structures
+        if activities.issuperset(a for step in structure for a in step)
+    ]
+    if len(trace) < 2 or not structures:
+        return set()
+
+    steps = {step for structure in structures for step in structure}
+    itemset_table, encoded_db, times = prepare_trace(
+        trace, window_to_seconds(maxwin) is not None
+    )
+    itemset_table = [
+        row for row in itemset_table if tuple(sorted(row["Itemsets"])) in steps
+    ]
+    ids = {row["ID"] for row in itemset_table}
+    # Keep every time slot so the window is clipped at the same max time
+    encoded_db = defaultdict(
+        list,
+        {slot: [i for i in items if i in ids] for slot, items in encoded_db.items()},
+    )
+    length = max(len(structure) for structure in structures)
+
+    found = {
+        episode_structure(ep)
+        for ep in mine_prepared_trace(
+            (itemset_table, encoded_db, times), maxwin, length
+        )
+    }
+    return found.intersection(structures)
+
+
+def verify_exact_support(candidates, aggregator, unsampled, maxwin, max_length=None):
+    """
+    Replaces the estimated supports of candidates by their exact supports: the
+    sample support from the aggregator plus the number of unsampled traces that
+    contain them.
+    """
+    if not candidates:
+        return
+    exact = {
+        structure: len(aggregator.episode_pids[structure])
+        for structure in map(episode_structure, candidates)
+    }
+    # Longer structures cannot be mined, so they never occur in a trace either
+    structures = [
+        structure
+        for structure in exact
+        if max_length is None or len(structure) <= max_length
+    ]
+
+    for trace in unsampled.values():
+        for structure in candidate_structures_in_trace(trace, structures, maxwin):
+            exact[structure] += 1
+
+    for ep in candidates:
+        support = exact[episode_structure(ep)]
+        ep.update(
+            Support=support, SupportLow=support, SupportHigh=support, Verified=True
+        )
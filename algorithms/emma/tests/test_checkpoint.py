@@ -0,0 +1,85 @@
+import pytest
+
+from algorithms.emma import phase3_episode_mining
+from algorithms.emma.checkpoint import MiningCheckpoint
+from algorithms.emma.phase3_episode_mining import run_emma_per_trace
+
+
+class Interrupt(Exception):
+    pass
+
+
+@pytest.fixture
+def flat_data():
+    traces = {
+        "p1": ["A", "B", "C"],
+        "p2": ["A", "C", "B"],
+        "p3": ["B", "A", "C"],
+        "p4": ["A", "B", "A"],
+    }
+    return [
+        (t, activity, pid, [f"{activity}_obj"])
+        for pid, activities in traces.items()
+        for t, activity in enumerate(activities, start=1)
+    ]
+
+
+def interrupt_after(n):
+    def on_progress(traces_done, episodes_found):
+        if traces_done >= n:
+            raise Interrupt()
+
+    return on_progress
+
+
+def test_resume_matches_uninterrupted_run(flat_data, tmp_path, monkeypatch):
+    path = str(tmp_path / "run.checkpoint.jsonl")
+    expected = run_emma_per_trace(flat_data, 1, 3)
+
+    with pytest.raises(Interrupt):
+        run_emma_per_trace(
+            flat_data,
+            1,
+            3,
+            on_progress=interrupt_after(2),
+            checkpoint=MiningCheckpoint(path, params={"maxwin": 3}),
+        )
+
+    mined = []
+    mine_trace = phase3_episode_mining.mine_trace
+    monkeypatch.setattr(
+        phase3_episode_mining,
+        "mine_trace",
+        lambda trace, *args: mined.append(trace[0][2]) or mine_trace(trace, *args),
+    )
+    checkpoint = MiningCheckpoint(path, params={"maxwin": 3})
+    assert run_emma_per_trace(flat_data, 1, 3, checkpoint=checkpoint) == expected
+    assert mined == ["p3", "p4"]
+
+
+def test_torn_last_line_is_ignored(flat_data, tmp_path):
+    path = tmp_path / "run.checkpoint.jsonl"
+    run_emma_per_trace(flat_data, 1, 3, checkpoint=MiningCheckpoint(str(path)))
+    lines = path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(b"".join(lines[:3]) + lines[3][:-5])
+
+    checkpoint = MiningCheckpoint(str(path))
+    checkpoint.open()
+    checkpoint.close()
+
+    assert checkpoint.processed == {"p1", "p2"}
+    assert path.read_bytes() == b"".join(lines[:3])
+
+
+def test_params_must_match(flat_data, tmp_path):
+    path = str(tmp_path / "run.checkpoint.jsonl")
+    run_emma_per_trace(
+        flat_data, 1, 3, checkpoint=MiningCheckpoint(path, params={"maxwin": 3})
+    )
+
+    with pytest.raises(ValueError, match="other parameters"):
+        MiningCheckpoint(path, params={"maxwin": 4}).open()
+    fresh = MiningCheckpoint(path, params={"maxwin": 4}, resume=False)
+    fresh.open()
+    fresh.discard()
+    assert not (tmp_path / "run.checkpoint.jsonl").exists()
@@ -0,0 +1,83 @@
+import pytest
+
+from algorithms.emma.cost_estimation import (
+    episode_length_cap,
+    estimate_cost,
+    profile_traces,
+)
+from algorithms.emma.phase3_episode_mining import group_by_pid, run_emma_per_trace
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def flat_data():
+    return [
+        (1, "A", "p1", ["Order"]),
+        (2, "B", "p1", ["Order"]),
+        (3, "C", "p1", ["Order"]),
+        (4, "A", "p1", ["Order"]),
+        (1, "A", "p2", ["Order"]),
+        (2, "B", "p2", ["Order"]),
+    ]
+
+
+def structures(episodes):
+    return sorted(
+        (tuple(tuple(step["activity"]) for step in ep["Episode"]), ep["Support"])
+        for ep in episodes
+    )
+
+
+def test_profile_traces(flat_data):
+    profile = profile_traces(group_by_pid(flat_data).items(), maxwin=2)
+
+    assert profile.trace_lengths.tolist() == [4, 2]
+    assert profile.activity_frequencies == {"A": 2, "B": 2, "C": 1}
+    assert profile.pair_counts == {("A", "B"): 2, ("B", "C"): 1, ("C", "A"): 1}
+    assert [r.tolist() for r in profile.trace_reachable] == [[1, 1, 1, 0], [1, 0]]
+
+
+def test_profile_traces_with_duration_window():
+    flat_data = [
+        (0, "A", "p1", []),
+        (DAY, "B", "p1", []),
+        (3 * DAY, "C", "p1", []),
+    ]
+
+    profile = profile_traces(group_by_pid(flat_data).items(), maxwin="2 days")
+
+    assert profile.pair_counts == {("A", "B"): 1, ("B", "C"): 1}
+    assert profile.reachable.tolist() == [1, 1, 0]
+
+
+def test_estimate_cost_counts_occurrences(flat_data):
+    profile = profile_traces(group_by_pid(flat_data).items(), maxwin=3)
+
+    # reachable timestamps: p1 [2, 2, 1, 0], p2 [1, 0]
+    assert estimate_cost(profile, minsup=2).occurrences == 4 + 4 + 2 + 1 + 2 + 1
+    capped = estimate_cost(profile, minsup=2, max_length=2)
+    assert capped.occurrences == 3 + 3 + 2 + 1 + 2 + 1
+    assert capped.peak_trace_occurrences == 9
+    assert capped.frequent_activities == 2
+    assert capped.frequent_pairs == 1
+
+
+def test_episode_length_cap(flat_data):
+    profile = profile_traces(group_by_pid(flat_data).items(), maxwin=3)
+
+    assert episode_length_cap(profile, 1, memory_budget=10**9) is None
+    cap = episode_length_cap(profile, 1, memory_budget=1)
+    assert cap == 1
+    budget = estimate_cost(profile, 1, max_length=2).peak_memory_bytes
+    assert episode_length_cap(profile, 1, memory_budget=budget) == 2
+
+
+def test_max_length_limits_mined_episodes(flat_data):
+    capped = run_emma_per_trace(flat_data, 1, 3, max_length=1)
+    uncapped = run_emma_per_trace(flat_data, 1, 3)
+
+    assert all(len(ep["Episode"]) == 1 for ep in capped)
+    assert structures(capped) == structures(
+        [ep for ep in uncapped if len(ep["Episode"]) == 1]
+    )
@@ -0,0 +1,85 @@
+import pytest
+
+from algorithms.emma.phase3_episode_mining import (
+    EpisodeAggregator,
+    filter_by_support,
+    iter_traces_from_batches,
+    run_emma_per_trace,
+    run_emma_per_trace_batches,
+    run_emma_per_trace_parallel,
+)
+
+
+@pytest.fixture
+def flat_data():
+    return [
+        (1, "A", "p1", ["Order"]),
+        (2, "B", "p1", ["Order", "Item"]),
+        (3, "C", "p1", ["Item"]),
+        (1, "A", "p2", ["Order"]),
+        (2, "B", "p2", ["Order"]),
+        (5, "A", "p3", ["Order"]),
+        (6, "C", "p3", ["Item"]),
+    ]
+
+
+def normalized(results):
+    return sorted(
+        (
+            ep["PatternID"],
+            ep["Support"],
+            [(step["activity"], sorted(step["objects"])) for step in ep["Episode"]],
+        )
+        for ep in results
+    )
+
+
+def test_episode_aggregator():
+    aggregator = EpisodeAggregator()
+    episode = [{"activity": ["A"], "objects": ["Order"]}]
+    aggregator.add_trace("p1", [{"Episode": episode}])
+    aggregator.add_trace("p2", [{"Episode": episode}])
+    aggregator.add_trace("p2", [{"Episode": [{"activity": ["B"], "objects": []}]}])
+
+    assert aggregator.results(minsup=2) == [
+        {
+            "PatternID": 1,
+            "Episode": [{"activity": ["A"], "objects": ["Order"]}],
+            "Support": 2,
+        }
+    ]
+    assert len(aggregator.results(minsup=1)) == 2
+
+
+def test_iter_traces_from_batches_carries_over_split_traces(flat_data):
+    batches = [flat_data[:2], flat_data[2:4], flat_data[4:]]
+    traces = list(iter_traces_from_batches(batches))
+
+    assert [pid for pid, _ in traces] == ["p1", "p2", "p3"]
+    assert [len(trace) for _, trace in traces] == [3, 2, 2]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 100])
+def test_run_emma_per_trace_batches_matches_in_memory(flat_data, batch_size):
+    batches = (
+        flat_data[i : i + batch_size] for i in range(0, len(flat_data), batch_size)
+    )
+
+    assert normalized(run_emma_per_trace_batches(batches, 2, 3)) == normalized(
+        run_emma_per_trace(flat_data, 2, 3)
+    )
+
+
+@pytest.mark.parametrize("minsup", [1, 2, 3, 4])
+def test_filter_by_support_matches_mining_with_minsup(flat_data, minsup):
+    all_episodes = run_emma_per_trace(flat_data, 1, 3)
+
+    assert normalized(filter_by_support(all_episodes, minsup)) == normalized(
+        run_emma_per_trace(flat_data, minsup, 3)
+    )
+
+
+def test_run_emma_per_trace_parallel_matches_sequential(flat_data):
+    assert run_emma_per_trace_parallel(
+        flat_data, 1, 3, workers=2, chunk_size=1
+    ) == run_emma_per_trace(flat_data, 1, 3)
@@ -0,0 +1,92 @@
+import pytest
+
+from algorithms.emma.phase3_episode_mining import (
+    episode_structure,
+    mine_trace,
+    run_emma_per_trace,
+)
+from algorithms.emma.sampling import (
+    candidate_structures_in_trace,
+    run_emma_per_trace_sampled,
+    support_interval,
+)
+
+
+@pytest.fixture
+def flat_data():
+    traces = {
+        f"p{i}": ["A", "B", "C"] if i % 2 else ["A", "C", "B", "A"] for i in range(20)
+    }
+    return [
+        (t, activity, pid, ["Order"])
+        for pid, activities in traces.items()
+        for t, activity in enumerate(activities, start=1)
+    ]
+
+
+def supports(episodes):
+    return {episode_structure(ep): ep["Support"] for ep in episodes}
+
+
+def test_support_interval_of_full_sample_is_exact():
+    assert support_interval(7, 10, 10) == (7.0, 7.0, 7.0)
+
+
+def test_support_interval_bounds():
+    estimate, low, high = support_interval(5, 10, 100)
+
+    assert estimate == 50
+    assert 5 <= low < estimate < high <= 95
+    narrow = support_interval(50, 90, 100)
+    assert narrow[2] - narrow[1] < high - low
+
+
+def test_full_sample_matches_exact_mining(flat_data):
+    episodes = run_emma_per_trace_sampled(flat_data, 2, 3, sample_fraction=1.0)
+
+    assert supports(episodes) == supports(run_emma_per_trace(flat_data, 2, 3))
+    assert all(ep["Verified"] for ep in episodes)
+
+
+def test_sample_is_reproducible_and_extrapolated(flat_data):
+    first = run_emma_per_trace_sampled(flat_data, 1, 3, sample_fraction=0.3, seed=1)
+    second = run_emma_per_trace_sampled(flat_data, 1, 3, sample_fraction=0.3, seed=1)
+
+    assert first == second
+    assert not any(ep["Verified"] for ep in first)
+    assert all(ep["SupportLow"] <= ep["Support"] <= ep["SupportHigh"] for ep in first)
+    assert all(ep["SupportHigh"] <= 20 for ep in first)
+
+
+def test_verify_top_gives_exact_support(flat_data):
+    episodes = run_emma_per_trace_sampled(
+        flat_data, 1, 3, sample_fraction=0.3, seed=1, verify_top=3
+    )
+    exact = supports(run_emma_per_trace(flat_data, 1, 3))
+
+    verified = [ep for ep in episodes if ep["Verified"]]
+    assert len(verified) == 3
+    for ep in verified:
+        assert ep["Support"] == exact[episode_structure(ep)]
+        assert ep["SupportLow"] == ep["SupportHigh"] == ep["Support"]
+
+
+@pytest.mark.parametrize("maxwin", [2, 3, "2 seconds"])
+def test_candidate_structures_match_full_trace_mining(maxwin):
+    trace = [
+        (t, activity, "p1", ["Order"])
+        for t, activity in zip([1, 2, 2, 4, 5], ["A", "C", "B", "A", "D"])
+    ]
+    mined = {episode_structure(ep) for ep in mine_trace(trace, maxwin)}
+    structures = [
+        (("A",), ("B", "C")),
+        (("A",), ("D",)),
+        (("A",), ("D",), ("B", "C")),
+        (("B", "C"), ("A",), ("D",)),
+        (("D",), ("A",)),
+        (("E",),),
+    ]
+
+    found = candidate_structures_in_trace(trace, structures, maxwin)
+
+    assert found == mined.intersection(structures)
@@ -0,0 +1,51 @@
+import pytest
+
+from algorithms.emma.phase3_episode_mining import (
+    run_emma_per_trace,
+    sweep_emma_per_trace,
+)
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def flat_data():
+    events = [
+        ("p1", ["A", "B", "C", "A"]),
+        ("p2", ["A", "C", "B"]),
+        ("p3", ["A", "B", "B", "C"]),
+    ]
+    return [
+        (i * DAY, activity, pid, ["Order"])
+        for pid, activities in events
+        for i, activity in enumerate(activities)
+    ]
+
+
+def test_sweep_matches_individual_runs(flat_data):
+    minsups, maxwins = [1, 2, 3], [2, 3, "2 days"]
+
+    episodes, summary = sweep_emma_per_trace(flat_data, minsups, maxwins)
+
+    assert len(summary) == len(minsups) * len(maxwins)
+    for minsup in minsups:
+        for maxwin in maxwins:
+            expected = run_emma_per_trace(flat_data, minsup, maxwin)
+            assert episodes[(minsup, maxwin)] == expected
+            row = summary[
+                (summary["Min Support"] == minsup) & (summary["Max Window"] == maxwin)
+            ]
+            assert row["Patterns"].item() == len(expected)
+
+
+def test_sweep_summary_columns(flat_data):
+    _, summary = sweep_emma_per_trace(flat_data, [2], [3])
+
+    assert list(summary.columns) == [
+        "Min Support",
+        "Max Window",
+        "Patterns",
+        "Mining Time (s)",
+        "Preparation Time (s)",
+    ]
+    assert (summary[["Mining Time (s)", "Preparation Time (s)"]] >= 0).all(axis=None)
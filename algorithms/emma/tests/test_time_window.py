@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from algorithms.emma.phase3_episode_mining import (
+    build_time_index,
+    compute_projected_boundlist,
+    run_emma_per_trace,
+    window_to_seconds,
+)
+
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture
+def flat_data():
+    # A -> B after one day, B -> C after two more days, in two process executions
+    return [
+        (start + offset, event, pid, ["Order"])
+        for pid, start in (("p1", 0), ("p2", 10 * DAY))
+        for offset, event in ((0, "A"), (DAY, "B"), (3 * DAY, "C"))
+    ]
+
+
+def episode_structures(results):
+    return {tuple(tuple(step["activity"]) for step in ep["Episode"]) for ep in results}
+
+
+def test_window_to_seconds():
+    assert window_to_seconds(3) is None
+    assert window_to_seconds(np.int64(3)) is None
+    assert window_to_seconds("2 days") == 2 * DAY
+    assert window_to_seconds("90min") == 90 * 60
+
+
+@pytest.mark.parametrize("maxwin", ["2", " 2.5 ", 5.0, "-1 days", "0s", "500ms"])
+def test_window_to_seconds_rejects_unitless_and_non_positive(maxwin):
+    with pytest.raises(ValueError):
+        window_to_seconds(maxwin)
+
+
+def test_build_time_index(flat_data):
+    times = build_time_index(flat_data)
+    assert times.dtype == np.int64
+    assert times.tolist() == sorted({t for t, *_ in flat_data})
+
+
+def test_compute_projected_boundlist_by_time():
+    times = np.array([0, DAY, 3 * DAY, 4 * DAY], dtype=np.int64)
+    # From an occurrence at day 0 a window of 3 days reaches day 1 and day 3
+    assert compute_projected_boundlist([(0, 0)], 3 * DAY, None, times) == [
+        (DAY, 3 * DAY)
+    ]
+    # Nothing after day 4
+    assert compute_projected_boundlist([(4 * DAY, 4 * DAY)], DAY, None, times) == []
+
+
+def test_run_emma_per_trace_duration_window(flat_data):
+    structures = episode_structures(run_emma_per_trace(flat_data, 2, "2 days"))
+
+    assert (("A",), ("B",)) in structures
+    assert (("B",), ("C",)) in structures
+    # C happens three days after A and is outside of the window
+    assert (("A",), ("C",)) not in structures
+    assert (("A",), ("B",), ("C",)) not in structures
+
+
+def test_run_emma_per_trace_larger_duration_window(flat_data):
+    structures = episode_structures(run_emma_per_trace(flat_data, 2, "3 days"))
+
+    assert (("A",), ("C",)) in structures
+    assert (("A",), ("B",), ("C",)) in structures
+
+
+def test_run_emma_per_trace_rank_window_ignores_elapsed_time(flat_data):
+    # Three distinct timestamps fit into a rank window of 3 regardless of the gaps
+    structures = episode_structures(run_emma_per_trace(flat_data, 2, 3))
+
+    assert (("A",), ("B",), ("C",)) in structures
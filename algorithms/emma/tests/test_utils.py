@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from algorithms.emma.utils import (
+    columnar_to_tuples,
+    flatten_event_log_columnar,
+    to_epoch_seconds,
+)
+
+
+@pytest.fixture
+def combined_eventlog():
+    return pd.DataFrame(
+        {
+            "EventID": ["e1", "e2", "e3"],
+            "Process_Execution_ID": ["0", "0", "1"],
+            "Timestamp": [
+                "2023-01-01 12:00:00",
+                "2023-01-01 12:05:00",
+                "2023-01-02 08:00:00",
+            ],
+            "EventName": ["Create Order", "Pick Item", "Create Order"],
+            "Order_ID": ["o1", None, "o2"],
+            "Item_ID": [None, "i1", "i2"],
+        }
+    )
+
+
+def test_to_epoch_seconds():
+    times = pd.Series(["1970-01-01 00:00:00", "2023-01-01 12:00:00"])
+    result = to_epoch_seconds(times)
+    assert result.dtype == np.int64
+    assert result.tolist() == [0, int(pd.Timestamp("2023-01-01 12:00:00").timestamp())]
+
+
+def test_flatten_event_log_columnar(combined_eventlog):
+    log = flatten_event_log_columnar(combined_eventlog)
+
+    assert len(log) == 3
+    assert log.object_types == ["Order", "Item"]
+    assert log.event_names[log.event_code].tolist() == [
+        "Create Order",
+        "Pick Item",
+        "Create Order",
+    ]
+    assert log.pids[log.pid_code].tolist() == ["0", "0", "1"]
+    # Bit 0 = Order, bit 1 = Item
+    assert log.object_mask.tolist() == [1, 2, 3]
+
+
+def test_flatten_event_log_columnar_does_not_modify_input(combined_eventlog):
+    before = combined_eventlog.copy()
+    flatten_event_log_columnar(combined_eventlog)
+    pd.testing.assert_frame_equal(combined_eventlog, before)
+
+
+def test_columnar_to_tuples(combined_eventlog):
+    flat_data = columnar_to_tuples(flatten_event_log_columnar(combined_eventlog))
+
+    # Reference: the row-wise flattening this replaces
+    expected = []
+    for _, row in combined_eventlog.iterrows():
+        expected.append(
+            (
+                int(pd.Timestamp(row["Timestamp"]).timestamp()),
+                row["EventName"],
+                row["Process_Execution_ID"],
+                [
+                    col.replace("_ID", "")
+                    for col in ["Order_ID", "Item_ID"]
+                    if pd.notna(row[col])
+                ],
+            )
+        )
+    assert flat_data == expected
+
+
+def test_flatten_event_log_columnar_too_many_object_types():
+    df = pd.DataFrame(
+        {
+            "Timestamp": ["2023-01-01"],
+            "EventName": ["A"],
+            "Process_Execution_ID": ["0"],
+            **{f"T{i}_ID": ["x"] for i in range(65)},
+        }
+    )
+    with pytest.raises(ValueError):
+        flatten_event_log_columnar(df)
@@ -1,3 +1,104 @@
 """
 General utility functions for data preprocessing and transformation.
 """
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+MAX_OBJECT_TYPES = 64
+
+
+@dataclass(frozen=True)
+class ColumnarEventLog:
+    """
+    Flattened event log stored as parallel arrays, one entry per event:
+        - time: int64 epoch seconds
+        - event_code / pid_code: indices into event_names / pids
+        - object_mask: uint64 bitmask, bit i is set if object_types[i] is involved
+    """
+
+    time: np.ndarray
+    event_code: np.ndarray
+    pid_code: np.ndarray
+    object_mask: np.ndarray
+    event_names: np.ndarray
+    pids: np.ndarray
+    object_types: list[str]
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def decode_object_masks(self) -> dict[int, list[str]]:
+        """Maps every distinct object mask of the log to its list of object types."""
+        return {
+            mask: [
+                object_type
+                for bit, object_type in enumerate(self.object_types)
+                if mask >> bit & 1
+            ]
+            for mask in np.unique(self.object_mask).tolist()
+        }
+
+
+def to_epoch_seconds(times: pd.Series) -> np.ndarray:
+    """Converts a datetime-like column to int64 epoch seconds with a single cast."""
+    return pd.to_datetime(times).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+
+def flatten_event_log_columnar(
+    df: pd.DataFrame,
+    time_col: str = "Timestamp",
+    event_col: str = "EventName",
+    pid_col: str = "Process_Execution_ID",
+    object_cols: list[str] | None = None,
+) -> ColumnarEventLog:
+    """
+    Vectorized counterpart of flatten_event_log_with_pid: instead of one tuple per
+    event, returns columnar arrays for time, event, pid and involved object types.
+    """
+    if object_cols is None:
+        object_cols = [
+            col for col in df.columns if col.endswith("_ID") and col != pid_col
+        ]
+    if len(object_cols) > MAX_OBJECT_TYPES:
+        raise ValueError(
+            f"At most {MAX_OBJECT_TYPES} object types are supported, "
+            f"got {len(object_cols)}."
+        )
+
+    event_code, event_names = pd.factorize(df[event_col], use_na_sentinel=False)
+    pid_code, pids = pd.factorize(df[pid_col], use_na_sentinel=False)
+
+    # One boolean column per object type, folded into a single bitmask per event
+    present = df[object_cols].notna().to_numpy()
+    bits = np.left_shift(np.uint64(1), np.arange(len(object_cols), dtype=np.uint64))
+    object_mask = np.bitwise_or.reduce(np.where(present, bits, np.uint64(0)), axis=1)
+
+    return ColumnarEventLog(
+        time=to_epoch_seconds(df[time_col]),
+        event_code=event_code,
+        pid_code=pid_code,
+        object_mask=object_mask.astype(np.uint64),
+        event_names=np.asarray(event_names, dtype=object),
+        pids=np.asarray(pids, dtype=object),
+        object_types=[col.replace("_ID", "") for col in object_cols],
+    )
+
+
+def columnar_to_tuples(log: ColumnarEventLog) -> list[tuple]:
+    """Converts a ColumnarEventLog to the (timestamp, event, pid, [objects]) format."""
+    event_names = log.event_names.tolist()
+    pids = log.pids.tolist()
+    objects_by_mask = log.decode_object_masks()
+
+    return [
+        (time, event_names[event], pids[pid], list(objects_by_mask[mask]))
+        for time, event, pid, mask in zip(
+            log.time.tolist(),
+            log.event_code.tolist(),
+            log.pid_code.tolist(),
+            log.object_mask.tolist(),
+        )
+    ]
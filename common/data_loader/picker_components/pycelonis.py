@@ -10,12 +10,23 @@ from common.data_loader.picker_components.base import PickerComponent
 from common.data_loader.picker_components.helper import (
     get_selected_from_session_state_list,
 )
+from common.data_loader.sql_accessor.cache import DataModelCache
 from common.data_loader.sql_accessor.duckdb import LocalDuckDBAccessor
+from common.data_loader.sql_accessor.export_profile import (
+    FULL_EXPORT_PROFILE,
+    ExportProfile,
+)
 
 
 class PyCelonisModelPickerComponent(PickerComponent):
-    def __init__(self, tab_title: str = "PyCelonis", **kwargs: Any):
+    def __init__(
+        self,
+        tab_title: str = "PyCelonis",
+        export_profile: ExportProfile = FULL_EXPORT_PROFILE,
+        **kwargs: Any,
+    ):
         super().__init__(tab_title=tab_title, **kwargs)
+        self.export_profile = export_profile
 
     @staticmethod
     async def _validate_preconditions() -> None:
@@ -97,10 +108,9 @@ class PyCelonisModelPickerComponent(PickerComponent):
 
         progress_bar.progress(0, text="Preparing App")
         progress_bar.progress(0.05, text="Loading initial View")
-        st.session_state.sql_view = SQLView.initial_view_from_pycelonis_data_model(
-            data_model
+        st.session_state.sql_view = self.export_profile.restrict_view(
+            SQLView.initial_view_from_pycelonis_data_model(data_model)
         )
-        st.session_state.sql_view.cleanup_foreign_keys()
 
         st.session_state.sql_accessor = (
             LocalDuckDBAccessor.create_local_copy_of_data_model(
@@ -108,6 +118,8 @@ class PyCelonisModelPickerComponent(PickerComponent):
                 data_model.id if data_model else None,
                 st.session_state.sql_view,
                 progress_call_back,
+                cache=DataModelCache(),
+                profile=self.export_profile,
             )
         )
 
@@ -1,21 +1,103 @@
+import time
 import uuid
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+from common.data_loader.sql_accessor.profiler import QueryProfile, QueryProfiler
+from common.data_loader.sql_accessor.query_cache import QueryCache, is_read_only
 
 ViewGroupName = str
 ViewName = str
 
+DEFAULT_BATCH_SIZE = 100_000
+
 
 class SQLAccessor(ABC):
 
     views: dict[ViewGroupName, list[str]] = defaultdict(list)
+    query_cache: Optional[QueryCache] = None
+    profiler: Optional[QueryProfiler] = None
 
-    @abstractmethod
     def execute_query(self, query: str) -> pd.DataFrame:
+        """Executes the query, answering repeated read-only queries from the query
+        cache. Any other statement clears the cache."""
+        with self.profile_query(query, "pandas") as profile:
+            if self.query_cache is not None and self.query_cache.is_cacheable(query):
+                df = self.query_cache.get(query)
+                profile.cached = df is not None
+                if df is None:
+                    df = self._execute_query(query)
+                    self.query_cache.put(query, df)
+            else:
+                self.invalidate_query_cache_on_write(query)
+                df = self._execute_query(query)
+            profile.rows = len(df)
+            # Shallow, string columns are counted by their pointers only
+            profile.bytes = int(df.memory_usage().sum())
+        return df
+
+    @abstractmethod
+    def _execute_query(self, query: str) -> pd.DataFrame:
         pass
 
+    @contextmanager
+    def profile_query(self, query: str, method: str) -> Iterator[QueryProfile]:
+        """Times the block and records the profile, the block fills in the result
+        size."""
+        profile = QueryProfile(query=query, method=method)
+        start = time.perf_counter()
+        yield profile
+        profile.seconds = time.perf_counter() - start
+        self.record_profile(profile)
+
+    def record_profile(self, profile: QueryProfile) -> None:
+        if self.profiler is None:
+            return
+        if (
+            self.profiler.explain_slow_queries
+            and self.profiler.is_slow(profile)
+            and not profile.cached
+            and is_read_only(profile.query)
+        ):
+            profile.plan = self._explain_analyze(profile.query)
+        self.profiler.record(profile)
+
+    def _explain_analyze(self, query: str) -> Optional[str]:
+        """The executed query plan with timings, if the database supports it."""
+        return None
+
+    def invalidate_query_cache(self) -> None:
+        """Clears the query cache, needed after writes that bypass the accessor."""
+        if self.query_cache is not None:
+            self.query_cache.invalidate()
+
+    def invalidate_query_cache_on_write(self, query: str) -> None:
+        if not is_read_only(query):
+            self.invalidate_query_cache()
+
+    # The defaults below go through pandas, accessors should override them with a
+    # native implementation that avoids the conversion
+
+    def execute_arrow(self, query: str) -> pa.Table:
+        return pa.Table.from_pandas(self.execute_query(query), preserve_index=False)
+
+    def execute_batches(
+        self, query: str, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> Iterator[pa.RecordBatch]:
+        """Yields the result in record batches of at most batch_size rows."""
+        yield from self.execute_arrow(query).to_batches(max_chunksize=batch_size)
+
+    def execute_numpy(self, query: str) -> dict[str, np.ndarray]:
+        """Returns the result as one array per column."""
+        df = self.execute_query(query)
+        return {column: df[column].to_numpy() for column in df.columns}
+
     def create_view(self, view_group: ViewGroupName, view_definition: str) -> str:
         view_name = "f" + str(uuid.uuid4()).replace("-", "_")
         self.views[view_group].append(view_name)
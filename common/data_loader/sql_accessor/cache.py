@@ -0,0 +1,121 @@
+import logging
+import os
+import re
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "DUCKDB_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "celonis_duckdb"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("DUCKDB_CACHE_MAX_GB", "20")) * 1024**3
+
+CACHE_SUFFIX = ".duckdb"
+# DuckDB keeps uncommitted changes next to the database file
+SIDECAR_SUFFIXES = (".wal",)
+
+NON_FILENAME_REGEX_PATTERN = re.compile("[^a-zA-Z0-9-]")
+
+
+class DataModelCache:
+    """Local DuckDB copies of data models, one file per pool, model and version.
+
+    The least recently used files are evicted once the cache directory grows
+    beyond max_bytes.
+    """
+
+    def __init__(
+        self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def _prefix(data_pool_id: str, data_model_id: str) -> str:
+        return "_".join(
+            NON_FILENAME_REGEX_PATTERN.sub("", str(part))
+            for part in (data_pool_id, data_model_id)
+        )
+
+    def path(self, data_pool_id: str, data_model_id: str, version: str) -> str:
+        file_name = f"{self._prefix(data_pool_id, data_model_id)}_{version}"
+        return os.path.join(self.cache_dir, file_name + CACHE_SUFFIX)
+
+    def lookup(
+        self, data_pool_id: str, data_model_id: str, version: str
+    ) -> Optional[str]:
+        """Returns the path of the cached copy of this model version, if any."""
+        path = self.path(data_pool_id, data_model_id, version)
+        if not os.path.exists(path):
+            return None
+        # The modification time doubles as the last access time for eviction
+        os.utime(path)
+        return path
+
+    def _entries(self) -> list[str]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [
+            os.path.join(self.cache_dir, file)
+            for file in os.listdir(self.cache_dir)
+            if file.endswith(CACHE_SUFFIX)
+        ]
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        for file in (path,) + tuple(path + suffix for suffix in SIDECAR_SUFFIXES):
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _size(path: str) -> int:
+        return sum(
+            os.path.getsize(file)
+            for file in (path,) + tuple(path + suffix for suffix in SIDECAR_SUFFIXES)
+            if os.path.exists(file)
+        )
+
+    def latest(
+        self, data_pool_id: str, data_model_id: str, suffix: str = ""
+    ) -> Optional[str]:
+        """Returns the most recently used copy of any version of the data model whose
+        version ends with suffix, e.g. to refresh it instead of exporting it again."""
+        prefix = self._prefix(data_pool_id, data_model_id) + "_"
+        candidates = [
+            path
+            for path in self._entries()
+            if os.path.basename(path).startswith(prefix)
+            and path.endswith(suffix + CACHE_SUFFIX)
+        ]
+        return max(candidates, key=os.path.getmtime, default=None)
+
+    def remove_other_versions(
+        self, data_pool_id: str, data_model_id: str, keep: str, suffix: str = ""
+    ) -> None:
+        """Deletes outdated copies of a data model whose version ends with suffix,
+        copies with another suffix (e.g. export profile) are kept."""
+        prefix = self._prefix(data_pool_id, data_model_id) + "_"
+        for path in self._entries():
+            if (
+                os.path.basename(path).startswith(prefix)
+                and path.endswith(suffix + CACHE_SUFFIX)
+                and path != keep
+            ):
+                logger.info("Removing outdated data model copy %s", path)
+                self._remove(path)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Deletes the least recently used copies until the cache fits max_bytes."""
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        total = sum(self._size(path) for path in entries)
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            logger.info("Evicting data model copy %s", path)
+            total -= self._size(path)
+            self._remove(path)
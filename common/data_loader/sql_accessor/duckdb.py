@@ -1,31 +1,163 @@
 import logging
 import os
 import shutil
-from typing import Callable, Dict
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional
 
 import duckdb
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import streamlit as st
 
 from common.data_loader.meta_information.sql_view import SQLView
-from common.data_loader.sql_accessor.base import SQLAccessor
-from common.data_loader.sql_accessor.helper import all_tables_to_parquet
+from common.data_loader.sql_accessor.base import DEFAULT_BATCH_SIZE, SQLAccessor
+from common.data_loader.sql_accessor.cache import DataModelCache
+from common.data_loader.sql_accessor.export_profile import (
+    FULL_EXPORT_PROFILE,
+    ExportProfile,
+)
+from common.data_loader.sql_accessor.helper import (
+    all_tables_to_parquet,
+    data_model_last_load,
+    data_model_row_counts,
+    data_model_version,
+    get_data_model,
+    since_filter,
+)
+from common.data_loader.sql_accessor.profiler import QueryProfile, QueryProfiler
+from common.data_loader.sql_accessor.query_cache import (
+    DEFAULT_MAX_BYTES as QUERY_CACHE_MAX_BYTES,
+    QueryCache,
+)
 
 logger = logging.getLogger(__name__)
 
+# Row count and maximum time of every table at export, for incremental refreshes
+WATERMARK_TABLE = "_el_watermarks"
+TIME_COLUMN = "Time"
+
 # pylint: disable=unused-variable
 
 
+def _exported_table_files(output_dir: str) -> dict[str, list[str]]:
+    # Chunks are named <table>_<index>.parquet
+    table_files: dict[str, list[str]] = {}
+    for file in sorted(os.listdir(output_dir)):
+        if file.endswith(".parquet"):
+            table_name = "_".join(file.split("_")[:-1])
+            table_files.setdefault(table_name, []).append(
+                os.path.join(output_dir, file)
+            )
+    return table_files
+
+
 class LocalDuckDBAccessor(SQLAccessor):
-    def __init__(self) -> None:
-        self._duckdb_connection = duckdb.connect(database=":memory:")
+    def __init__(
+        self,
+        database: str = ":memory:",
+        query_cache_bytes: int = QUERY_CACHE_MAX_BYTES,
+    ) -> None:
+        self.database = database
+        self.closed = False
+        self._connection = duckdb.connect(database=database)
+        self._cursors: dict[threading.Thread, duckdb.DuckDBPyConnection] = {}
+        self._idle_cursors: list[duckdb.DuckDBPyConnection] = []
+        self._cursor_lock = threading.Lock()
+        self.query_cache = QueryCache(query_cache_bytes) if query_cache_bytes else None
+        self.profiler = QueryProfiler()
+
+    @property
+    def _duckdb_connection(self) -> duckdb.DuckDBPyConnection:
+        """Cursor of the current thread. Cursors share the database but not their
+        transactions, temporary tables or registered data frames, so threads can
+        query in parallel safely."""
+        thread = threading.current_thread()
+        with self._cursor_lock:
+            cursor = self._cursors.get(thread)
+            if cursor is None:
+                # Streamlit runs every rerun in a new thread, so the cursors of
+                # finished threads are reused instead of opening new ones
+                for finished in [t for t in self._cursors if not t.is_alive()]:
+                    self._idle_cursors.append(self._cursors.pop(finished))
+                cursor = (
+                    self._idle_cursors.pop()
+                    if self._idle_cursors
+                    else self._connection.cursor()
+                )
+                self._cursors[thread] = cursor
+        return cursor
 
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def _execute_query(self, query: str) -> pd.DataFrame:
         logger.info("Executing query: %s", query)
         return self._duckdb_connection.execute(query).fetch_df()
 
+    def execute_arrow(self, query: str) -> pa.Table:
+        logger.info("Executing query: %s", query)
+        self.invalidate_query_cache_on_write(query)
+        with self.profile_query(query, "arrow") as profile:
+            table = self._duckdb_connection.execute(query).fetch_arrow_table()
+            profile.rows, profile.bytes = table.num_rows, table.nbytes
+        return table
+
+    def execute_batches(
+        self, query: str, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> Iterator[pa.RecordBatch]:
+        logger.info("Executing query: %s", query)
+        self.invalidate_query_cache_on_write(query)
+        profile = QueryProfile(query=query, method="batches")
+        start = time.perf_counter()
+        # A cursor of its own, so other queries can run while the batches are
+        # consumed, e.g. from a background thread
+        cursor = self._duckdb_connection.cursor()
+        try:
+            reader = cursor.execute(query).fetch_record_batch(batch_size)
+            # Only the time spent fetching is counted, not the time the consumer
+            # spends on a batch
+            for batch in reader:
+                profile.seconds += time.perf_counter() - start
+                profile.rows += batch.num_rows
+                profile.bytes += batch.nbytes
+                yield batch
+                start = time.perf_counter()
+            profile.seconds += time.perf_counter() - start
+        finally:
+            # Also if the consumer stops early, e.g. after the first batch
+            cursor.close()
+            self.record_profile(profile)
+
+    def execute_numpy(self, query: str) -> dict[str, np.ndarray]:
+        logger.info("Executing query: %s", query)
+        self.invalidate_query_cache_on_write(query)
+        with self.profile_query(query, "numpy") as profile:
+            columns = self._duckdb_connection.execute(query).fetchnumpy()
+            profile.rows = len(next(iter(columns.values()), []))
+            profile.bytes = sum(column.nbytes for column in columns.values())
+        return columns
+
+    def _explain_analyze(self, query: str) -> Optional[str]:
+        rows = self._duckdb_connection.execute(f"EXPLAIN ANALYZE {query}").fetchall()
+        return "\n".join(str(row[-1]) for row in rows)
+
     def remove_tables(self, sql_view: SQLView) -> None:
         for table in sql_view.tables:
             self._duckdb_connection.execute(f"DROP TABLE IF EXISTS {table}")
+        self.invalidate_query_cache()
+
+    def close(self) -> None:
+        with self._cursor_lock:
+            for cursor in list(self._cursors.values()) + self._idle_cursors:
+                cursor.close()
+            self._cursors.clear()
+            self._idle_cursors.clear()
+            self._connection.close()
+            self.closed = True
+
+    def checkpoint(self) -> None:
+        """Writes the write-ahead log into the database file."""
+        self._duckdb_connection.execute("CHECKPOINT")
 
     @classmethod
     def create_local_copy_of_data_model(
@@ -34,6 +166,105 @@ class LocalDuckDBAccessor(SQLAccessor):
         data_model_id: str,
         view: SQLView,
         progress_call_back: Callable[[float], None],
+        cache: Optional[DataModelCache] = None,
+        profile: ExportProfile = FULL_EXPORT_PROFILE,
+    ) -> "LocalDuckDBAccessor":
+        """Copies the tables of the view into DuckDB, limited to the tables and
+        columns of the export profile. With a cache, the copy is stored in a DuckDB
+        file per data model version and reopened on later loads instead of exporting
+        the data model again."""
+        if cache is None:
+            return cls._copy_data_model(
+                data_pool_id,
+                data_model_id,
+                view,
+                progress_call_back,
+                ":memory:",
+                profile,
+            )
+
+        data_model = get_data_model(data_pool_id, data_model_id)
+        row_counts = data_model_row_counts(data_model)
+        last_load = data_model_last_load(data_model)
+        version = f"{data_model_version(row_counts, last_load)}-{profile.name}"
+        cached_path = cache.lookup(data_pool_id, data_model_id, version)
+        if cached_path is not None:
+            logger.info("Reusing local copy of the data model: %s", cached_path)
+            progress_call_back(1.0)
+            return shared_accessor(cached_path)
+
+        path = cache.path(data_pool_id, data_model_id, version)
+        os.makedirs(cache.cache_dir, exist_ok=True)
+        # Written under a temporary name, so an aborted load is never reused
+        tmp_path = path + ".tmp"
+        DataModelCache._remove(tmp_path)
+
+        previous_path = cache.latest(
+            data_pool_id, data_model_id, suffix=f"-{profile.name}"
+        )
+        refreshed = False
+        # The previous copy may be in use by other sessions, so the refresh works
+        # on a snapshot of it
+        if previous_path is not None and cls._snapshot(previous_path, tmp_path):
+            snapshot = cls(database=tmp_path, query_cache_bytes=0)
+            try:
+                refreshed = snapshot._refresh_local_copy(
+                    data_pool_id,
+                    data_model_id,
+                    view,
+                    row_counts,
+                    last_load,
+                    progress_call_back,
+                    profile,
+                )
+            finally:
+                snapshot.close()
+        if not refreshed:
+            DataModelCache._remove(tmp_path)
+            cls._copy_data_model(
+                data_pool_id,
+                data_model_id,
+                view,
+                progress_call_back,
+                tmp_path,
+                profile,
+                last_load,
+            ).close()
+        os.replace(tmp_path, path)
+
+        cache.remove_other_versions(
+            data_pool_id, data_model_id, keep=path, suffix=f"-{profile.name}"
+        )
+        cache.evict(keep=path)
+        return shared_accessor(path)
+
+    @classmethod
+    def _snapshot(cls, database: str, snapshot_path: str) -> bool:
+        """Copies a database file after checkpointing it, which fails if another
+        session is in the middle of a transaction on it."""
+        # Connections of the same process share the database instance, so this
+        # also checkpoints the copy other sessions have open
+        accessor = cls(database=database, query_cache_bytes=0)
+        try:
+            accessor.checkpoint()
+        except duckdb.Error as error:
+            logger.warning("Could not checkpoint %s: %s", database, error)
+            return False
+        finally:
+            accessor.close()
+        shutil.copyfile(database, snapshot_path)
+        return True
+
+    @classmethod
+    def _copy_data_model(
+        cls,
+        data_pool_id: str,
+        data_model_id: str,
+        view: SQLView,
+        progress_call_back: Callable[[float], None],
+        database: str,
+        profile: ExportProfile = FULL_EXPORT_PROFILE,
+        last_load: Optional[str] = None,
     ) -> "LocalDuckDBAccessor":
         def _progress_call_back(progress: float) -> None:
             progress_call_back((progress * 4) / 5)
@@ -46,41 +277,191 @@ class LocalDuckDBAccessor(SQLAccessor):
             output_dir="tmp",
             progress_call_back=_progress_call_back,
             export_foreign_keys=False,
+            tables=view.tables,
+            profile=profile,
         )
 
-        parquet_files = [
-            os.path.join("tmp", file)
-            for file in os.listdir("tmp")
-            if file.endswith(".parquet")
+        duckdb_accessor = cls(database=database)
+        table_files = _exported_table_files("tmp")
+        tables_to_load = [table for table in table_files if table in view.tables]
+        duckdb_accessor._load_tables(
+            table_files, tables_to_load, {}, progress_call_back
+        )
+        duckdb_accessor._update_watermarks(tables_to_load, last_load)
+
+        shutil.rmtree("tmp")
+        return duckdb_accessor
+
+    def _refresh_local_copy(
+        self,
+        data_pool_id: str,
+        data_model_id: str,
+        view: SQLView,
+        row_counts: dict[str, int],
+        last_load: Optional[str],
+        progress_call_back: Callable[[float], None],
+        profile: ExportProfile = FULL_EXPORT_PROFILE,
+    ) -> bool:
+        """Exports only the tables whose row count changed since the copy was made,
+        or all tables if the data model was loaded again. As a load may update rows
+        in place, only tables that grew without a new load (e.g. if the last load is
+        unknown) and have a Time column are exported from their watermark on and
+        appended, all others are exported again. The refresh runs in a single
+        transaction and returns False, leaving the copy untouched, if the copy has no
+        watermarks or the appended rows do not add up to the new row counts."""
+        watermarks = self._watermarks()
+        if watermarks is None:
+            return False
+
+        changed = [
+            table
+            for table in view.tables
+            if table in row_counts
+            and (
+                table not in watermarks
+                or watermarks[table][0] != row_counts[table]
+                or watermarks[table][2] != last_load
+            )
         ]
-        created: list[str] = []
-        duckdb_accessor = cls()
+        since = {
+            table: watermarks[table][1]
+            for table in changed
+            if table in watermarks
+            and watermarks[table][1] is not None
+            and watermarks[table][2] == last_load
+            and row_counts[table] > watermarks[table][0]
+        }
+        logger.info(
+            "Refreshing %d tables of the local copy, %d of them incrementally",
+            len(changed),
+            len(since),
+        )
 
-        for index, file_path in enumerate(parquet_files):
-            table_name = "_".join(os.path.basename(file_path).split("_")[:-1])
+        def _progress_call_back(progress: float) -> None:
+            progress_call_back((progress * 4) / 5)
 
-            if table_name not in view.tables:
-                continue
+        shutil.rmtree("tmp", ignore_errors=True)
+        try:
+            if changed:
+                all_tables_to_parquet(
+                    data_pool_id,
+                    data_model_id,
+                    output_dir="tmp",
+                    progress_call_back=_progress_call_back,
+                    export_foreign_keys=False,
+                    tables=changed,
+                    profile=profile,
+                    table_filters={
+                        table: since_filter(table, TIME_COLUMN, timestamp)
+                        for table, timestamp in since.items()
+                    },
+                )
+            table_files = _exported_table_files("tmp") if changed else {}
 
-            df = pd.read_parquet(file_path)
+            self._duckdb_connection.execute("BEGIN TRANSACTION")
+            try:
+                self._load_tables(
+                    table_files,
+                    [table for table in changed if table in table_files],
+                    since,
+                    progress_call_back,
+                )
+                for table in since:
+                    count = self._duckdb_connection.execute(
+                        f"SELECT COUNT(*) FROM {table}"
+                    ).fetchone()[0]
+                    if count != row_counts[table]:
+                        logger.warning(
+                            "Table %s has %d rows after the refresh instead of %d",
+                            table,
+                            count,
+                            row_counts[table],
+                        )
+                        self._duckdb_connection.execute("ROLLBACK")
+                        return False
+                self._update_watermarks(
+                    [table for table in view.tables if table in table_files]
+                    + [table for table in watermarks if table not in table_files],
+                    last_load,
+                )
+                self._duckdb_connection.execute("COMMIT")
+            except Exception:
+                self._duckdb_connection.execute("ROLLBACK")
+                raise
+        finally:
+            shutil.rmtree("tmp", ignore_errors=True)
 
-            duckdb_accessor._duckdb_connection.register("tmp_df", df)
+        progress_call_back(1.0)
+        return True
 
-            if table_name not in created:
-                duckdb_accessor.execute_query(
-                    f"CREATE TABLE {table_name} AS SELECT * FROM tmp_df"
+    def _load_tables(
+        self,
+        table_files: dict[str, list[str]],
+        tables: list[str],
+        since: dict[str, datetime],
+        progress_call_back: Callable[[float], None],
+    ) -> None:
+        """Creates the tables from their exported chunks, or appends the chunks to the
+        tables in since after deleting their rows from the watermark on."""
+        for index, table_name in enumerate(tables):
+            # DuckDB reads all chunks of a table in parallel with its own reader
+            files = ", ".join(f"'{file}'" for file in table_files[table_name])
+            if table_name in since:
+                # The export starts at the watermark itself, rows with exactly that
+                # time are replaced instead of duplicated
+                self._duckdb_connection.execute(
+                    f"DELETE FROM {table_name} WHERE {TIME_COLUMN} >= ?",
+                    [since[table_name]],
+                )
+                self.execute_query(
+                    f"INSERT INTO {table_name} BY NAME "
+                    f"SELECT * FROM read_parquet([{files}])"
                 )
-                created.append(table_name)
             else:
-                duckdb_accessor.execute_query(
-                    f"INSERT INTO {table_name} SELECT * FROM tmp_df"
+                self.execute_query(
+                    f"CREATE OR REPLACE TABLE {table_name} AS "
+                    f"SELECT * FROM read_parquet([{files}])"
                 )
+            progress_call_back(0.8 + (((index + 1) / len(tables)) / 5))
 
-            duckdb_accessor._duckdb_connection.unregister("tmp_df")
-            progress_call_back(0.8 + ((index / len(parquet_files)) / 5))
+    def _watermarks(
+        self,
+    ) -> Optional[dict[str, tuple[int, Optional[datetime], Optional[str]]]]:
+        """Row count, maximum time and data model load per table when the copy was
+        last exported. None for copies made before the load was recorded."""
+        exists = self._duckdb_connection.execute(
+            "SELECT COUNT(*) FROM duckdb_columns() "
+            "WHERE table_name = ? AND column_name = 'last_load'",
+            [WATERMARK_TABLE],
+        ).fetchone()[0]
+        if not exists:
+            return None
+        return {
+            table_name: (row_count, max_time, last_load)
+            for table_name, row_count, max_time, last_load in self._duckdb_connection.execute(
+                f"SELECT table_name, row_count, max_time, last_load FROM {WATERMARK_TABLE}"
+            ).fetchall()
+        }
 
-        shutil.rmtree("tmp")
-        return duckdb_accessor
+    def _update_watermarks(
+        self, tables: list[str], last_load: Optional[str] = None
+    ) -> None:
+        self._duckdb_connection.execute(f"""CREATE OR REPLACE TABLE {WATERMARK_TABLE} (
+            table_name VARCHAR, row_count BIGINT, max_time TIMESTAMP,
+            last_load VARCHAR)""")
+        for table_name in tables:
+            columns = {
+                row[0]
+                for row in self._duckdb_connection.execute(
+                    f"DESCRIBE {table_name}"
+                ).fetchall()
+            }
+            max_time = f"MAX({TIME_COLUMN})" if TIME_COLUMN in columns else "NULL"
+            self._duckdb_connection.execute(
+                f"INSERT INTO {WATERMARK_TABLE} "
+                f"SELECT ?, COUNT(*), {max_time}, ? FROM {table_name}",
+                [table_name, last_load],
+            )
 
     @classmethod
     def create_local_copy_from_ocel2(
@@ -108,3 +489,10 @@ class LocalDuckDBAccessor(SQLAccessor):
                 )
 
         return duckdb_accessor
+
+
+@st.cache_resource(show_spinner=False, validate=lambda accessor: not accessor.closed)
+def shared_accessor(database: str) -> LocalDuckDBAccessor:
+    """One accessor per database file for all sessions of the process, so users of
+    the same data model share its copy. Every thread queries with its own cursor."""
+    return LocalDuckDBAccessor(database=database)
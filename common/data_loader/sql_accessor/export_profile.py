@@ -0,0 +1,69 @@
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
+
+from common.data_loader.meta_information.sql_view import SQLView
+from common.data_loader.meta_information.table_meta import TableMeta, TableType
+
+
+@dataclass(frozen=True)
+class ExportProfile:
+    """Tables and columns to export from a data model.
+
+    None for table_types or column_names exports all tables or columns. Columns
+    are kept if their name is in column_names or ends with one of column_suffixes.
+    """
+
+    name: str
+    table_types: Optional[frozenset[TableType]] = None
+    column_names: Optional[frozenset[str]] = None
+    column_suffixes: tuple[str, ...] = ()
+
+    def includes_table(self, table_name: str) -> bool:
+        if self.table_types is None:
+            return True
+        try:
+            return TableMeta.classify_type_based_on_name(table_name) in self.table_types
+        except ValueError:
+            return False
+
+    def includes_column(self, column_name: str) -> bool:
+        return (
+            self.column_names is None
+            or column_name in self.column_names
+            or column_name.endswith(self.column_suffixes)
+        )
+
+    def project_columns(self, column_names: list[str]) -> list[str]:
+        return [name for name in column_names if self.includes_column(name)]
+
+    def restrict_view(self, view: SQLView) -> SQLView:
+        """Copy of the view with only the exported tables and columns."""
+        restricted = SQLView(
+            tables={
+                name: dataclasses.replace(
+                    table,
+                    columns=[
+                        column
+                        for column in table.columns
+                        if self.includes_column(column.sql_ref)
+                    ],
+                )
+                for name, table in view.tables.items()
+                if self.includes_table(name)
+            },
+            foreign_keys=list(view.foreign_keys),
+        )
+        restricted.cleanup_foreign_keys()
+        return restricted
+
+
+FULL_EXPORT_PROFILE = ExportProfile(name="full")
+
+# The combined event log only needs the event id, the timestamp and the objects
+MINING_EXPORT_PROFILE = ExportProfile(
+    name="mining",
+    table_types=frozenset({TableType.EVENT}),
+    column_names=frozenset({"ID", "Time"}),
+    column_suffixes=("_ID",),
+)
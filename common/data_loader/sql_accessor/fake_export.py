@@ -0,0 +1,199 @@
+"""
+Offline stand-in for a Celonis data model, to test and benchmark the export path
+without an EMS connection. Tables are pandas DataFrames, the latencies simulate
+the export queue and the chunk downloads:
+
+    python -m common.data_loader.sql_accessor.fake_export --tables 20 --latency 0.5
+"""
+
+import argparse
+import io
+import json
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from pycelonis.errors import PyCelonisDataExportFailedError
+
+from common.data_loader.sql_accessor.helper import export_data_model
+
+COLUMN_REGEX_PATTERN = re.compile(r'"([^"]+)"\."([^"]+)"')
+COUNT_TABLE_REGEX_PATTERN = re.compile(r'COUNT_TABLE\("([^"]+)"\)')
+CATALOG_FILTER_REGEX_PATTERN = re.compile(r"\"TABLE_NAME\" = '([^']+)'")
+SINCE_FILTER_REGEX_PATTERN = re.compile(r'"[^"]+"\."([^"]+)" >= \{ts \'([^\']+)\'\}')
+
+
+class FakeDataModelTable:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.alias_or_name = name
+
+    def json(self) -> str:
+        return json.dumps({"name": self.name, "alias": None})
+
+
+class FakeDataExport:
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        chunk_rows: int,
+        chunk_latency: float,
+        wait_for_execution: Callable[[], None],
+    ) -> None:
+        self._df = df
+        self._chunk_rows = chunk_rows
+        self._chunk_latency = chunk_latency
+        self.wait_for_execution = wait_for_execution
+
+    def get_chunks(self) -> Iterator[io.BytesIO]:
+        for start in range(0, max(len(self._df), 1), self._chunk_rows):
+            time.sleep(self._chunk_latency)
+            chunk = io.BytesIO()
+            self._df.iloc[start : start + self._chunk_rows].to_parquet(
+                chunk, index=False
+            )
+            chunk.seek(0)
+            yield chunk
+
+
+class FakeDataModel:
+    """Answers the PQL queries of the export path: catalog columns, COUNT_TABLE and
+    column selections of a single table, optionally filtered from a timestamp on.
+    All exports are recorded."""
+
+    def __init__(
+        self,
+        tables: dict[str, pd.DataFrame],
+        latency: float = 0.0,
+        chunk_latency: float = 0.0,
+        chunk_rows: int = 100_000,
+        failing_tables: Optional[set[str]] = None,
+    ) -> None:
+        self.tables = tables
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.chunk_rows = chunk_rows
+        self.failing_tables = failing_tables or set()
+        # Table name, columns and number of rows of every export
+        self.exports: list[tuple[str, list[str], int]] = []
+        # Highest number of exports that were waiting for execution at once
+        self.max_concurrent_exports = 0
+        self._running_exports = 0
+        self._lock = threading.Lock()
+
+    def get_tables(self) -> list[FakeDataModelTable]:
+        return [FakeDataModelTable(name) for name in self.tables]
+
+    def get_foreign_keys(self) -> list[Any]:
+        return []
+
+    def export_data_frame(self, query: Any) -> pd.DataFrame:
+        if any('"System":"Columns"' in column.query for column in query.columns):
+            return self._catalog(query)
+
+        counts = {}
+        for column in query.columns:
+            match = COUNT_TABLE_REGEX_PATTERN.search(column.query)
+            if match is not None:
+                counts[column.name] = [len(self.tables[match.group(1)])]
+        if counts:
+            return pd.DataFrame(counts)
+        return self._select(query)[1]
+
+    def create_data_export(self, query: Any, export_type: Any) -> FakeDataExport:
+        table_name, df = self._select(query)
+        if table_name in self.failing_tables:
+            raise PyCelonisDataExportFailedError(f"Export of {table_name} failed")
+        self.exports.append((table_name, list(df.columns), len(df)))
+        return FakeDataExport(
+            df, self.chunk_rows, self.chunk_latency, self._wait_for_execution
+        )
+
+    def _wait_for_execution(self) -> None:
+        with self._lock:
+            self._running_exports += 1
+            self.max_concurrent_exports = max(
+                self.max_concurrent_exports, self._running_exports
+            )
+        time.sleep(self.latency)
+        with self._lock:
+            self._running_exports -= 1
+
+    def _catalog(self, query: Any) -> pd.DataFrame:
+        filters = [
+            match.group(1)
+            for pql_filter in query.filters
+            for match in [CATALOG_FILTER_REGEX_PATTERN.search(pql_filter.query)]
+            if match is not None
+        ]
+        rows = [
+            (table_name, column_name)
+            for table_name, df in self.tables.items()
+            if not filters or table_name in filters
+            for column_name in df.columns
+        ]
+        return pd.DataFrame(
+            {
+                column.name: [
+                    row[0] if "TABLE_NAME" in column.query else row[1] for row in rows
+                ]
+                for column in query.columns
+            }
+        )
+
+    def _select(self, query: Any) -> tuple[str, pd.DataFrame]:
+        table_name, columns = None, {}
+        for column in query.columns:
+            table_name, column_name = COLUMN_REGEX_PATTERN.search(column.query).groups()
+            columns[column.name] = self.tables[table_name][column_name]
+        df = pd.DataFrame(columns)
+        for pql_filter in query.filters:
+            match = SINCE_FILTER_REGEX_PATTERN.search(pql_filter.query)
+            if match is not None:
+                column_name, timestamp = match.groups()
+                source = self.tables[table_name][column_name]
+                df = df[source >= pd.Timestamp(timestamp)]
+        return table_name, df.reset_index(drop=True)
+
+
+def fake_event_log(tables: int, rows: int) -> dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(0)
+    return {
+        f"e_activity_{i}": pd.DataFrame(
+            {
+                "ID": np.arange(rows),
+                "Time": pd.to_datetime(rng.integers(0, 10**9, rows), unit="s"),
+                "o_order_ID": rng.integers(0, rows // 10 + 1, rows),
+            }
+        )
+        for i in range(tables)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the export path offline")
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--chunk-latency", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    data_model = FakeDataModel(
+        fake_event_log(args.tables, args.rows),
+        latency=args.latency,
+        chunk_latency=args.chunk_latency,
+    )
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            export_data_model(data_model, output_dir, max_workers=workers)
+            print(f"{workers:>3} workers: {time.perf_counter() - start:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
+import hashlib
+import json
 import logging
 import os
+import queue
 import time
-from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from functools import partial
+from typing import Callable, Collection, Optional
 
 import streamlit as st
 import pycelonis
@@ -9,31 +15,67 @@ from pycelonis.config import Config
 from pycelonis.ems.data_integration.data_export import DataExport
 from pycelonis.ems.data_integration.data_model import DataModel
 from pycelonis.ems.data_integration.data_model_table import DataModelTable
-from pycelonis.errors import PyCelonisDataExportFailedError
+from pycelonis.errors import PyCelonisDataExportFailedError, PyCelonisError
 from pycelonis.pql import PQL, PQLColumn, PQLFilter
-from tqdm import tqdm
+from pycelonis.service.integration.service import IntegrationService
+
+from common.data_loader.sql_accessor.export_profile import (
+    FULL_EXPORT_PROFILE,
+    ExportProfile,
+)
 
 logger = logging.getLogger("cloud-process-mining-prototyping")
 
+# Concurrent exports per data model, Celonis queues exports beyond its own limit
+EXPORT_WORKERS = int(os.environ.get("CELONIS_EXPORT_WORKERS", "4"))
+PROGRESS_INTERVAL = 0.1
+CHUNK_BLOCK_SIZE = 1024 * 1024
 
-def build_full_table_query(table: DataModelTable, data_model: DataModel) -> PQL:
-    # Right now there seems to be an issue with table.get_columns() being empty for OCDMs,
-    # therefore we use the system catalog tables for now
+# Progress of a table once its export is created and once it has finished
+EXPORT_CREATED_PROGRESS = 0.1
+EXPORT_FINISHED_PROGRESS = 0.5
 
-    # for column in table.get_columns():
-    #     query += PQLColumn(name=f"{column.name}", query=f""" "{table.alias_or_name}"."{column.name}" """)
 
+def get_table_columns(data_model: DataModel) -> dict[str, list[str]]:
+    """Column names of all tables of the data model, fetched with a single query."""
     column_names_query = PQL(limit=1e6, distinct=True)
     column_names_query += PQLColumn(
-        name="name", query=""" "System":"Columns"."COLUMN_NAME" """
+        name="table", query=""" "System":"Columns"."TABLE_NAME" """
     )
-    column_names_query += PQLFilter(
-        query=f""" FILTER "System":"Columns"."TABLE_NAME" = '{table.alias_or_name}'; """
+    column_names_query += PQLColumn(
+        name="name", query=""" "System":"Columns"."COLUMN_NAME" """
     )
     columns_df = data_model.export_data_frame(column_names_query)
 
+    table_columns: dict[str, list[str]] = {}
+    for table_name, column_name in zip(columns_df["table"], columns_df["name"]):
+        table_columns.setdefault(table_name, []).append(column_name)
+    return table_columns
+
+
+def build_full_table_query(
+    table: DataModelTable,
+    data_model: DataModel,
+    column_names: Optional[list[str]] = None,
+) -> PQL:
+    # Right now there seems to be an issue with table.get_columns() being empty for OCDMs,
+    # therefore we use the system catalog tables for now
+
+    # for column in table.get_columns():
+    #     query += PQLColumn(name=f"{column.name}", query=f""" "{table.alias_or_name}"."{column.name}" """)
+
+    if column_names is None:
+        column_names_query = PQL(limit=1e6, distinct=True)
+        column_names_query += PQLColumn(
+            name="name", query=""" "System":"Columns"."COLUMN_NAME" """
+        )
+        column_names_query += PQLFilter(
+            query=f""" FILTER "System":"Columns"."TABLE_NAME" = '{table.alias_or_name}'; """
+        )
+        column_names = list(data_model.export_data_frame(column_names_query)["name"])
+
     query = PQL()
-    for column_name in columns_df["name"]:
+    for column_name in column_names:
         query += PQLColumn(
             name=f"{column_name}",
             query=f""" "{table.alias_or_name}"."{column_name}" """,
@@ -41,6 +83,70 @@ def build_full_table_query(table: DataModelTable, data_model: DataModel) -> PQL:
     return query
 
 
+def get_data_model(data_pool_id: str, data_model_id: str) -> DataModel:
+    celonis = st.session_state.celonis_instance
+    return (
+        celonis.data_integration.get_data_pools()
+        .find_by_id(data_pool_id)
+        .get_data_models()
+        .find_by_id(data_model_id)
+    )
+
+
+def data_model_row_counts(data_model: DataModel) -> dict[str, int]:
+    """Row counts of all tables of a data model, fetched with a single COUNT_TABLE
+    query instead of an export."""
+    table_names = sorted(table.alias_or_name for table in data_model.get_tables())
+    query = PQL()
+    for i, table_name in enumerate(table_names):
+        query += PQLColumn(
+            name=f"count_{i}", query=f""" COUNT_TABLE("{table_name}") """
+        )
+    row_counts = data_model.export_data_frame(query).iloc[0].tolist()
+    return {name: int(count) for name, count in zip(table_names, row_counts)}
+
+
+def data_model_last_load(data_model: DataModel) -> Optional[str]:
+    """Start, end and status of the latest load of the data model, None if the EMS
+    does not report it (e.g. missing permissions)."""
+    try:
+        load_info = IntegrationService.get_api_pools_pool_id_data_models_data_model_id_load_history_load_info_sync(
+            data_model.client, data_model.pool_id, data_model.id
+        )
+        load = load_info.load_info.current_compute_load
+    except (AttributeError, PyCelonisError) as error:
+        logger.warning(
+            "Load time of data model %s is unavailable, cached copies are only "
+            "versioned by row counts: %s",
+            getattr(data_model, "id", data_model),
+            error,
+        )
+        return None
+    if load is None:
+        return None
+    return f"{load.start_date}/{load.end_date}/{load.load_status}"
+
+
+def data_model_version(
+    row_counts: dict[str, int], last_load: Optional[str] = None
+) -> str:
+    """Fingerprint of the loaded data of a data model: its table names, their row
+    counts and the time of its latest load. Without the load time, rows updated in
+    place by a reload go unnoticed."""
+    fingerprint = json.dumps(
+        [sorted([name, count] for name, count in row_counts.items()), last_load]
+    )
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+def since_filter(table_name: str, column_name: str, since: datetime) -> PQLFilter:
+    """Filter for the rows of a table from the timestamp since on."""
+    timestamp = since.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return PQLFilter(
+        query=f""" FILTER "{table_name}"."{column_name}" >= {{ts '{timestamp}'}}; """
+    )
+
+
 def sizeof_fmt(num: float, suffix: str = "B") -> str:
     for unit in ["", "Ki", "Mi", "Gi", "Ti", "Pi", "Ei", "Zi"]:
         if abs(num) < 1024.0:
@@ -49,39 +155,55 @@ def sizeof_fmt(num: float, suffix: str = "B") -> str:
     return f"{num:.1f}Yi{suffix}"
 
 
-def write_tables(
+def write_table(
+    output_dir: str, table: DataModelTable, data_export: DataExport
+) -> tuple[int, int]:
+    """Downloads the chunks of a finished export. Returns the number of files and
+    their combined size."""
+    exported_files, total_size = 0, 0
+    for i, chunk in enumerate(data_export.get_chunks()):
+        file = f"{output_dir}/{table.alias_or_name}_{i}.parquet"
+        with open(file, "wb") as f_:
+            # Copied in blocks, so a chunk is never held twice in memory
+            for block in iter(partial(chunk.read, CHUNK_BLOCK_SIZE), b""):
+                f_.write(block)
+                total_size += len(block)
+        chunk.close()
+        exported_files += 1
+
+    file_metadata = f"{output_dir}/{table.alias_or_name}.json"
+    with open(file_metadata, "w", encoding="utf8") as f_:
+        f_.write(table.json())
+    return exported_files, total_size
+
+
+def export_table(
     output_dir: str,
     data_model: DataModel,
-    exports: list[DataExport],
-    progress_call_back: Optional[Callable[[float], None]] = None,
-) -> dict[str, int]:
-    counters = {
-        "exported_tables": 0,
-        "exported_files": 0,
-        "total_size": 0,
-    }
-    for i, table in enumerate(tqdm(data_model.get_tables())):
-        if progress_call_back is not None:
-            progress_call_back(((i / len(data_model.get_tables())) / 2) + 0.5)
-        try:
-            data_export: DataExport = exports[i]
-            data_export.wait_for_execution()
-
-            for i, chunk in enumerate(data_export.get_chunks()):
-                file = f"{output_dir}/{table.alias_or_name}_{i}.parquet"
-                with open(file, "wb") as f_:
-                    f_.write(chunk.read())
-                counters["exported_files"] += 1
-                counters["total_size"] += os.path.getsize(file)
-
-            file_metadata = f"{output_dir}/{table.alias_or_name}.json"
-            with open(file_metadata, "w", encoding="utf8") as f_:
-                f_.write(table.json())
-            counters["exported_tables"] += 1
-        except PyCelonisDataExportFailedError as error:
-            print(
-                f"Could not export table '{table.alias_or_name}' to parquet.{os.linesep}The error is: {error}"
-            )
+    table: DataModelTable,
+    query: PQL,
+    report: Callable[[str, float], None],
+) -> Optional[tuple[int, int]]:
+    """Creates, waits for and downloads the export of a single table. Returns None
+    if Celonis fails to export the table."""
+    try:
+        data_export = data_model.create_data_export(
+            query=query,
+            export_type=pycelonis.service.integration.service.ExportType.PARQUET,
+        )
+        report(table.alias_or_name, EXPORT_CREATED_PROGRESS)
+        data_export.wait_for_execution()
+        report(table.alias_or_name, EXPORT_FINISHED_PROGRESS)
+        counters = write_table(output_dir, table, data_export)
+    except PyCelonisDataExportFailedError as error:
+        logger.warning(
+            "Could not export table '%s' to parquet.%sThe error is: %s",
+            table.name,
+            os.linesep,
+            error,
+        )
+        counters = None
+    report(table.alias_or_name, 1.0)
     return counters
 
 
@@ -103,6 +225,10 @@ def all_tables_to_parquet(
     output_dir: str,
     progress_call_back: Optional[Callable[[float], None]] = None,
     export_foreign_keys: bool = True,
+    tables: Optional[Collection[str]] = None,
+    table_progress_call_back: Optional[Callable[[str, float], None]] = None,
+    profile: ExportProfile = FULL_EXPORT_PROFILE,
+    table_filters: Optional[dict[str, PQLFilter]] = None,
 ) -> None:
     """Exports all tables of the given datamodel to individual parquet files in the specified directory
 
@@ -110,41 +236,101 @@ def all_tables_to_parquet(
         data_pool_id (str): The data pool ID
         data_model_id (str): The data model ID
         output_dir (str): The output directory
+        tables (Collection[str], optional): Only export the tables with these names
+        table_progress_call_back (Callable[[str, float], None], optional): Called
+            with the table name and its progress
+        profile (ExportProfile, optional): The tables and columns to export
+        table_filters (dict[str, PQLFilter], optional): Only export the rows of these
+            tables that match the filter
+    """
+    export_data_model(
+        get_data_model(data_pool_id, data_model_id),
+        output_dir,
+        progress_call_back=progress_call_back,
+        export_foreign_keys=export_foreign_keys,
+        tables=tables,
+        table_progress_call_back=table_progress_call_back,
+        profile=profile,
+        table_filters=table_filters,
+    )
+
+
+def export_data_model(
+    data_model: DataModel,
+    output_dir: str,
+    progress_call_back: Optional[Callable[[float], None]] = None,
+    export_foreign_keys: bool = True,
+    tables: Optional[Collection[str]] = None,
+    table_progress_call_back: Optional[Callable[[str, float], None]] = None,
+    profile: ExportProfile = FULL_EXPORT_PROFILE,
+    table_filters: Optional[dict[str, PQLFilter]] = None,
+    max_workers: int = EXPORT_WORKERS,
+) -> None:
+    """Exports the tables of a data model with up to max_workers concurrent exports.
+
+    The call backs are only called from the calling thread, as Streamlit elements
+    cannot be updated from the worker threads.
     """
     Config.DISABLE_TQDM = True
     start_time = time.perf_counter()
 
     os.makedirs(output_dir, exist_ok=True)
-    celonis = st.session_state.celonis_instance
+    selected_tables = [
+        table
+        for table in data_model.get_tables()
+        if (tables is None or table.alias_or_name in tables)
+        and profile.includes_table(table.alias_or_name)
+    ]
+    table_columns = get_table_columns(data_model)
 
-    data_model = (
-        celonis.data_integration.get_data_pools()
-        .find_by_id(data_pool_id)
-        .get_data_models()
-        .find_by_id(data_model_id)
-    )
+    updates: queue.Queue[tuple[str, float]] = queue.Queue()
+    table_progress = {table.alias_or_name: 0.0 for table in selected_tables}
 
-    exports = list(range(len(data_model.get_tables())))
-    for i, table in enumerate(data_model.get_tables()):
-        try:
-            # Export data to PARQUET files
+    def report_updates() -> None:
+        while not updates.empty():
+            table_name, progress = updates.get()
+            table_progress[table_name] = progress
+            if table_progress_call_back is not None:
+                table_progress_call_back(table_name, progress)
             if progress_call_back is not None:
-                progress_call_back((i / len(data_model.get_tables())) / 2)
-            exports[i] = data_model.create_data_export(
-                query=build_full_table_query(table, data_model),
-                export_type=pycelonis.service.integration.service.ExportType.PARQUET,
-            )
-        except PyCelonisDataExportFailedError as error:
-            logger.warning(
-                "Could not export table '%s' to parquet.%sThe error is: %s",
-                table.name,
-                os.linesep,
-                error,
+                progress_call_back(sum(table_progress.values()) / len(table_progress))
+
+    queries = {}
+    for table in selected_tables:
+        query = build_full_table_query(
+            table,
+            data_model,
+            profile.project_columns(table_columns.get(table.alias_or_name, [])),
+        )
+        if table_filters is not None and table.alias_or_name in table_filters:
+            query += table_filters[table.alias_or_name]
+        queries[table.alias_or_name] = query
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                export_table,
+                output_dir,
+                data_model,
+                table,
+                queries[table.alias_or_name],
+                lambda table_name, progress: updates.put((table_name, progress)),
             )
+            for table in selected_tables
+        ]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=PROGRESS_INTERVAL)
+            report_updates()
+        report_updates()
+        results = [future.result() for future in futures]
 
-    counters = write_tables(
-        output_dir, data_model, exports, progress_call_back=progress_call_back
-    )
+    exported = [counters for counters in results if counters is not None]
+    counters = {
+        "exported_tables": len(exported),
+        "exported_files": sum(files for files, _ in exported),
+        "total_size": sum(size for _, size in exported),
+    }
     if export_foreign_keys:
         write_foreign_keys(output_dir, data_model)
     end_time = time.perf_counter()
@@ -153,8 +339,8 @@ def all_tables_to_parquet(
         + f"to {counters['exported_files']} files "
         + f"with a combined size of {sizeof_fmt(counters['total_size'])} in {end_time - start_time:.0f} seconds."
     )
-    if counters["exported_tables"] != len(data_model.get_tables()):
+    if counters["exported_tables"] != len(selected_tables):
         logger.warning(
             "%d tables could not be exported.",
-            len(data_model.get_tables()) - counters["exported_tables"],
+            len(selected_tables) - counters["exported_tables"],
         )
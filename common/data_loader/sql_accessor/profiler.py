@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+from common.data_loader.sql_accessor.query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+PROFILE_BUFFER_SIZE = int(os.environ.get("SQL_PROFILE_BUFFER_SIZE", "1000"))
+SLOW_QUERY_SECONDS = float(os.environ.get("SQL_SLOW_QUERY_SECONDS", "1.0"))
+# Runs slow read-only queries a second time with EXPLAIN ANALYZE
+EXPLAIN_SLOW_QUERIES = os.environ.get("SQL_EXPLAIN_SLOW_QUERIES", "0") == "1"
+
+
+@dataclass
+class QueryProfile:
+    """Timing and result size of a single query. bytes is the size of the result as
+    materialized by the accessor (DataFrame, Arrow or NumPy)."""
+
+    query: str
+    method: str
+    seconds: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    cached: bool = False
+    plan: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+
+
+class QueryProfiler:
+    """Keeps the profiles of the last max_entries queries and logs slow ones."""
+
+    def __init__(
+        self,
+        max_entries: int = PROFILE_BUFFER_SIZE,
+        slow_query_seconds: float = SLOW_QUERY_SECONDS,
+        explain_slow_queries: bool = EXPLAIN_SLOW_QUERIES,
+    ) -> None:
+        self.profiles: deque[QueryProfile] = deque(maxlen=max_entries)
+        self.slow_query_seconds = slow_query_seconds
+        self.explain_slow_queries = explain_slow_queries
+        self._lock = threading.Lock()
+
+    def is_slow(self, profile: QueryProfile) -> bool:
+        return profile.seconds >= self.slow_query_seconds
+
+    def record(self, profile: QueryProfile) -> None:
+        with self._lock:
+            self.profiles.append(profile)
+        if self.is_slow(profile):
+            logger.warning(
+                "Slow query (%.2f s, %d rows, %d bytes): %s%s",
+                profile.seconds,
+                profile.rows,
+                profile.bytes,
+                normalize_query(profile.query),
+                f"\n{profile.plan}" if profile.plan else "",
+            )
+
+    def slow_queries(self) -> list[QueryProfile]:
+        with self._lock:
+            return [profile for profile in self.profiles if self.is_slow(profile)]
+
+    def top_queries(self, n: int = 10) -> pd.DataFrame:
+        """The n queries with the highest total time in the buffer."""
+        with self._lock:
+            profiles = list(self.profiles)
+        df = pd.DataFrame(
+            {
+                "Query": [normalize_query(profile.query) for profile in profiles],
+                "Seconds": [profile.seconds for profile in profiles],
+                "Rows": [profile.rows for profile in profiles],
+                "Bytes": [profile.bytes for profile in profiles],
+                "Cached": [profile.cached for profile in profiles],
+            }
+        )
+        top = (
+            df.groupby("Query")
+            .agg(
+                **{
+                    "Calls": ("Seconds", "size"),
+                    "Total Time (s)": ("Seconds", "sum"),
+                    "Mean Time (s)": ("Seconds", "mean"),
+                    "Max Time (s)": ("Seconds", "max"),
+                    "Rows": ("Rows", "sum"),
+                    "Bytes": ("Bytes", "sum"),
+                    "Cache Hits": ("Cached", "sum"),
+                }
+            )
+            .sort_values("Total Time (s)", ascending=False)
+            .head(n)
+        )
+        return top.reset_index()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.profiles.clear()
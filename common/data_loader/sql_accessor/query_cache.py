@@ -0,0 +1,101 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(os.environ.get("SQL_QUERY_CACHE_MB", "256")) * 1024**2
+
+# Statements that only read, everything else invalidates the cache
+READ_ONLY_STATEMENTS = ("SELECT", "WITH", "FROM", "VALUES", "SHOW", "DESCRIBE")
+NON_DETERMINISTIC_REGEX_PATTERN = re.compile(
+    r"\b(random|uuid|gen_random_uuid|now|current_timestamp|current_date|"
+    r"current_time|get_current_timestamp)\b",
+    re.IGNORECASE,
+)
+# String literals and quoted identifiers, whose whitespace must be kept
+QUOTED_REGEX_PATTERN = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+WHITESPACE_REGEX_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Collapses whitespace outside of quotes and drops a trailing semicolon."""
+    parts = QUOTED_REGEX_PATTERN.split(query)
+    # Quoted parts are at the odd positions of the split
+    normalized = "".join(
+        part if i % 2 else WHITESPACE_REGEX_PATTERN.sub(" ", part)
+        for i, part in enumerate(parts)
+    )
+    return normalized.strip().rstrip(";").strip()
+
+
+def is_read_only(query: str) -> bool:
+    first_word = normalize_query(query).split(" ", 1)[0].upper()
+    return first_word in READ_ONLY_STATEMENTS
+
+
+class QueryCache:
+    """Results of read-only queries, keyed by the normalized SQL.
+
+    The least recently used results are evicted once their combined size exceeds
+    max_bytes. Results are copied on the way in and out, so callers may modify
+    them.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def is_cacheable(query: str) -> bool:
+        return is_read_only(query) and not NON_DETERMINISTIC_REGEX_PATTERN.search(query)
+
+    def get(self, query: str) -> Optional[pd.DataFrame]:
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[0].copy()
+
+    def put(self, query: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (df.copy(), size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
@@ -0,0 +1,157 @@
+import os
+
+import pandas as pd
+
+from common.data_loader.meta_information.sql_view import SQLView
+from common.data_loader.sql_accessor import duckdb as duckdb_module
+from common.data_loader.sql_accessor import helper
+from common.data_loader.sql_accessor.cache import DataModelCache
+from common.data_loader.sql_accessor.duckdb import LocalDuckDBAccessor
+from common.data_loader.sql_accessor.export_profile import (
+    FULL_EXPORT_PROFILE,
+    MINING_EXPORT_PROFILE,
+)
+from common.data_loader.sql_accessor.fake_export import FakeDataModel
+
+
+def _write(path, size, mtime):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_path_and_lookup(tmp_path):
+    cache = DataModelCache(str(tmp_path))
+    path = cache.path("pool/1", "model 2", "abc")
+
+    assert os.path.dirname(path) == str(tmp_path)
+    assert os.path.basename(path) == "pool1_model2_abc.duckdb"
+    assert cache.lookup("pool/1", "model 2", "abc") is None
+
+    _write(path, 1, 1_000)
+    assert cache.lookup("pool/1", "model 2", "abc") == path
+    assert os.path.getmtime(path) > 1_000
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = DataModelCache(str(tmp_path), max_bytes=25)
+    old, middle, new = (cache.path("p", "m", v) for v in ("a", "b", "c"))
+    _write(old, 10, 1_000)
+    _write(old + ".wal", 5, 1_000)
+    _write(middle, 10, 2_000)
+    _write(new, 10, 3_000)
+
+    cache.evict(keep=new)
+
+    assert not os.path.exists(old)
+    assert not os.path.exists(old + ".wal")
+    assert os.path.exists(middle)
+    assert os.path.exists(new)
+
+
+def test_evict_never_removes_kept_file(tmp_path):
+    cache = DataModelCache(str(tmp_path), max_bytes=5)
+    path = cache.path("p", "m", "a")
+    _write(path, 10, 1_000)
+
+    cache.evict(keep=path)
+
+    assert os.path.exists(path)
+
+
+def test_remove_other_versions(tmp_path):
+    cache = DataModelCache(str(tmp_path))
+    current = cache.path("p", "m", "new")
+    outdated = cache.path("p", "m", "old")
+    other_model = cache.path("p", "other", "old")
+    for path in (current, outdated, other_model):
+        _write(path, 1, 1_000)
+
+    cache.remove_other_versions("p", "m", keep=current)
+
+    assert os.path.exists(current)
+    assert not os.path.exists(outdated)
+    assert os.path.exists(other_model)
+
+
+def test_remove_other_versions_keeps_other_profiles(tmp_path):
+    cache = DataModelCache(str(tmp_path))
+    current = cache.path("p", "m", "new-mining")
+    outdated = cache.path("p", "m", "old-mining")
+    full_profile = cache.path("p", "m", "old-full")
+    for path in (current, outdated, full_profile):
+        _write(path, 1, 1_000)
+
+    cache.remove_other_versions("p", "m", keep=current, suffix="-mining")
+
+    assert os.path.exists(current)
+    assert not os.path.exists(outdated)
+    assert os.path.exists(full_profile)
+
+
+def test_data_model_copy_is_reused(tmp_path, monkeypatch):
+    data_model = FakeDataModel({"e_create": pd.DataFrame({"ID": [1, 2]})})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(helper, "get_data_model", lambda *args: data_model)
+    monkeypatch.setattr(duckdb_module, "get_data_model", lambda *args: data_model)
+
+    view = SQLView(tables={"e_create": None}, foreign_keys=[])
+    cache = DataModelCache(str(tmp_path / "cache"))
+    progress = []
+
+    first = LocalDuckDBAccessor.create_local_copy_of_data_model(
+        "p", "m", view, progress.append, cache=cache
+    )
+    first.close()
+    second = LocalDuckDBAccessor.create_local_copy_of_data_model(
+        "p", "m", view, progress.append, cache=cache
+    )
+
+    assert len(data_model.exports) == 1
+    assert os.path.basename(second.database).endswith("-full.duckdb")
+    assert second.execute_query("SELECT COUNT(*) AS n FROM e_create")["n"][0] == 2
+    assert progress[-1] == 1.0
+    assert not os.path.exists(second.database + ".tmp")
+
+
+def test_data_model_copy_is_refreshed_after_reload(tmp_path, monkeypatch):
+    data_model = FakeDataModel({"e_create": pd.DataFrame({"ID": [1, 2]})})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(helper, "get_data_model", lambda *args: data_model)
+    monkeypatch.setattr(duckdb_module, "get_data_model", lambda *args: data_model)
+    last_load = "2024-01-01 10:00"
+    monkeypatch.setattr(duckdb_module, "data_model_last_load", lambda *args: last_load)
+
+    view = SQLView(tables={"e_create": None}, foreign_keys=[])
+    cache = DataModelCache(str(tmp_path / "cache"))
+    LocalDuckDBAccessor.create_local_copy_of_data_model(
+        "p", "m", view, lambda progress: None, cache=cache
+    ).close()
+
+    # A reload that updates rows in place keeps the row counts
+    data_model.tables["e_create"]["ID"] = [3, 4]
+    last_load = "2024-01-02 10:00"
+    accessor = LocalDuckDBAccessor.create_local_copy_of_data_model(
+        "p", "m", view, lambda progress: None, cache=cache
+    )
+
+    assert len(data_model.exports) == 2
+    assert accessor.execute_query("SELECT SUM(ID) AS s FROM e_create")["s"][0] == 7
+
+
+def test_data_model_copies_of_both_profiles_are_kept(tmp_path, monkeypatch):
+    data_model = FakeDataModel({"e_create": pd.DataFrame({"ID": [1, 2]})})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(helper, "get_data_model", lambda *args: data_model)
+    monkeypatch.setattr(duckdb_module, "get_data_model", lambda *args: data_model)
+
+    view = SQLView(tables={"e_create": None}, foreign_keys=[])
+    cache = DataModelCache(str(tmp_path / "cache"))
+    for profile in (FULL_EXPORT_PROFILE, MINING_EXPORT_PROFILE, FULL_EXPORT_PROFILE):
+        LocalDuckDBAccessor.create_local_copy_of_data_model(
+            "p", "m", view, lambda progress: None, cache=cache, profile=profile
+        ).close()
+
+    # The second full profile load reuses its copy instead of exporting again
+    assert len(data_model.exports) == 2
+    assert len(os.listdir(cache.cache_dir)) == 2
@@ -0,0 +1,247 @@
+import os
+import threading
+
+import duckdb
+import pandas as pd
+import pytest
+
+from common.data_loader.meta_information.sql_view import SQLView
+from common.data_loader.sql_accessor import duckdb as duckdb_module
+from common.data_loader.sql_accessor import helper
+from common.data_loader.sql_accessor.cache import DataModelCache
+from common.data_loader.sql_accessor.duckdb import (
+    LocalDuckDBAccessor,
+    shared_accessor,
+)
+from common.data_loader.sql_accessor.fake_export import FakeDataModel
+
+
+def test_chunks_are_loaded_per_table(tmp_path, monkeypatch):
+    requested = {}
+
+    def fake_export(data_pool_id, data_model_id, output_dir, tables=None, **kwargs):
+        requested["tables"] = set(tables)
+        os.makedirs(output_dir, exist_ok=True)
+        chunks = {
+            "e_create_0": [1, 2],
+            "e_create_1": [3],
+            "e_create_order_0": [4],
+            "o_order_0": [5],
+        }
+        for name, ids in chunks.items():
+            pd.DataFrame({"ID": ids}).to_parquet(
+                os.path.join(output_dir, f"{name}.parquet")
+            )
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(duckdb_module, "all_tables_to_parquet", fake_export)
+
+    view = SQLView(tables={"e_create": None, "e_create_order": None}, foreign_keys=[])
+    progress = []
+    accessor = LocalDuckDBAccessor.create_local_copy_of_data_model(
+        "p", "m", view, progress.append
+    )
+
+    assert requested["tables"] == {"e_create", "e_create_order"}
+    assert accessor.execute_query("SELECT ID FROM e_create ORDER BY ID")[
+        "ID"
+    ].tolist() == [1, 2, 3]
+    assert accessor.execute_query("SELECT ID FROM e_create_order")["ID"].tolist() == [4]
+    tables = accessor.execute_query("SHOW TABLES")["name"].tolist()
+    assert "o_order" not in tables
+    assert progress[-1] == 1.0
+    assert not os.path.exists("tmp")
+
+
+def _times(*days):
+    return pd.to_datetime([f"2024-01-{day:02d}" for day in days])
+
+
+@pytest.fixture
+def cached_copy(tmp_path, monkeypatch):
+    data_model = FakeDataModel(
+        {
+            "e_create": pd.DataFrame({"ID": [1, 2, 3], "Time": _times(1, 2, 3)}),
+            "o_order": pd.DataFrame({"ID": [1], "Name": ["a"]}),
+        }
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(helper, "get_data_model", lambda *args: data_model)
+    monkeypatch.setattr(duckdb_module, "get_data_model", lambda *args: data_model)
+
+    view = SQLView(tables={"e_create": None, "o_order": None}, foreign_keys=[])
+    cache = DataModelCache(str(tmp_path / "cache"))
+
+    def load():
+        data_model.exports.clear()
+        return LocalDuckDBAccessor.create_local_copy_of_data_model(
+            "p", "m", view, lambda progress: None, cache=cache
+        )
+
+    load().close()
+    return data_model, load, cache
+
+
+def test_appended_rows_are_exported_incrementally(cached_copy):
+    data_model, load, cache = cached_copy
+    data_model.tables["e_create"] = pd.DataFrame(
+        {"ID": [1, 2, 3, 4, 5], "Time": _times(1, 2, 3, 3, 4)}
+    )
+
+    accessor = load()
+
+    assert data_model.exports == [("e_create", ["ID", "Time"], 3)]
+    assert accessor.execute_query("SELECT ID FROM e_create ORDER BY ID")[
+        "ID"
+    ].tolist() == [1, 2, 3, 4, 5]
+    assert [os.path.basename(path) for path in cache._entries()] == [
+        os.path.basename(accessor.database)
+    ]
+
+
+def test_grown_tables_are_exported_again_after_reload(cached_copy, monkeypatch):
+    data_model, load, _ = cached_copy
+    # The reload appended rows and updated the existing ones in place
+    data_model.tables["e_create"] = pd.DataFrame(
+        {"ID": [10, 20, 30, 4, 5], "Time": _times(1, 2, 3, 3, 4)}
+    )
+    monkeypatch.setattr(
+        duckdb_module, "data_model_last_load", lambda *args: "2024-01-05 10:00"
+    )
+
+    accessor = load()
+
+    assert ("e_create", ["ID", "Time"], 5) in data_model.exports
+    assert accessor.execute_query("SELECT ID FROM e_create ORDER BY ID")[
+        "ID"
+    ].tolist() == [4, 5, 10, 20, 30]
+
+
+def test_changed_tables_without_time_are_exported_again(cached_copy):
+    data_model, load, _ = cached_copy
+    data_model.tables["o_order"] = pd.DataFrame({"ID": [1, 2], "Name": ["a", "b"]})
+
+    accessor = load()
+
+    assert data_model.exports == [("o_order", ["ID", "Name"], 2)]
+    assert accessor.execute_query("SELECT COUNT(*) AS n FROM o_order")["n"][0] == 2
+
+
+def test_refresh_falls_back_to_full_export(cached_copy):
+    data_model, load, _ = cached_copy
+    # Rows before the watermark can not be found by the delta export
+    data_model.tables["e_create"] = pd.DataFrame(
+        {"ID": [0, 1, 2, 3], "Time": _times(1, 1, 2, 3)}
+    )
+
+    accessor = load()
+
+    assert ("e_create", ["ID", "Time"], 4) in data_model.exports
+    assert accessor.execute_query("SELECT ID FROM e_create ORDER BY ID")[
+        "ID"
+    ].tolist() == [0, 1, 2, 3]
+
+
+@pytest.fixture
+def accessor():
+    accessor = LocalDuckDBAccessor()
+    accessor.execute_query(
+        "CREATE TABLE t AS SELECT range AS ID, range * 0.5 AS Value FROM range(10)"
+    )
+    return accessor
+
+
+def test_execute_arrow(accessor):
+    table = accessor.execute_arrow("SELECT * FROM t ORDER BY ID")
+
+    assert table.column_names == ["ID", "Value"]
+    assert table.num_rows == 10
+
+
+def test_execute_batches(accessor):
+    batches = list(accessor.execute_batches("SELECT * FROM t ORDER BY ID", 4))
+
+    assert sum(batch.num_rows for batch in batches) == 10
+    assert max(batch.num_rows for batch in batches) <= 4
+    assert batches[0].column(0).to_pylist()[:2] == [0, 1]
+
+
+def test_execute_batches_stopped_early(accessor, monkeypatch):
+    class TrackingConnection:
+        def __init__(self, connection):
+            self.connection = connection
+            self.cursors = []
+
+        def cursor(self):
+            self.cursors.append(self.connection.cursor())
+            return self.cursors[-1]
+
+        def __getattr__(self, name):
+            return getattr(self.connection, name)
+
+    connection = TrackingConnection(accessor._duckdb_connection)
+    monkeypatch.setattr(
+        LocalDuckDBAccessor, "_duckdb_connection", property(lambda self: connection)
+    )
+    batches = accessor.execute_batches("SELECT * FROM t ORDER BY ID", 4)
+
+    assert next(batches).num_rows == 4
+    batches.close()
+
+    with pytest.raises(duckdb.ConnectionException):
+        connection.cursors[0].execute("SELECT 1")
+    profile = accessor.profiler.profiles[-1]
+    assert profile.method == "batches"
+    assert profile.rows == 4
+
+
+def test_execute_numpy(accessor):
+    columns = accessor.execute_numpy("SELECT * FROM t ORDER BY ID")
+
+    assert columns["ID"].tolist() == list(range(10))
+    assert columns["Value"][3] == 1.5
+
+
+def test_threads_query_with_their_own_cursors(accessor):
+    cursors, counts = set(), []
+    # All threads are alive at the same time, so none can reuse another's cursor
+    barrier = threading.Barrier(4)
+
+    def query():
+        cursors.add(id(accessor._duckdb_connection))
+        counts.append(accessor.execute_numpy("SELECT COUNT(*) AS n FROM t")["n"][0])
+        barrier.wait()
+
+    threads = [threading.Thread(target=query) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counts == [10] * 4
+    assert len(cursors) == 4
+    assert id(accessor._duckdb_connection) not in cursors
+
+
+def test_cursors_of_finished_threads_are_reused(accessor):
+    used = []
+    for _ in range(3):
+        thread = threading.Thread(
+            target=lambda: used.append(accessor._duckdb_connection)
+        )
+        thread.start()
+        thread.join()
+
+    assert used[0] is used[1] is used[2]
+
+
+def test_shared_accessor_per_database(tmp_path):
+    database = str(tmp_path / "model.duckdb")
+
+    first = shared_accessor(database)
+    assert shared_accessor(database) is first
+
+    first.close()
+    second = shared_accessor(database)
+    assert second is not first
+    assert not second.closed
@@ -0,0 +1,61 @@
+from pycelonis.service.integration.service import PoolColumnType
+
+from common.data_loader.meta_information.column_meta import ColumnMeta
+from common.data_loader.meta_information.foreign_key_meta import ForeignKeyMeta
+from common.data_loader.meta_information.sql_view import SQLView
+from common.data_loader.meta_information.table_meta import TableMeta, TableType
+from common.data_loader.sql_accessor.export_profile import (
+    FULL_EXPORT_PROFILE,
+    MINING_EXPORT_PROFILE,
+)
+
+
+def _table(name, table_type, columns):
+    return TableMeta(
+        sql_ref=name,
+        display_name=name,
+        table_type=table_type,
+        columns=[ColumnMeta(column, PoolColumnType.STRING) for column in columns],
+    )
+
+
+def _view():
+    return SQLView(
+        tables={
+            "e_create": _table(
+                "e_create", TableType.EVENT, ["ID", "Time", "Amount", "o_order_ID"]
+            ),
+            "o_order": _table("o_order", TableType.OBJECT, ["ID", "Name"]),
+        },
+        foreign_keys=[ForeignKeyMeta("o_order", "ID", "e_create", "o_order_ID")],
+    )
+
+
+def test_mining_profile_includes_event_tables_only():
+    assert MINING_EXPORT_PROFILE.includes_table("e_create")
+    assert MINING_EXPORT_PROFILE.includes_table("t_e_create")
+    assert not MINING_EXPORT_PROFILE.includes_table("o_order")
+    assert not MINING_EXPORT_PROFILE.includes_table("unknown")
+    assert FULL_EXPORT_PROFILE.includes_table("unknown")
+
+
+def test_mining_profile_projects_key_columns():
+    assert MINING_EXPORT_PROFILE.project_columns(
+        ["ID", "Time", "Amount", "o_order_ID", "Order_IDX"]
+    ) == ["ID", "Time", "o_order_ID"]
+
+
+def test_restrict_view():
+    view = _view()
+
+    restricted = MINING_EXPORT_PROFILE.restrict_view(view)
+
+    assert list(restricted.tables) == ["e_create"]
+    assert [column.sql_ref for column in restricted.tables["e_create"].columns] == [
+        "ID",
+        "Time",
+        "o_order_ID",
+    ]
+    assert restricted.foreign_keys == []
+    assert len(view.foreign_keys) == 1
+    assert len(view.tables["e_create"].columns) == 4
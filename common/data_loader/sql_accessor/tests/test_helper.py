@@ -0,0 +1,123 @@
+import io
+import os
+import types
+
+import pandas as pd
+
+from common.data_loader.sql_accessor import helper
+from common.data_loader.sql_accessor.fake_export import (
+    FakeDataModel,
+    FakeDataModelTable,
+)
+from common.data_loader.sql_accessor.export_profile import MINING_EXPORT_PROFILE
+from common.data_loader.sql_accessor.helper import export_data_model
+
+
+def _tables():
+    return {
+        "e_create": pd.DataFrame({"ID": [1, 2, 3], "Time": [1, 2, 3]}),
+        "e_pay": pd.DataFrame({"ID": [4], "Time": [4]}),
+        "o_order": pd.DataFrame({"ID": [5], "Name": ["a"]}),
+    }
+
+
+def test_export_writes_all_chunks(tmp_path):
+    data_model = FakeDataModel(_tables(), chunk_rows=2)
+
+    export_data_model(data_model, str(tmp_path), export_foreign_keys=False)
+
+    files = sorted(os.listdir(tmp_path))
+    assert "e_create_0.parquet" in files and "e_create_1.parquet" in files
+    assert "o_order.json" in files
+    df = pd.concat(
+        pd.read_parquet(tmp_path / f"e_create_{i}.parquet") for i in range(2)
+    )
+    assert df["ID"].tolist() == [1, 2, 3]
+
+
+def test_export_reports_progress_per_table(tmp_path):
+    data_model = FakeDataModel(_tables())
+    overall, per_table = [], {}
+
+    export_data_model(
+        data_model,
+        str(tmp_path),
+        progress_call_back=overall.append,
+        export_foreign_keys=False,
+        tables={"e_create", "e_pay"},
+        table_progress_call_back=lambda table, progress: per_table.setdefault(
+            table, []
+        ).append(progress),
+    )
+
+    assert set(per_table) == {"e_create", "e_pay"}
+    assert all(progress[-1] == 1.0 for progress in per_table.values())
+    assert overall == sorted(overall) and overall[-1] == 1.0
+    assert "o_order" not in {table for table, _, _ in data_model.exports}
+    assert not os.path.exists(tmp_path / "o_order_0.parquet")
+
+
+def test_export_runs_concurrently(tmp_path):
+    data_model = FakeDataModel(_tables(), latency=0.3)
+
+    export_data_model(
+        data_model, str(tmp_path), export_foreign_keys=False, max_workers=3
+    )
+
+    assert data_model.max_concurrent_exports > 1
+
+
+def test_failed_export_is_skipped(tmp_path):
+    data_model = FakeDataModel(_tables(), failing_tables={"e_pay"})
+
+    export_data_model(data_model, str(tmp_path), export_foreign_keys=False)
+
+    assert not os.path.exists(tmp_path / "e_pay_0.parquet")
+    assert os.path.exists(tmp_path / "e_create_0.parquet")
+
+
+def test_mining_profile_exports_event_keys_only(tmp_path):
+    tables = _tables()
+    tables["e_create"]["Amount"] = [10, 20, 30]
+    tables["e_create"]["o_order_ID"] = [5, 5, 5]
+    data_model = FakeDataModel(tables)
+
+    export_data_model(
+        data_model,
+        str(tmp_path),
+        export_foreign_keys=False,
+        profile=MINING_EXPORT_PROFILE,
+    )
+
+    assert {table: columns for table, columns, _ in data_model.exports} == {
+        "e_create": ["ID", "Time", "o_order_ID"],
+        "e_pay": ["ID", "Time"],
+    }
+
+
+def test_chunks_are_written_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(helper, "CHUNK_BLOCK_SIZE", 4)
+    chunks = [io.BytesIO(b"0123456789"), io.BytesIO(b"abc")]
+    reads = []
+    for chunk in chunks:
+        read = chunk.read
+        chunk.read = lambda size=-1, read=read: reads.append(size) or read(size)
+    data_export = types.SimpleNamespace(get_chunks=lambda: iter(chunks))
+    table = FakeDataModelTable("e_create")
+
+    exported_files, total_size = helper.write_table(str(tmp_path), table, data_export)
+
+    assert (exported_files, total_size) == (2, 13)
+    assert (tmp_path / "e_create_0.parquet").read_bytes() == b"0123456789"
+    assert (tmp_path / "e_create_1.parquet").read_bytes() == b"abc"
+    assert set(reads) == {4}
+    assert all(chunk.closed for chunk in chunks)
+
+
+def test_data_model_version_includes_last_load():
+    row_counts = {"e_create": 3, "e_pay": 1}
+
+    assert helper.data_model_last_load(FakeDataModel(_tables())) is None
+    assert helper.data_model_version(row_counts) != helper.data_model_version(
+        row_counts, "2024-01-01 10:00"
+    )
@@ -0,0 +1,75 @@
+from common.data_loader.sql_accessor import profiler as profiler_module
+from common.data_loader.sql_accessor.duckdb import LocalDuckDBAccessor
+from common.data_loader.sql_accessor.profiler import QueryProfile, QueryProfiler
+
+
+def test_profiles_are_kept_in_ring_buffer():
+    profiler = QueryProfiler(max_entries=2)
+    for i in range(3):
+        profiler.record(QueryProfile(query=f"SELECT {i}", method="pandas"))
+
+    assert [profile.query for profile in profiler.profiles] == ["SELECT 1", "SELECT 2"]
+
+
+def test_slow_queries_are_logged(monkeypatch):
+    messages = []
+    monkeypatch.setattr(
+        profiler_module.logger,
+        "warning",
+        lambda message, *args: messages.append(message % args),
+    )
+    profiler = QueryProfiler(slow_query_seconds=1.0)
+
+    profiler.record(QueryProfile(query="SELECT 1", method="pandas", seconds=0.1))
+    profiler.record(QueryProfile(query="SELECT 2", method="pandas", seconds=2.0))
+
+    assert [profile.query for profile in profiler.slow_queries()] == ["SELECT 2"]
+    assert len(messages) == 1
+    assert "SELECT 2" in messages[0]
+
+
+def test_top_queries_by_total_time():
+    profiler = QueryProfiler()
+    for query, seconds in [("SELECT 1", 0.5), ("SELECT  1", 0.5), ("SELECT 2", 0.8)]:
+        profiler.record(QueryProfile(query=query, method="pandas", seconds=seconds))
+
+    top = profiler.top_queries()
+
+    assert top["Query"].tolist() == ["SELECT 1", "SELECT 2"]
+    assert top["Calls"].tolist() == [2, 1]
+    assert top["Total Time (s)"].tolist() == [1.0, 0.8]
+
+
+def test_accessor_profiles_all_query_methods():
+    accessor = LocalDuckDBAccessor()
+    query = "SELECT range AS a FROM range(5)"
+
+    accessor.execute_query(query)
+    accessor.execute_query(query)
+    accessor.execute_arrow(query)
+    accessor.execute_numpy(query)
+    list(accessor.execute_batches(query, 2))
+
+    profiles = list(accessor.profiler.profiles)
+    assert [profile.method for profile in profiles] == [
+        "pandas",
+        "pandas",
+        "arrow",
+        "numpy",
+        "batches",
+    ]
+    assert [profile.cached for profile in profiles][:2] == [False, True]
+    assert all(profile.rows == 5 for profile in profiles)
+    assert all(profile.bytes > 0 for profile in profiles)
+
+
+def test_slow_queries_are_explained():
+    accessor = LocalDuckDBAccessor()
+    accessor.profiler = QueryProfiler(slow_query_seconds=0, explain_slow_queries=True)
+
+    accessor.execute_query("CREATE TABLE t AS SELECT 1 AS a")
+    accessor.execute_query("SELECT * FROM t")
+
+    create, select = accessor.profiler.profiles
+    assert create.plan is None
+    assert "TABLE_SCAN" in select.plan.upper().replace(" ", "_")
@@ -0,0 +1,85 @@
+import pandas as pd
+
+from common.data_loader.sql_accessor.duckdb import LocalDuckDBAccessor
+from common.data_loader.sql_accessor.query_cache import (
+    QueryCache,
+    is_read_only,
+    normalize_query,
+)
+
+
+def test_normalize_query_keeps_quoted_whitespace():
+    assert normalize_query("SELECT  *\n FROM t ;") == "SELECT * FROM t"
+    assert normalize_query("SELECT 'a  b'  AS x") == "SELECT 'a  b' AS x"
+    assert normalize_query('SELECT "a  b" FROM t') == 'SELECT "a  b" FROM t'
+
+
+def test_read_only_and_cacheable_queries():
+    assert is_read_only("  with x AS (SELECT 1) SELECT * FROM x")
+    assert not is_read_only("CREATE OR REPLACE TABLE t AS SELECT 1")
+    assert not is_read_only("DROP VIEW v")
+    assert QueryCache.is_cacheable("SELECT * FROM t")
+    assert not QueryCache.is_cacheable("SELECT random() AS r")
+
+
+def test_results_are_copies():
+    cache = QueryCache()
+    df = pd.DataFrame({"a": [1, 2]})
+    cache.put("SELECT a FROM t", df)
+    df.loc[0, "a"] = 10
+
+    first = cache.get("SELECT  a FROM t")
+    first.loc[0, "a"] = 20
+
+    assert cache.get("SELECT a FROM t")["a"].tolist() == [1, 2]
+
+
+def test_least_recently_used_results_are_evicted():
+    df = pd.DataFrame({"a": range(100)})
+    size = int(df.memory_usage(deep=True).sum())
+    cache = QueryCache(max_bytes=2 * size)
+
+    cache.put("SELECT 1", df)
+    cache.put("SELECT 2", df)
+    cache.get("SELECT 1")
+    cache.put("SELECT 3", df)
+
+    assert cache.get("SELECT 2") is None
+    assert cache.get("SELECT 1") is not None
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 2 * size
+
+
+def test_accessor_answers_repeated_queries_from_cache():
+    accessor = LocalDuckDBAccessor()
+    accessor.execute_query("CREATE TABLE t AS SELECT 1 AS a")
+
+    accessor.execute_query("SELECT * FROM t")
+    accessor.execute_query("SELECT *  FROM t;")
+
+    stats = accessor.query_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_accessor_writes_invalidate_cache():
+    accessor = LocalDuckDBAccessor()
+    accessor.execute_query("CREATE TABLE t AS SELECT 1 AS a")
+    assert len(accessor.execute_query("SELECT * FROM t")) == 1
+
+    accessor.execute_query("INSERT INTO t VALUES (2)")
+    assert len(accessor.execute_query("SELECT * FROM t")) == 2
+
+    accessor.execute_query("CREATE OR REPLACE TABLE t AS SELECT 1 AS a")
+    assert len(accessor.execute_query("SELECT * FROM t")) == 1
+
+    view = accessor.create_view("group", "SELECT * FROM t")
+    assert len(accessor.execute_query(f"SELECT * FROM {view}")) == 1
+    assert accessor.query_cache.stats()["invalidations"] == 4
+
+
+def test_query_cache_can_be_disabled():
+    accessor = LocalDuckDBAccessor(query_cache_bytes=0)
+
+    assert accessor.query_cache is None
+    assert accessor.execute_query("SELECT 1 AS a")["a"][0] == 1
@@ -3,7 +3,12 @@ import asyncio
 
 from prototypes.draft.functions import change_page
 from common.data_loader.picker_components.pycelonis import PyCelonisModelPickerComponent
-from prototypes.draft.functions import create_combined_eventlog
+from common.data_loader.sql_accessor.export_profile import MINING_EXPORT_PROFILE
+from prototypes.draft.functions import (
+    combined_eventlog_table,
+    create_combined_eventlog_in_duckdb,
+)
+from prototypes.draft.process_executions import process_execution_size_distribution
 
 
 async def run_picker(picker: PyCelonisModelPickerComponent):
@@ -12,10 +17,43 @@ async def run_picker(picker: PyCelonisModelPickerComponent):
     picker._build_picker()  # bulid the Dropdown
 
 
+# Shows how large the process executions are and allows to split giant ones
+def process_execution_settings():
+    accessor = st.session_state.sql_accessor
+    object_types = [col.replace("_ID", "") for col in st.session_state.object_columns]
+
+    with st.expander("Process Executions"):
+        st.write(
+            "Shared objects like plants or customers can merge almost all events "
+            "into one process execution. Exclude them or choose a leading object type."
+        )
+        st.dataframe(
+            process_execution_size_distribution(
+                accessor._duckdb_connection,
+                combined_eventlog_table(st.session_state.sql_view),
+            ),
+            use_container_width=True,
+        )
+        excluded = st.multiselect("Excluded object types", object_types)
+        leading = st.selectbox(
+            "Leading object type",
+            [""] + [t for t in object_types if t not in excluded],
+        )
+        if st.button("Rebuild Process Executions"):
+            create_combined_eventlog_in_duckdb(
+                accessor,
+                st.session_state.sql_view,
+                excluded_object_types=excluded,
+                leading_object_type=leading or None,
+            )
+            st.rerun()
+
+
 # Tests the data selection view
 def data_selection_view():
     st.title("Select Datasource")
-    picker = PyCelonisModelPickerComponent()
+    # Mining only needs the event tables and their key columns
+    picker = PyCelonisModelPickerComponent(export_profile=MINING_EXPORT_PROFILE)
 
     # async workaround
     loop = asyncio.new_event_loop()
@@ -39,11 +77,16 @@ def data_selection_view():
         accessor = st.session_state.sql_accessor
         meta_infos = st.session_state.sql_view
 
-        create_combined_eventlog(accessor, meta_infos)
+        st.session_state.object_columns = create_combined_eventlog_in_duckdb(
+            accessor, meta_infos
+        )
 
         st.session_state.data_model = f"Datenmodell: {st.session_state.selected_model}"
         st.success("Datamodel has been loaded.")
 
+    if st.session_state.get("object_columns"):
+        process_execution_settings()
+
     col1, col2, col3 = st.columns([1, 8, 1])
 
     with col1:
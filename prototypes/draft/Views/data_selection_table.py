@@ -18,7 +18,8 @@ def data_selection_table():
     )
     df = st.dataframe(
         accessor.execute_query(
-            f"SELECT * FROM {selected_table} ORDER BY process_execution_id DESC LIMIT 5000"
+            f"SELECT * FROM {meta_infos.tables[selected_table].sql_ref} "
+            "ORDER BY process_execution_id DESC LIMIT 5000"
         )
     )
     st.session_state.df = df
@@ -1,11 +1,66 @@
+import time
+
 import streamlit as st
 import pandas as pd
 
-from algorithms.emma.phase3_episode_mining import run_emma_per_trace
+from algorithms.emma.checkpoint import MiningCheckpoint
+from algorithms.emma.cost_estimation import (
+    MEMORY_BUDGET_BYTES,
+    episode_length_cap,
+    estimate_cost,
+    profile_traces,
+)
+from algorithms.emma.phase3_episode_mining import (
+    filter_by_support,
+    group_by_pid,
+    iter_traces_from_batches,
+    run_emma_per_trace,
+    run_emma_per_trace_batches,
+    window_to_seconds,
+)
 from prototypes.draft.functions import (
     change_page,
+    combined_eventlog_table,
     flatten_event_log_with_pid,
+    stream_flat_eventlog,
+)
+from prototypes.draft.mining_cache import (
+    MiningResultCache,
+    cache_key,
+    fingerprint_dataframe,
+    fingerprint_duckdb_table,
 )
+from prototypes.draft.mining_jobs import MiningCancelled, MiningJobRunner
+
+POLL_INTERVAL = 0.5
+
+
+@st.cache_resource
+def get_job_runner():
+    # Shared by all sessions, so running jobs survive reruns of the script
+    return MiningJobRunner()
+
+
+def guard_episode_length(pid_traces, minsup, maxwin, max_length):
+    """
+    Estimates the mining cost before starting and caps the episode length if the
+    estimated peak memory exceeds the budget. Returns the maximum episode length
+    to mine with.
+    """
+    with st.spinner("Estimating mining cost..."):
+        profile = profile_traces(pid_traces, maxwin)
+        estimate = estimate_cost(profile, minsup, max_length)
+    if not estimate.exceeds():
+        return max_length
+
+    cap = episode_length_cap(profile, minsup)
+    st.session_state.mining_notice = (
+        f"The estimated peak memory of {estimate.peak_memory_bytes / 1024**2:,.0f} MB "
+        f"({estimate.candidate_episodes:,.0f} candidate episodes) exceeds the budget "
+        f"of {MEMORY_BUDGET_BYTES / 1024**2:,.0f} MB, so episodes are limited to "
+        f"{cap} steps."
+    )
+    return cap
 
 
 def pattern_view():
@@ -23,16 +78,50 @@ def pattern_view():
         value=2,
         help="Minimum number of occurrences for an episode to be considered frequent",
     )
-    maxwin = st.number_input(
-        "Maximum Window Size",
-        min_value=1,
-        value=3,
-        help="Sliding window size in time units for extending episodes",
+    window_mode = st.radio(
+        "Window Mode",
+        ["Distinct timestamps", "Elapsed time"],
+        horizontal=True,
+        help="Count the window in distinct timestamps or as a real duration",
+    )
+    if window_mode == "Elapsed time":
+        maxwin = st.text_input(
+            "Maximum Window Duration",
+            value="2 days",
+            help="Duration after the first event of an episode, e.g. '2 days' or '3h'",
+        )
+        try:
+            window_to_seconds(maxwin)
+        except ValueError:
+            st.error(
+                f"`{maxwin}` is not a valid duration, use a positive duration "
+                "with a unit such as '2 days' or '3h'."
+            )
+            return
+    else:
+        maxwin = st.number_input(
+            "Maximum Window Size",
+            min_value=1,
+            value=3,
+            help="Sliding window size in time units for extending episodes",
+        )
+    requested_length = st.number_input(
+        "Maximum Episode Length",
+        min_value=0,
+        value=0,
+        help="Maximum number of steps per episode, 0 for no limit",
+    )
+    time_budget = st.number_input(
+        "Time Budget (s)",
+        min_value=0,
+        value=0,
+        help="Stop mining after this many seconds, 0 for no limit",
     )
+    job_key, job = st.session_state.get("mining_job", (None, None))
     col1, col2, col3 = st.columns([2, 6, 2])
 
     with col1:
-        start_mining = st.button("Start Mining")
+        start_mining = st.button("Start Mining", disabled=job is not None)
 
     with col3:
         if st.button("Go to Visualization", disabled=not st.session_state.mining_done):
@@ -41,23 +130,124 @@ def pattern_view():
     if start_mining:
         if st.session_state.operation_mode == "uploadCSV":
             df = st.session_state.df
+
+            if df is None or df.empty:
+                st.error(
+                    "No input data available. Please upload or select a table first."
+                )
+                return
+
+            fingerprint = fingerprint_dataframe(df)
+            total_traces = df["Process_Execution_ID"].nunique()
+            flat_data = flatten_event_log_with_pid(df)
+
+            def traces():
+                return group_by_pid(flat_data).items()
+
+            def mine(on_progress, max_length, checkpoint):
+                return run_emma_per_trace(
+                    flat_data, 1, maxwin, on_progress, max_length, checkpoint
+                )
+
         else:
             accessor = st.session_state.sql_accessor
-            df = accessor.execute_query(
-                "SELECT * FROM 'el_combined_eventlog' LIMIT 50000"
+            table_name = combined_eventlog_table(st.session_state.sql_view)
+            fingerprint = fingerprint_duckdb_table(
+                accessor._duckdb_connection, table_name
             )
+            total_traces = accessor._duckdb_connection.execute(
+                f"SELECT count(DISTINCT Process_Execution_ID) FROM {table_name}"
+            ).fetchone()[0]
 
-        if df is None or df.empty:
-            st.error("No input data available. Please upload or select a table first.")
-            return
+            def traces():
+                return iter_traces_from_batches(
+                    stream_flat_eventlog(accessor, table_name=table_name)
+                )
+
+            def mine(on_progress, max_length, checkpoint):
+                return run_emma_per_trace_batches(
+                    stream_flat_eventlog(accessor, table_name=table_name),
+                    1,
+                    maxwin,
+                    on_progress,
+                    max_length,
+                    checkpoint,
+                )
+
+        # All episodes with a support of at least 1 are kept per (data, maxwin), so
+        # changing minsup only filters them instead of mining again. Capped runs
+        # are stored under the capped length, which is remembered per requested
+        # length so the next click finds them without estimating the cost again.
+        requested_key = cache_key(
+            fingerprint, maxwin=maxwin, max_length=requested_length or None
+        )
+        length_caps = st.session_state.setdefault("episode_length_caps", {})
+        max_length, notice = length_caps.get(
+            requested_key, (requested_length or None, None)
+        )
+        key = cache_key(fingerprint, maxwin=maxwin, max_length=max_length)
+        st.session_state.mining_notice = notice
+        cached_key, all_episodes = st.session_state.get("all_episodes", (None, None))
+        if cached_key == key:
+            st.session_state.episodes = filter_by_support(all_episodes, minsup)
+            st.session_state.mining_done = True
+            st.rerun()
 
-        flat_data = flatten_event_log_with_pid(df)
-        episodes = run_emma_per_trace(flat_data, minsup, maxwin)
+        cache = MiningResultCache()
+        if requested_key not in length_caps and key not in cache:
+            max_length = guard_episode_length(traces(), minsup, maxwin, max_length)
+            length_caps[requested_key] = (max_length, st.session_state.mining_notice)
+            key = cache_key(fingerprint, maxwin=maxwin, max_length=max_length)
 
-        st.session_state.episodes = episodes
-        st.session_state.mining_done = True
+        # A cancelled or crashed run continues from its checkpoint next time
+        checkpoint = MiningCheckpoint(
+            str(cache.cache_dir / f"{key}.checkpoint.jsonl"), params={"key": key}
+        )
+
+        def run(on_progress):
+            episodes = cache.get(key)
+            if episodes is None:
+                episodes = mine(on_progress, max_length, checkpoint)
+                cache.put(key, episodes)
+                checkpoint.discard()
+            return episodes
+
+        # Mining runs in a worker thread, this script only polls the job
+        job = get_job_runner().submit(
+            run, time_budget=time_budget or None, total_traces=total_traces
+        )
+        st.session_state.mining_job = (key, job)
         st.rerun()
 
+    if st.session_state.get("mining_notice"):
+        st.warning(st.session_state.mining_notice)
+
+    if job is not None:
+        if job.done():
+            del st.session_state.mining_job
+            try:
+                all_episodes = job.result()
+            except MiningCancelled as e:
+                st.warning(str(e))
+            else:
+                st.session_state.all_episodes = (job_key, all_episodes)
+                st.session_state.episodes = filter_by_support(all_episodes, minsup)
+                st.session_state.mining_done = True
+                st.rerun()
+        else:
+            status = (
+                f"Mining: {job.traces_done} process executions processed, "
+                f"{job.episodes_found} episodes found ({job.elapsed:.0f} s)"
+            )
+            if job.progress is None:
+                st.text(status)
+            else:
+                st.progress(job.progress, text=status)
+            if st.button("Cancel Mining"):
+                job.cancel()
+            time.sleep(POLL_INTERVAL)
+            st.rerun()
+
     if st.session_state.episodes is not None:
         # Display final episodes
         st.subheader("Frequent Episodes")
@@ -0,0 +1,39 @@
+import os
+
+import streamlit as st
+
+from common.data_loader.sql_accessor.helper import sizeof_fmt
+
+SHOW_QUERY_PROFILE = os.environ.get("SQL_DEBUG_PANEL", "0") == "1"
+
+
+# Debug panel in the sidebar: the queries of the accessor with the highest total time
+def query_profile_panel():
+    accessor = st.session_state.get("sql_accessor")
+    if not SHOW_QUERY_PROFILE or getattr(accessor, "profiler", None) is None:
+        return
+    profiler = accessor.profiler
+
+    with st.sidebar.expander("Query Profile"):
+        st.dataframe(profiler.top_queries(), use_container_width=True, hide_index=True)
+
+        if accessor.query_cache is not None:
+            stats = accessor.query_cache.stats()
+            st.caption(
+                f"Query cache: {stats['hit_rate']:.0%} hits, {stats['entries']} "
+                f"results, {sizeof_fmt(stats['bytes'])}"
+            )
+
+        slow_queries = profiler.slow_queries()
+        if slow_queries:
+            st.write(
+                f"{len(slow_queries)} queries took at least "
+                f"{profiler.slow_query_seconds} s, the latest:"
+            )
+            for profile in slow_queries[-5:]:
+                st.code(profile.query, language="sql")
+                if profile.plan:
+                    st.text(profile.plan)
+
+        if st.button("Reset Query Profile"):
+            profiler.clear()
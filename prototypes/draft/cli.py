@@ -0,0 +1,296 @@
+"""
+Headless EMMA mining without Streamlit, e.g. for nightly batch runs:
+
+    python -m prototypes.draft.cli eventlog.csv -o episodes.parquet --minsup 2 --maxwin 3
+
+The input is a combined event log (CSV or Parquet), a DuckDB database file such as
+a local data model copy, or an OCEL2 JSON log. For DuckDB and OCEL2 inputs the
+combined event log is built from the event tables (see --table to read an existing
+one instead). Process executions are assigned if the log has none yet.
+"""
+
+import argparse
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from algorithms.emma.checkpoint import MiningCheckpoint
+from algorithms.emma.phase3_episode_mining import (
+    filter_by_support,
+    run_emma_per_trace,
+    run_emma_per_trace_parallel,
+    window_to_seconds,
+)
+from algorithms.emma.sampling import run_emma_per_trace_sampled
+from prototypes.draft.functions import flatten_event_log_with_pid
+from prototypes.draft.mining_cache import (
+    DEFAULT_CACHE_DIR,
+    EPISODE_SCHEMA,
+    MiningResultCache,
+    cache_key,
+    fingerprint_dataframe,
+)
+from prototypes.draft.process_executions import (
+    assign_process_execution_ids,
+    build_combined_eventlog_in_duckdb,
+    combined_eventlog_table_name,
+)
+
+DUCKDB_SUFFIXES = {".duckdb", ".db"}
+OCEL2_SUFFIXES = {".json", ".jsonocel"}
+
+
+@contextmanager
+def timed(timings, phase):
+    start = time.perf_counter()
+    yield
+    timings[phase] = time.perf_counter() - start
+
+
+def read_combined_eventlog(
+    connection, excluded_object_types=None, leading_object_type=None
+):
+    """
+    Builds the combined event log of the event tables (e_*) in a DuckDB database
+    for the given process execution settings, or reuses it if it is up to date.
+    """
+    event_tables = sorted(
+        name
+        for (name,) in connection.execute("SHOW TABLES").fetchall()
+        if name.startswith("e_")
+    )
+    if not event_tables:
+        raise ValueError("No event tables (e_*) found in the DuckDB input.")
+
+    table_name = combined_eventlog_table_name(
+        excluded_object_types, leading_object_type
+    )
+    build_combined_eventlog_in_duckdb(
+        connection,
+        event_tables,
+        table_name=table_name,
+        excluded_object_types=excluded_object_types,
+        leading_object_type=leading_object_type,
+    )
+    return connection.execute(f'SELECT * FROM "{table_name}"').df()
+
+
+def load_ocel2(path, excluded_object_types=None, leading_object_type=None):
+    # Imported lazily, the OCEL2 model pulls in pydantic
+    from common.data_loader.ocel2.ocdm_table_extractor import (
+        create_ocdm_tables_from_data,
+    )
+
+    tables, _, _ = create_ocdm_tables_from_data(Path(path).read_text())
+    connection = duckdb.connect(":memory:")
+    for name in tables:
+        if name.startswith("e_"):
+            connection.register(f"{name}_df", tables[name])
+            connection.execute(f'CREATE TABLE "{name}" AS SELECT * FROM "{name}_df"')
+    return read_combined_eventlog(
+        connection, excluded_object_types, leading_object_type
+    )
+
+
+def load_eventlog(
+    path, table=None, excluded_object_types=None, leading_object_type=None
+):
+    """
+    Loads the combined event log from path. For a DuckDB input the given table
+    is read as is, without a table the log is built from the event tables.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        df = pd.read_csv(path)
+    elif suffix == ".parquet":
+        df = pd.read_parquet(path)
+    elif suffix in DUCKDB_SUFFIXES and table is not None:
+        with duckdb.connect(str(path), read_only=True) as connection:
+            df = connection.execute(f'SELECT * FROM "{table}"').df()
+    elif suffix in DUCKDB_SUFFIXES:
+        # Not read only, the combined log and its build state are kept in the file
+        with duckdb.connect(str(path)) as connection:
+            df = read_combined_eventlog(
+                connection, excluded_object_types, leading_object_type
+            )
+    elif suffix in OCEL2_SUFFIXES:
+        df = load_ocel2(path, excluded_object_types, leading_object_type)
+    else:
+        raise ValueError(f"Unsupported input format: {suffix}")
+
+    if "Process_Execution_ID" not in df.columns:
+        object_columns = [col for col in df.columns if col.endswith("_ID")]
+        df["Process_Execution_ID"] = assign_process_execution_ids(
+            df, object_columns, excluded_object_types, leading_object_type
+        )
+    return df
+
+
+def write_episodes(episodes, path):
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        table = (
+            pa.Table.from_pylist(episodes) if episodes else EPISODE_SCHEMA.empty_table()
+        )
+        pq.write_table(table, path)
+    elif suffix in {".jsonl", ".ndjson"}:
+        with open(path, "w") as f:
+            for ep in episodes:
+                f.write(json.dumps(ep) + "\n")
+    else:
+        raise ValueError(f"Unsupported output format: {suffix}")
+
+
+def mine(flat_data, args, fingerprint):
+    """Mines all episodes (minsup 1), the caller filters them by minsup."""
+    if args.workers > 1:
+        return run_emma_per_trace_parallel(
+            flat_data, 1, args.maxwin, args.workers, args.max_length
+        )
+    if args.checkpoint is None:
+        return run_emma_per_trace(flat_data, 1, args.maxwin, max_length=args.max_length)
+
+    checkpoint = MiningCheckpoint(
+        str(args.checkpoint),
+        params={
+            "data": fingerprint,
+            "maxwin": args.maxwin,
+            "max_length": args.max_length,
+        },
+        resume=args.resume,
+    )
+    episodes = run_emma_per_trace(
+        flat_data, 1, args.maxwin, max_length=args.max_length, checkpoint=checkpoint
+    )
+    checkpoint.discard()
+    return episodes
+
+
+def parse_window(value):
+    """Window as number of distinct timestamps ("3") or as duration ("2 days")."""
+    if value.isdigit():
+        return int(value)
+    window_to_seconds(value)
+    return value
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("input", type=Path, help="CSV, Parquet, DuckDB or OCEL2 JSON")
+    parser.add_argument(
+        "-o", "--output", type=Path, required=True, help="Parquet or JSON Lines"
+    )
+    parser.add_argument("--minsup", type=int, default=2)
+    parser.add_argument(
+        "--maxwin",
+        type=parse_window,
+        default=3,
+        help="distinct timestamps (e.g. 3) or a duration (e.g. '2 days')",
+    )
+    parser.add_argument("--max-length", type=int, help="maximum steps per episode")
+    parser.add_argument(
+        "--table",
+        help="read this combined event log from a DuckDB input instead of "
+        "building it from the event tables",
+    )
+    parser.add_argument(
+        "--exclude-object-type",
+        action="append",
+        dest="excluded_object_types",
+        metavar="TYPE",
+        help="object type that does not link events into process executions "
+        "(repeatable)",
+    )
+    parser.add_argument(
+        "--leading-object-type",
+        metavar="TYPE",
+        help="only objects of this type connect events into process executions",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="mining processes")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help="record mined traces in this file, deleted after a successful run",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue from the traces already recorded in --checkpoint",
+    )
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--sample",
+        type=float,
+        help="mine only this fraction of the process executions (approximate)",
+    )
+    parser.add_argument("--seed", type=int, help="random seed for --sample")
+    parser.add_argument(
+        "--verify-top",
+        type=int,
+        default=0,
+        help="verify the top N sampled episodes on the full log",
+    )
+    args = parser.parse_args(argv)
+    if args.checkpoint is not None and args.workers > 1:
+        parser.error("--checkpoint cannot be combined with --workers")
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume requires --checkpoint")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    timings = {}
+
+    with timed(timings, "load"):
+        df = load_eventlog(
+            args.input,
+            args.table,
+            args.excluded_object_types,
+            args.leading_object_type,
+        )
+    with timed(timings, "flatten"):
+        flat_data = flatten_event_log_with_pid(df)
+
+    with timed(timings, "mine"):
+        if args.sample:
+            episodes = run_emma_per_trace_sampled(
+                flat_data,
+                args.minsup,
+                args.maxwin,
+                args.sample,
+                seed=args.seed,
+                verify_top=args.verify_top,
+                max_length=args.max_length,
+            )
+        elif args.no_cache:
+            fingerprint = fingerprint_dataframe(df) if args.checkpoint else None
+            all_episodes = mine(flat_data, args, fingerprint)
+            episodes = filter_by_support(all_episodes, args.minsup)
+        else:
+            fingerprint = fingerprint_dataframe(df)
+            key = cache_key(fingerprint, maxwin=args.maxwin, max_length=args.max_length)
+            all_episodes = MiningResultCache(args.cache_dir).get_or_compute(
+                key, lambda: mine(flat_data, args, fingerprint)
+            )
+            episodes = filter_by_support(all_episodes, args.minsup)
+
+    with timed(timings, "write"):
+        write_episodes(episodes, args.output)
+
+    for phase, seconds in timings.items():
+        print(f"{phase:<8} {seconds:8.2f} s", file=sys.stderr)
+    print(f"{len(episodes)} episodes written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
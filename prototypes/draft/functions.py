@@ -1,12 +1,18 @@
-import uuid
-import networkx as nx
 from collections import defaultdict
 
 import streamlit as st
 import pandas as pd
 
+from algorithms.emma.utils import columnar_to_tuples, flatten_event_log_columnar
 from common.data_loader.meta_information.column_meta import ColumnMeta
 from common.data_loader.meta_information.table_meta import TableMeta, TableType
+from prototypes.draft.process_executions import (
+    COMBINED_EVENTLOG_TABLE,
+    assign_process_execution_ids,
+    build_combined_eventlog_in_duckdb,
+    combined_eventlog_table_name,
+    discard_build_state,
+)
 
 
 def change_page(page_name: str):
@@ -70,7 +76,9 @@ def change_page(page_name: str):
 
 
 # Creates ab Event Log from the different Activity Tables of a Perspective
-def create_combined_eventlog(accessor, meta_infos):
+def create_combined_eventlog(
+    accessor, meta_infos, excluded_object_types=None, leading_object_type=None
+):
     # Get all event tables
     event_tables = sorted([t for t in meta_infos.tables if t.startswith("e_")])
     eventlog_dfs = []
@@ -120,64 +128,31 @@ def create_combined_eventlog(accessor, meta_infos):
         [col for col in combined_eventlog.columns if col.endswith("_ID")]
     )
 
-    # Combine into long format to improve performance
-    long_format = pd.melt(
+    combined_eventlog["Process_Execution_ID"] = assign_process_execution_ids(
         combined_eventlog,
-        id_vars=["EventID"],
-        value_vars=object_columns,
-        value_name="ObjectID",
-    )
-
-    # Drop rows where no IDs are available
-    long_format = long_format.dropna(subset=["ObjectID"])
-    long_format = long_format[long_format["ObjectID"] != ""]
-
-    # Find edges by self-join
-    edges = pd.merge(long_format, long_format, on="EventID")
-
-    # Filter reflexive edges
-    edges = edges[edges["ObjectID_x"] != edges["ObjectID_y"]]
-
-    # Create graph from edge list
-    G = nx.from_pandas_edgelist(edges, "ObjectID_x", "ObjectID_y")
-
-    # Add nodes that dont have any edges
-    all_objects = long_format["ObjectID"].unique()
-    G.add_nodes_from(all_objects)
-
-    # Find connected components
-    object_to_process_id_map = {}
-    for i, component in enumerate(nx.connected_components(G)):
-        process_execution_id = i
-        for obj_id in component:
-            object_to_process_id_map[obj_id] = str(process_execution_id)
-
-    # Add execution Id to dataframe
-    id_map_series = combined_eventlog[object_columns].apply(
-        lambda row: next((val for val in row if val in object_to_process_id_map), None),
-        axis=1,
+        object_columns,
+        excluded_object_types=excluded_object_types,
+        leading_object_type=leading_object_type,
     )
-    combined_eventlog["Process_Execution_ID"] = id_map_series.map(
-        object_to_process_id_map
-    )
-
-    null_pids = combined_eventlog["Process_Execution_ID"].isnull()
-    combined_eventlog.loc[null_pids, "Process_Execution_ID"] = [
-        f"p_iso_{uuid.uuid4()}" for _ in range(null_pids.sum())
-    ]
 
     cols = combined_eventlog.columns.tolist()
     cols.insert(1, cols.pop(cols.index("Process_Execution_ID")))
     combined_eventlog = combined_eventlog[cols]
 
+    # Same table per setting as create_combined_eventlog_in_duckdb
+    table_name = combined_eventlog_table_name(
+        excluded_object_types, leading_object_type
+    )
     accessor._duckdb_connection.register("combined_eventlog", combined_eventlog)
     accessor._duckdb_connection.execute(
-        "CREATE OR REPLACE TABLE el_combined_eventlog AS SELECT * FROM combined_eventlog"
+        f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM combined_eventlog"
     )
+    discard_build_state(accessor._duckdb_connection, table_name)
+    accessor.invalidate_query_cache()
 
     # Create meta information for the table
-    meta_infos.tables["el_combined_eventlog"] = TableMeta(
-        sql_ref="el_combined_eventlog",
+    meta_infos.tables[COMBINED_EVENTLOG_TABLE] = TableMeta(
+        sql_ref=table_name,
         display_name=TableMeta.construct_display_name("Combined eventlog"),
         table_type=TableType.EVENT,
         columns=[
@@ -188,6 +163,44 @@ def create_combined_eventlog(accessor, meta_infos):
     return combined_eventlog
 
 
+# Creates the combined Event Log inside DuckDB without loading it into pandas
+def create_combined_eventlog_in_duckdb(
+    accessor, meta_infos, excluded_object_types=None, leading_object_type=None
+):
+    event_tables = sorted([t for t in meta_infos.tables if t.startswith("e_")])
+    if not event_tables:
+        st.error("No valid Event Tables found.")
+        return []
+
+    # Every setting has its own table, the database may be shared with other
+    # sessions that mine a log built with different settings
+    table_name = combined_eventlog_table_name(
+        excluded_object_types, leading_object_type
+    )
+    object_columns = build_combined_eventlog_in_duckdb(
+        accessor._duckdb_connection,
+        event_tables,
+        table_name=table_name,
+        excluded_object_types=excluded_object_types,
+        leading_object_type=leading_object_type,
+    )
+    # Written through the connection, cached results of the old log are stale
+    accessor.invalidate_query_cache()
+
+    # Only the schema is needed for the meta information
+    schema = accessor.execute_query(f"SELECT * FROM {table_name} LIMIT 0")
+    meta_infos.tables[COMBINED_EVENTLOG_TABLE] = TableMeta(
+        sql_ref=table_name,
+        display_name=TableMeta.construct_display_name("Combined eventlog"),
+        table_type=TableType.EVENT,
+        columns=[
+            ColumnMeta.create_from_column_name(column, schema)
+            for column in schema.columns
+        ],
+    )
+    return object_columns
+
+
 # Calculates positions for the different nodes of a Frequent Episode to avoid overlap
 def assign_node_positions(
     selected_pattern, obj_event_map, layer_spacing=200, offset=200
@@ -268,26 +281,34 @@ def flatten_event_log_with_pid(
 ):
     """
     Flattens the log to: (timestamp, event, pid, [list of objects])
+    Thin adapter over the vectorized flatten_event_log_columnar.
     """
-    if object_cols is None:
-        object_cols = [
-            col for col in df.columns if col.endswith("_ID") and col != pid_col
-        ]
-
-    df[time_col] = pd.to_datetime(df[time_col])
-    flat_data = []
+    return columnar_to_tuples(
+        flatten_event_log_columnar(
+            df,
+            time_col=time_col,
+            event_col=event_col,
+            pid_col=pid_col,
+            object_cols=object_cols,
+        )
+    )
 
-    for _, row in df.iterrows():
-        time = int(row[time_col].timestamp())
-        event = row[event_col]
-        pid = row[pid_col]
 
-        # Instead of full object IDs, extract types from column names
-        objects = [col.replace("_ID", "") for col in object_cols if pd.notna(row[col])]
+# Table of the combined event log the session built, named after its settings
+def combined_eventlog_table(meta_infos):
+    return meta_infos.tables[COMBINED_EVENTLOG_TABLE].sql_ref
 
-        flat_data.append((time, event, pid, objects))
 
-    return flat_data
+# Streams the combined event log in pid-ordered batches instead of loading it at once
+def stream_flat_eventlog(
+    accessor, batch_size=100_000, table_name=COMBINED_EVENTLOG_TABLE
+):
+    batches = accessor.execute_batches(
+        f"SELECT * FROM {table_name} ORDER BY Process_Execution_ID, Timestamp",
+        batch_size,
+    )
+    for batch in batches:
+        yield flatten_event_log_with_pid(batch.to_pandas())
 
 
 def normalize_timestamps(flat_data):
@@ -9,6 +9,7 @@ from prototypes.draft.Views.data_selection_table import data_selection_table
 from prototypes.draft.Views.pattern_view import pattern_view
 from prototypes.draft.Views.pattern_viz_view import pattern_viz_view
 from prototypes.draft.Views.data_csv import upload_view
+from prototypes.draft.Views.query_profile import query_profile_panel
 from prototypes.draft.functions import change_page
 
 # Initialize session_state
@@ -64,6 +65,8 @@ def main():
     elif st.session_state.page == "data_selection_table":
         data_selection_table()
 
+    query_profile_panel()
+
 
 if __name__ == "__main__":
     main()
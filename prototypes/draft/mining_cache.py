@@ -0,0 +1,143 @@
+"""
+On-disk cache for mining results. Entries are keyed by a fingerprint of the
+event log plus the mining parameters and stored as Parquet files, so repeated
+runs (also across server restarts) skip the mining. The least recently used
+entries are evicted once the cache directory grows beyond its size limit.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Bump when the layout of the mining results changes to invalidate old entries
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("EMMA_CACHE_DIR", Path.home() / ".cache" / "emma_results")
+)
+DEFAULT_MAX_BYTES = 512 * 1024**2
+
+EPISODE_SCHEMA = pa.schema(
+    [
+        ("PatternID", pa.int64()),
+        (
+            "Episode",
+            pa.list_(
+                pa.struct(
+                    [
+                        ("activity", pa.list_(pa.string())),
+                        ("objects", pa.list_(pa.string())),
+                    ]
+                )
+            ),
+        ),
+        ("Support", pa.int64()),
+    ]
+)
+
+
+def fingerprint_dataframe(df):
+    """Content hash of an event log DataFrame (column names and values)."""
+    digest = hashlib.sha256(json.dumps(list(map(str, df.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_duckdb_table(connection, table_name="el_combined_eventlog"):
+    """
+    Content hash of a DuckDB table computed inside DuckDB: the row count and the
+    order-independent sum of all row hashes, plus the column names and types.
+    """
+    columns = connection.execute(f'DESCRIBE "{table_name}"').fetchall()
+    row_count, row_hash_sum = connection.execute(
+        f'SELECT count(*), sum(hash(t)) FROM "{table_name}" t'
+    ).fetchone()
+    digest = hashlib.sha256(
+        json.dumps([[str(c[0]), str(c[1])] for c in columns]).encode()
+    )
+    digest.update(f"{row_count}:{row_hash_sum}".encode())
+    return digest.hexdigest()
+
+
+def cache_key(fingerprint, **params):
+    """Combines a data fingerprint and the mining parameters into a file name."""
+    payload = {
+        "version": CACHE_VERSION,
+        "data": fingerprint,
+        # repr keeps a window of 3 timestamps apart from a duration string "3"
+        "params": {name: repr(value) for name, value in sorted(params.items())},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class MiningResultCache:
+    """Parquet files named <key>.parquet in cache_dir with size-based LRU eviction."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.parquet"
+
+    def __contains__(self, key):
+        return self._path(key).exists()
+
+    def get(self, key):
+        """Returns the cached episodes for key or None."""
+        path = self._path(key)
+        try:
+            episodes = pq.read_table(path).to_pylist()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        # The modification time doubles as the last access time for eviction
+        os.utime(path)
+        return episodes
+
+    def put(self, key, episodes):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        table = pa.Table.from_pylist(
+            [
+                {
+                    "PatternID": ep["PatternID"],
+                    "Episode": ep["Episode"],
+                    "Support": ep["Support"],
+                }
+                for ep in episodes
+            ],
+            schema=EPISODE_SCHEMA,
+        )
+        pq.write_table(table, tmp_path)
+        # Atomic rename, so concurrent readers never see a partial file
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for path in self.cache_dir.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def get_or_compute(self, key, compute):
+        episodes = self.get(key)
+        if episodes is None:
+            episodes = compute()
+            self.put(key, episodes)
+        return episodes
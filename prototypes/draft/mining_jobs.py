@@ -0,0 +1,70 @@
+"""
+Background execution of mining runs. A job runs in a worker thread of a shared
+executor, reports its progress through the on_progress hook of the mining
+functions and can be cancelled or stopped by a time budget.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MiningCancelled(Exception):
+    """Raised inside a mining job when it is cancelled or exceeds its time budget."""
+
+
+class MiningJob:
+    def __init__(self, time_budget=None, total_traces=None):
+        self.time_budget = time_budget
+        self.total_traces = total_traces
+        self.traces_done = 0
+        self.episodes_found = 0
+        self.started = time.monotonic()
+        self._cancelled = threading.Event()
+        self.future = None
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def report(self, traces_done, episodes_found):
+        """Progress callback for the mining functions, aborts the job if requested."""
+        self.traces_done = traces_done
+        self.episodes_found = episodes_found
+        if self._cancelled.is_set():
+            raise MiningCancelled("Mining was cancelled.")
+        if self.time_budget and self.elapsed > self.time_budget:
+            raise MiningCancelled(
+                f"Mining exceeded its time budget of {self.time_budget} seconds."
+            )
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def progress(self):
+        """Fraction of traces processed, or None if the trace count is unknown."""
+        if not self.total_traces:
+            return None
+        return min(self.traces_done / self.total_traces, 1.0)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """Returns the mining result; re-raises MiningCancelled or mining errors."""
+        return self.future.result(timeout)
+
+
+class MiningJobRunner:
+    """Runs mining functions of the form mine(on_progress) in worker threads."""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mining"
+        )
+
+    def submit(self, mine, time_budget=None, total_traces=None):
+        job = MiningJob(time_budget=time_budget, total_traces=total_traces)
+        job.future = self._executor.submit(mine, job.report)
+        return job
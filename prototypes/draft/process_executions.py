@@ -0,0 +1,573 @@
+"""
+Assignment of process executions: events that (transitively) share an object
+belong to the same process execution, i.e. the same connected component of the
+object co-occurrence graph.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def object_occurrences(combined_eventlog, object_columns):
+    """
+    Collects the (event row, object) pairs of the log without building a long table.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: row index and integer object code
+        of every occurrence (sorted by row), and the object IDs indexed by code.
+        Codes follow the sort order of the object IDs.
+    """
+    values = combined_eventlog[object_columns].to_numpy(dtype=object)
+    present = pd.notna(values) & (values != "")
+    rows, cols = np.nonzero(present)
+    object_codes, object_ids = pd.factorize(
+        pd.Series(values[rows, cols], dtype=object).astype(str), sort=True
+    )
+    return rows, object_codes, np.asarray(object_ids, dtype=object)
+
+
+def _first_occurrence_per_row(rows):
+    return np.r_[True, rows[1:] != rows[:-1]][: len(rows)]
+
+
+def connected_object_components(rows, object_codes, n_objects):
+    """
+    Vectorized union-find over integer-coded objects. Every object of an event is
+    linked to the first object of that event, so an event with k objects adds k
+    edges instead of k^2.
+
+    Returns:
+        np.ndarray: label per object code; the label is the smallest object code of
+        its connected component.
+    """
+    labels = np.arange(n_objects)
+    if len(rows) == 0:
+        return labels
+
+    starts = np.flatnonzero(_first_occurrence_per_row(rows))
+    anchors = np.repeat(object_codes[starts], np.diff(np.r_[starts, len(rows)]))
+
+    while True:
+        # Hook the root of the larger label onto the smaller one ...
+        left, right = labels[object_codes], labels[anchors]
+        smaller = np.minimum(left, right)
+        hooked = labels.copy()
+        np.minimum.at(hooked, left, smaller)
+        np.minimum.at(hooked, right, smaller)
+        # ... and compress the paths until every object points to its root
+        while True:
+            compressed = hooked[hooked]
+            if np.array_equal(compressed, hooked):
+                break
+            hooked = compressed
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def linking_object_columns(
+    object_columns, excluded_object_types=None, leading_object_type=None
+):
+    """
+    Resolves which object columns connect events into process executions.
+    Object types may be given as type ("Plant") or column name ("Plant_ID").
+    Excluded types, e.g. shared master data like plants or customers, are ignored
+    for connectivity but stay in the event log.
+
+    Returns:
+        Tuple[List[str], Optional[str]]: the linking columns and the leading column.
+    """
+
+    def to_column(object_type):
+        return object_type if object_type.endswith("_ID") else f"{object_type}_ID"
+
+    excluded = {to_column(t) for t in excluded_object_types or []}
+    linking = [col for col in object_columns if col not in excluded]
+    if leading_object_type is None:
+        return linking, None
+
+    leading = to_column(leading_object_type)
+    if leading not in linking:
+        raise ValueError(
+            f"Leading object type {leading_object_type} is not an object column "
+            "of the event log or is excluded."
+        )
+    return linking, leading
+
+
+def _row_labels_via_leading_column(combined_eventlog, linking, leading):
+    # Process executions are the components of the leading objects only
+    rows, object_codes, leading_ids = object_occurrences(combined_eventlog, [leading])
+    labels = connected_object_components(rows, object_codes, len(leading_ids))
+    is_first = _first_occurrence_per_row(rows)
+    row_labels = np.full(len(combined_eventlog), -1, dtype=np.int64)
+    row_labels[rows[is_first]] = labels[object_codes[is_first]]
+
+    others = [col for col in linking if col != leading]
+    if not others:
+        return row_labels, leading_ids
+
+    # Every other object is owned by the smallest leading component it co-occurs
+    # with, so it can attach events to an execution but never merge two of them
+    rows, object_codes, object_ids = object_occurrences(combined_eventlog, others)
+    unset = np.iinfo(np.int64).max
+    owners = np.full(len(object_ids), unset, dtype=np.int64)
+    labelled = row_labels[rows] >= 0
+    np.minimum.at(owners, object_codes[labelled], row_labels[rows[labelled]])
+
+    inherited = np.full(len(combined_eventlog), unset, dtype=np.int64)
+    np.minimum.at(inherited, rows[~labelled], owners[object_codes[~labelled]])
+    row_labels = np.where(
+        (row_labels < 0) & (inherited != unset), inherited, row_labels
+    )
+    return row_labels, leading_ids
+
+
+def stable_process_execution_id(label):
+    """
+    Process executions are named after the smallest object ID of their component,
+    so IDs do not depend on the load or enumeration order.
+    """
+    return "p_" + hashlib.md5(str(label).encode()).hexdigest()[:16]
+
+
+def isolated_process_execution_id(event_name, event_id):
+    return "p_iso_" + hashlib.md5(f"{event_name}:{event_id}".encode()).hexdigest()[:16]
+
+
+def _isolated_process_execution_ids(events):
+    if {"EventName", "EventID"} <= set(events.columns):
+        keys = zip(events["EventName"], events["EventID"])
+    else:
+        keys = (("", index) for index in events.index)
+    return [isolated_process_execution_id(name, event_id) for name, event_id in keys]
+
+
+def assign_process_execution_ids(
+    combined_eventlog,
+    object_columns,
+    excluded_object_types=None,
+    leading_object_type=None,
+):
+    """
+    Computes the Process_Execution_ID of every event of the combined event log.
+    IDs are stable (see stable_process_execution_id); events without any object
+    get an isolated ID derived from their EventName and EventID.
+    With a leading object type, only objects of that type connect events; see
+    linking_object_columns for the options.
+    """
+    linking, leading = linking_object_columns(
+        object_columns, excluded_object_types, leading_object_type
+    )
+    if leading is not None:
+        row_labels, object_ids = _row_labels_via_leading_column(
+            combined_eventlog, linking, leading
+        )
+    else:
+        rows, object_codes, object_ids = object_occurrences(combined_eventlog, linking)
+        labels = connected_object_components(rows, object_codes, len(object_ids))
+        is_first = _first_occurrence_per_row(rows)
+        row_labels = np.full(len(combined_eventlog), -1, dtype=np.int64)
+        row_labels[rows[is_first]] = labels[object_codes[is_first]]
+
+    connected = row_labels >= 0
+    component_codes, components = pd.factorize(row_labels[connected])
+    component_pids = np.array(
+        [stable_process_execution_id(object_ids[label]) for label in components],
+        dtype=object,
+    )
+
+    pids = np.empty(len(combined_eventlog), dtype=object)
+    pids[connected] = component_pids[component_codes]
+    pids[~connected] = _isolated_process_execution_ids(combined_eventlog[~connected])
+
+    return pd.Series(pids, index=combined_eventlog.index, dtype=object)
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _event_table_select(connection, table):
+    columns = [
+        row[0] for row in connection.execute(f"DESCRIBE {_quote(table)}").fetchall()
+    ]
+    object_columns = [col for col in columns if col.endswith("_ID")]
+    event_name = table.replace("e_celonis_", "").replace("'", "''")
+    select = ", ".join(
+        [
+            "ID AS EventID",
+            "Time AS Timestamp",
+            f"'{event_name}' AS EventName",
+        ]
+        + [f"CAST({_quote(col)} AS VARCHAR) AS {_quote(col)}" for col in object_columns]
+    )
+    return f"SELECT {select} FROM {_quote(table)}", object_columns
+
+
+COMBINED_EVENTLOG_TABLE = "el_combined_eventlog"
+
+TEMP_TABLES = (
+    "_el_events",
+    "_el_new_events",
+    "_el_objects",
+    "_el_initial_labels",
+    "_el_labels",
+    "_el_new_labels",
+    "_el_event_labels",
+    "_el_merged_labels",
+)
+
+
+def _propagate_component_labels(connection, initial_labels_query=None):
+    """
+    Label propagation over the bipartite event/object graph in _el_objects: every
+    event takes the smallest label of its objects, every object the smallest label
+    of its events, plus one pointer jump per round to shortcut long chains.
+    Objects start with their own ID as label unless initial_labels_query provides
+    (ObjectID, Label) rows for them.
+    Leaves the final labels in _el_labels and per event row in _el_event_labels.
+    """
+    connection.execute(
+        f"""CREATE OR REPLACE TEMP TABLE _el_labels AS
+        {initial_labels_query or "SELECT DISTINCT ObjectID, ObjectID AS Label FROM _el_objects"}"""
+    )
+    while True:
+        connection.execute("""CREATE OR REPLACE TEMP TABLE _el_event_labels AS
+            SELECT o._row, MIN(l.Label) AS Label
+            FROM _el_objects o JOIN _el_labels l USING (ObjectID)
+            GROUP BY o._row""")
+        connection.execute("""CREATE OR REPLACE TEMP TABLE _el_new_labels AS
+            WITH propagated AS (
+                SELECT o.ObjectID, MIN(e.Label) AS Label
+                FROM _el_objects o JOIN _el_event_labels e USING (_row)
+                GROUP BY o.ObjectID
+            )
+            SELECT p.ObjectID, LEAST(p.Label, COALESCE(j.Label, p.Label)) AS Label
+            FROM propagated p LEFT JOIN propagated j ON j.ObjectID = p.Label""")
+        (changed,) = connection.execute(
+            """SELECT COUNT(*) FROM _el_new_labels n JOIN _el_labels l USING (ObjectID)
+            WHERE n.Label <> l.Label"""
+        ).fetchone()
+        connection.execute(
+            "CREATE OR REPLACE TEMP TABLE _el_labels AS SELECT * FROM _el_new_labels"
+        )
+        if changed == 0:
+            return
+
+
+def _object_occurrences_query(object_columns, events_table="_el_events"):
+    return " UNION ALL ".join(
+        [
+            f"""SELECT _row, {_quote(col)} AS ObjectID FROM {events_table}
+            WHERE {_quote(col)} IS NOT NULL AND {_quote(col)} <> ''"""
+            for col in object_columns
+        ]
+        or ["SELECT NULL::BIGINT AS _row, NULL::VARCHAR AS ObjectID WHERE false"]
+    )
+
+
+def _inherit_labels_from_owners(connection, object_columns):
+    # Events without a leading object take the smallest leading component that
+    # any of their objects co-occurs with elsewhere
+    connection.execute(f"""INSERT INTO _el_event_labels
+        WITH others AS ({_object_occurrences_query(object_columns)}),
+        owners AS (
+            SELECT o.ObjectID, MIN(l.Label) AS Label
+            FROM others o JOIN _el_event_labels l USING (_row)
+            GROUP BY o.ObjectID
+        )
+        SELECT o._row, MIN(w.Label) AS Label
+        FROM others o JOIN owners w USING (ObjectID)
+        WHERE o._row NOT IN (SELECT _row FROM _el_event_labels)
+        GROUP BY o._row""")
+
+
+def _pid_sql(label):
+    # Same IDs as stable_process_execution_id and isolated_process_execution_id
+    return f"""COALESCE(
+        'p_' || substr(md5({label}), 1, 16),
+        'p_iso_' || substr(md5(e.EventName || ':' || CAST(e.EventID AS VARCHAR)), 1, 16)
+    )"""
+
+
+def _output_columns(object_columns):
+    return ", ".join(
+        [
+            "e.EventID",
+            f"{_pid_sql('l.Label')} AS Process_Execution_ID",
+            "e.Timestamp",
+            "e.EventName",
+        ]
+        + [f"e.{_quote(col)}" for col in object_columns]
+    )
+
+
+def _table_exists(connection, table_name):
+    (count,) = connection.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?",
+        [table_name],
+    ).fetchone()
+    return count > 0
+
+
+def combined_eventlog_table_name(excluded_object_types=None, leading_object_type=None):
+    """
+    Name of the combined event log built with the given object type options. Logs
+    with different options get different tables, so sessions sharing a database
+    never replace each other's log.
+    """
+    if not excluded_object_types and not leading_object_type:
+        return COMBINED_EVENTLOG_TABLE
+    options = json.dumps(
+        {
+            "excluded": sorted(excluded_object_types or []),
+            "leading": leading_object_type,
+        }
+    )
+    return f"{COMBINED_EVENTLOG_TABLE}_{hashlib.md5(options.encode()).hexdigest()[:8]}"
+
+
+def _state_tables(table_name):
+    # Object components and build settings that belong to table_name
+    return f"{table_name}_components", f"{table_name}_settings"
+
+
+def discard_build_state(connection, table_name):
+    """
+    Drops the persisted components and settings of table_name, for logs written
+    by other means, so the next build_combined_eventlog_in_duckdb starts over.
+    """
+    for state_table in _state_tables(table_name):
+        connection.execute(f"DROP TABLE IF EXISTS {state_table}")
+
+
+def _is_up_to_date(connection, table_name, object_columns, settings):
+    """
+    Whether table_name was built with the same settings and columns from a subset
+    of the current events, i.e. only new events may be missing and all others are
+    unchanged.
+    """
+    components_table, settings_table = _state_tables(table_name)
+    if not (
+        _table_exists(connection, table_name)
+        and _table_exists(connection, components_table)
+        and _table_exists(connection, settings_table)
+    ):
+        return False
+    stored_settings = connection.execute(
+        f"SELECT Settings FROM {settings_table}"
+    ).fetchall()
+    if stored_settings != [(settings,)]:
+        return False
+    columns = [
+        row[0]
+        for row in connection.execute(f"DESCRIBE {_quote(table_name)}").fetchall()
+    ]
+    if columns != ["EventID", "Process_Execution_ID", "Timestamp", "EventName"] + (
+        object_columns
+    ):
+        return False
+    # Events that disappeared from the event tables or changed their time or
+    # objects can only be handled by a rebuild, as changed objects may split
+    # components
+    unchanged = " AND ".join(
+        [
+            "e.EventName = t.EventName",
+            "e.EventID = t.EventID",
+            "e.Timestamp IS NOT DISTINCT FROM t.Timestamp",
+        ]
+        + [
+            f"e.{_quote(col)} IS NOT DISTINCT FROM t.{_quote(col)}"
+            for col in object_columns
+        ]
+    )
+    (stale,) = connection.execute(
+        f"""SELECT COUNT(*) FROM {_quote(table_name)} t WHERE NOT EXISTS (
+            SELECT 1 FROM _el_events e WHERE {unchanged}
+        )"""
+    ).fetchone()
+    return stale == 0
+
+
+def _has_new_events(connection, table_name):
+    (new,) = connection.execute(f"""SELECT COUNT(*) FROM _el_events e WHERE NOT EXISTS (
+            SELECT 1 FROM {_quote(table_name)} t
+            WHERE e.EventName = t.EventName AND e.EventID = t.EventID
+        )""").fetchone()
+    return new > 0
+
+
+def _rebuild_process_executions(
+    connection, table_name, object_columns, linking, leading, settings
+):
+    connection.execute(
+        "CREATE OR REPLACE TEMP TABLE _el_objects AS "
+        + _object_occurrences_query([leading] if leading else linking)
+    )
+    _propagate_component_labels(connection)
+    if leading is not None:
+        _inherit_labels_from_owners(
+            connection, [col for col in linking if col != leading]
+        )
+
+    connection.execute(f"""CREATE OR REPLACE TABLE {_quote(table_name)} AS
+        SELECT {_output_columns(object_columns)}
+        FROM _el_events e
+        LEFT JOIN _el_event_labels l USING (_row)
+        ORDER BY e.Timestamp, e._row""")
+
+    # Persist the union-find state; events attached through owners of a leading
+    # type cannot be merged incrementally, so that mode rebuilds on new events
+    components_table, settings_table = _state_tables(table_name)
+    connection.execute(f"""CREATE OR REPLACE TABLE {components_table} AS
+        SELECT ObjectID, Label FROM _el_labels""")
+    connection.execute(f"CREATE OR REPLACE TABLE {settings_table} (Settings VARCHAR)")
+    connection.execute(f"INSERT INTO {settings_table} VALUES (?)", [settings])
+
+
+def _merge_new_events(connection, table_name, object_columns, linking):
+    """
+    Merges the events that are not yet in table_name into the persisted object
+    components. Work is proportional to the new events plus the components they
+    merge; all other process execution IDs stay untouched.
+    """
+    components_table, _ = _state_tables(table_name)
+    connection.execute(f"""CREATE OR REPLACE TEMP TABLE _el_new_events AS
+        SELECT * FROM _el_events e WHERE NOT EXISTS (
+            SELECT 1 FROM {_quote(table_name)} t
+            WHERE e.EventName = t.EventName AND e.EventID = t.EventID
+        )""")
+    (new_events,) = connection.execute("SELECT COUNT(*) FROM _el_new_events").fetchone()
+    if new_events == 0:
+        return
+    connection.execute(
+        "CREATE OR REPLACE TEMP TABLE _el_objects AS "
+        + _object_occurrences_query(linking, events_table="_el_new_events")
+    )
+    # Known objects start with the label of their persisted component
+    connection.execute(f"""CREATE OR REPLACE TEMP TABLE _el_initial_labels AS
+        SELECT o.ObjectID, COALESCE(MIN(c.Label), o.ObjectID) AS Label
+        FROM (SELECT DISTINCT ObjectID FROM _el_objects) o
+        LEFT JOIN {components_table} c USING (ObjectID)
+        GROUP BY o.ObjectID""")
+    # One virtual event per persisted component links its touched objects, so a
+    # merge reaches all of them even if they are not connected by new events
+    connection.execute(f"""INSERT INTO _el_objects
+        SELECT -dense_rank() OVER (ORDER BY c.Label) AS _row, c.ObjectID
+        FROM (SELECT DISTINCT ObjectID FROM _el_objects) o
+        JOIN {components_table} c USING (ObjectID)""")
+    _propagate_component_labels(connection, "SELECT * FROM _el_initial_labels")
+
+    # Persisted components that got connected by the new events
+    connection.execute("""CREATE OR REPLACE TEMP TABLE _el_merged_labels AS
+        SELECT DISTINCT i.Label AS OldLabel, n.Label AS NewLabel
+        FROM _el_initial_labels i JOIN _el_labels n USING (ObjectID)
+        WHERE i.Label <> n.Label""")
+    connection.execute(f"""UPDATE {components_table} SET Label = m.NewLabel
+        FROM _el_merged_labels m WHERE {components_table}.Label = m.OldLabel""")
+    connection.execute(f"""INSERT INTO {components_table}
+        SELECT l.ObjectID, l.Label FROM _el_labels l
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {components_table} c WHERE c.ObjectID = l.ObjectID
+        )""")
+    connection.execute(f"""UPDATE {_quote(table_name)}
+        SET Process_Execution_ID = 'p_' || substr(md5(m.NewLabel), 1, 16)
+        FROM _el_merged_labels m
+        WHERE Process_Execution_ID = 'p_' || substr(md5(m.OldLabel), 1, 16)""")
+    connection.execute(f"""INSERT INTO {_quote(table_name)}
+        SELECT {_output_columns(object_columns)}
+        FROM _el_new_events e
+        LEFT JOIN _el_event_labels l USING (_row)
+        ORDER BY e.Timestamp, e._row""")
+
+
+def build_combined_eventlog_in_duckdb(
+    connection,
+    event_tables,
+    table_name=COMBINED_EVENTLOG_TABLE,
+    excluded_object_types=None,
+    leading_object_type=None,
+    incremental=True,
+):
+    """
+    DuckDB-native counterpart of create_combined_eventlog: combines the event tables
+    with a single UNION ALL BY NAME, computes the connected components with SQL
+    label propagation and writes the result to table_name. The log never leaves
+    DuckDB, so it may be larger than memory. The object type options are the same
+    as for assign_process_execution_ids.
+
+    The object to component mapping is persisted in <table_name>_components. If
+    incremental is set and table_name was built with the same settings before,
+    only events that are not yet in table_name are merged in and the IDs of all
+    other process executions stay the same; without new events nothing is written.
+
+    Returns:
+        List[str]: the object columns of the combined event log.
+    """
+    selects = []
+    object_columns = []
+    for table in event_tables:
+        select, table_object_columns = _event_table_select(connection, table)
+        selects.append(select)
+        object_columns.extend(
+            col for col in table_object_columns if col not in object_columns
+        )
+    object_columns = sorted(object_columns)
+
+    linking, leading = linking_object_columns(
+        object_columns, excluded_object_types, leading_object_type
+    )
+    settings = json.dumps({"linking": linking, "leading": leading})
+
+    # The log, its components and settings must never be left half updated, e.g.
+    # by a write conflict with another session on the same database
+    connection.execute("BEGIN TRANSACTION")
+    try:
+        connection.execute(f"""CREATE OR REPLACE TEMP TABLE _el_events AS
+            SELECT row_number() OVER () AS _row, *
+            FROM ({" UNION ALL BY NAME ".join(selects)})""")
+        if not (
+            incremental
+            and _is_up_to_date(connection, table_name, object_columns, settings)
+        ):
+            _rebuild_process_executions(
+                connection, table_name, object_columns, linking, leading, settings
+            )
+        elif leading is None:
+            _merge_new_events(connection, table_name, object_columns, linking)
+        elif _has_new_events(connection, table_name):
+            _rebuild_process_executions(
+                connection, table_name, object_columns, linking, leading, settings
+            )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        for temp_table in TEMP_TABLES:
+            connection.execute(f"DROP TABLE IF EXISTS {temp_table}")
+    return object_columns
+
+
+def process_execution_size_distribution(connection, table_name=COMBINED_EVENTLOG_TABLE):
+    """
+    Diagnostic for giant components: number of process executions and events per
+    order of magnitude of the execution size (1, 10-99, 100-999, ...).
+    """
+    return connection.execute(f"""WITH sizes AS (
+            SELECT COUNT(*) AS Events FROM {_quote(table_name)}
+            GROUP BY Process_Execution_ID
+        )
+        SELECT
+            CAST(POW(10, FLOOR(LOG10(Events))) AS BIGINT) AS "Min Size",
+            COUNT(*) AS "Process Executions",
+            SUM(Events) AS "Events",
+            MAX(Events) AS "Largest",
+            SUM(Events) / (SELECT SUM(Events) FROM sizes) AS "Share of Events"
+        FROM sizes
+        GROUP BY 1
+        ORDER BY 1""").fetch_df()
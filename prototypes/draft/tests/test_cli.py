@@ -0,0 +1,124 @@
+import json
+
+import duckdb
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from prototypes.draft import cli
+from prototypes.draft.process_executions import combined_eventlog_table_name
+
+
+@pytest.fixture
+def eventlog_csv(tmp_path):
+    df = pd.DataFrame(
+        {
+            "EventID": [f"e{i}" for i in range(6)],
+            "Timestamp": pd.to_datetime(
+                [
+                    "2023-01-01 10:00",
+                    "2023-01-01 11:00",
+                    "2023-01-01 12:00",
+                    "2023-01-02 10:00",
+                    "2023-01-02 11:00",
+                    "2023-01-02 12:00",
+                ]
+            ),
+            "EventName": ["A", "B", "C", "A", "B", "C"],
+            "Order_ID": ["o1", "o1", "o1", "o2", "o2", "o2"],
+        }
+    )
+    path = tmp_path / "eventlog.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_load_eventlog_assigns_process_executions(eventlog_csv):
+    df = cli.load_eventlog(eventlog_csv)
+
+    assert df["Process_Execution_ID"].nunique() == 2
+
+
+def test_parse_window():
+    assert cli.parse_window("3") == 3
+    assert cli.parse_window("2 days") == "2 days"
+    for value in ("soon", "-1 days", "2.5"):
+        with pytest.raises(ValueError):
+            cli.parse_window(value)
+
+
+def test_main_writes_json_lines(eventlog_csv, tmp_path, capsys):
+    output = tmp_path / "episodes.jsonl"
+
+    assert cli.main([str(eventlog_csv), "-o", str(output), "--no-cache"]) == 0
+
+    episodes = [json.loads(line) for line in output.read_text().splitlines()]
+    assert episodes
+    assert all(ep["Support"] == 2 for ep in episodes)
+    assert "mine" in capsys.readouterr().err
+
+
+def test_main_writes_parquet_with_cache(eventlog_csv, tmp_path):
+    output = tmp_path / "episodes.parquet"
+    args = [str(eventlog_csv), "-o", str(output), "--cache-dir", str(tmp_path)]
+
+    cli.main(args + ["--minsup", "1"])
+    all_episodes = pq.read_table(output).to_pylist()
+    cli.main(args + ["--minsup", "3"])
+
+    assert all_episodes
+    assert pq.read_table(output).num_rows == 0
+    assert len(list(tmp_path.glob("*.parquet"))) == 2
+
+
+def test_main_with_checkpoint(eventlog_csv, tmp_path):
+    output = tmp_path / "episodes.jsonl"
+    checkpoint = tmp_path / "run.checkpoint.jsonl"
+    args = [str(eventlog_csv), "-o", str(output), "--no-cache"]
+
+    cli.main(args + ["--checkpoint", str(checkpoint), "--resume"])
+    with_checkpoint = output.read_text()
+    cli.main(args)
+
+    assert with_checkpoint == output.read_text()
+    assert not checkpoint.exists()
+    with pytest.raises(SystemExit):
+        cli.parse_args(args + ["--resume"])
+
+
+@pytest.fixture
+def data_model_duckdb(tmp_path):
+    path = tmp_path / "data_model.duckdb"
+    with duckdb.connect(str(path)) as connection:
+        connection.execute(
+            """CREATE TABLE e_celonis_CreateOrder AS SELECT * FROM (VALUES
+                ('e1', TIMESTAMP '2023-01-01 10:00:00', 'o1', 'p1'),
+                ('e2', TIMESTAMP '2023-01-02 10:00:00', 'o2', 'p1')
+            ) t(ID, Time, Order_ID, Plant_ID)"""
+        )
+        connection.execute("""CREATE TABLE e_celonis_ShipOrder AS SELECT * FROM (VALUES
+                ('e3', TIMESTAMP '2023-01-01 11:00:00', 'o1'),
+                ('e4', TIMESTAMP '2023-01-02 11:00:00', 'o2')
+            ) t(ID, Time, Order_ID)""")
+    return path
+
+
+def test_main_builds_combined_eventlog_from_duckdb(data_model_duckdb, tmp_path):
+    output = tmp_path / "episodes.jsonl"
+    args = [str(data_model_duckdb), "-o", str(output), "--no-cache", "--minsup", "1"]
+
+    cli.main(args)
+    shared_plant = [json.loads(line) for line in output.read_text().splitlines()]
+    cli.main(args + ["--exclude-object-type", "Plant"])
+    per_order = [json.loads(line) for line in output.read_text().splitlines()]
+
+    # Through the shared plant both orders form a single process execution
+    assert max(ep["Support"] for ep in shared_plant) == 1
+    assert {ep["Support"] for ep in per_order} == {2}
+    with duckdb.connect(str(data_model_duckdb), read_only=True) as connection:
+        tables = {name for (name,) in connection.execute("SHOW TABLES").fetchall()}
+    assert combined_eventlog_table_name() in tables
+    assert combined_eventlog_table_name(["Plant"]) in tables
+
+    df = cli.load_eventlog(data_model_duckdb, table=combined_eventlog_table_name())
+    assert df["Process_Execution_ID"].nunique() == 1
@@ -1,9 +1,11 @@
 import types
+
 import pytest
 import pandas as pd
 import streamlit as st
 from unittest.mock import MagicMock, patch
 
+from common.data_loader.sql_accessor.duckdb import LocalDuckDBAccessor
 from prototypes.draft import functions
 from prototypes.draft.functions import create_combined_eventlog
 
@@ -96,3 +98,25 @@ def test_create_combined_eventlog(mock_accessor, mock_meta_infos):
         assert mock_accessor._duckdb_connection.register.called
         assert mock_accessor._duckdb_connection.execute.called
         assert "el_combined_eventlog" in mock_meta_infos.tables
+
+
+def test_stream_flat_eventlog():
+    accessor = LocalDuckDBAccessor()
+    accessor.execute_query("""CREATE TABLE el_combined_eventlog AS SELECT * FROM (VALUES
+            ('e1', 'p2', TIMESTAMP '2023-01-01 10:00:00', 'A', 'o2'),
+            ('e2', 'p1', TIMESTAMP '2023-01-01 11:00:00', 'A', 'o1'),
+            ('e3', 'p2', TIMESTAMP '2023-01-01 12:00:00', 'B', 'o2'),
+            ('e4', 'p1', TIMESTAMP '2023-01-01 09:00:00', 'B', NULL)
+        ) t(EventID, Process_Execution_ID, Timestamp, EventName, Order_ID)""")
+
+    batches = list(functions.stream_flat_eventlog(accessor, batch_size=3))
+    flat_data = [event for batch in batches for event in batch]
+
+    assert [event[1:3] for event in flat_data] == [
+        ("B", "p1"),
+        ("A", "p1"),
+        ("A", "p2"),
+        ("B", "p2"),
+    ]
+    assert flat_data[0][3] == []
+    assert flat_data[1][3] == ["Order"]
@@ -0,0 +1,104 @@
+import os
+
+import duckdb
+import pandas as pd
+import pytest
+
+from prototypes.draft.mining_cache import (
+    MiningResultCache,
+    cache_key,
+    fingerprint_dataframe,
+    fingerprint_duckdb_table,
+)
+
+
+@pytest.fixture
+def episodes():
+    return [
+        {
+            "PatternID": 1,
+            "Episode": [
+                {"activity": ["A"], "objects": ["Order"]},
+                {"activity": ["B", "C"], "objects": []},
+            ],
+            "Support": 3,
+        },
+        {
+            "PatternID": 2,
+            "Episode": [{"activity": ["B"], "objects": ["Item"]}],
+            "Support": 2,
+        },
+    ]
+
+
+def test_cache_key_depends_on_data_and_parameters():
+    key = cache_key("abc", minsup=2, maxwin=3)
+
+    assert key == cache_key("abc", maxwin=3, minsup=2)
+    assert key != cache_key("abd", minsup=2, maxwin=3)
+    assert key != cache_key("abc", minsup=3, maxwin=3)
+    assert key != cache_key("abc", minsup=2, maxwin="3")
+
+
+def test_fingerprint_dataframe():
+    df = pd.DataFrame({"EventName": ["A", "B"], "Order_ID": ["o1", None]})
+
+    assert fingerprint_dataframe(df) == fingerprint_dataframe(df.copy())
+    changed = df.copy()
+    changed.loc[1, "Order_ID"] = "o2"
+    assert fingerprint_dataframe(df) != fingerprint_dataframe(changed)
+
+
+def test_fingerprint_duckdb_table_ignores_row_order():
+    connection = duckdb.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE el_combined_eventlog AS SELECT * FROM (VALUES "
+        "('e1', 'A', 'o1'), ('e2', 'B', NULL)) t(EventID, EventName, Order_ID)"
+    )
+    fingerprint = fingerprint_duckdb_table(connection)
+
+    connection.execute(
+        "CREATE OR REPLACE TABLE el_combined_eventlog AS "
+        "SELECT * FROM el_combined_eventlog ORDER BY EventID DESC"
+    )
+    assert fingerprint_duckdb_table(connection) == fingerprint
+
+    connection.execute("UPDATE el_combined_eventlog SET Order_ID = 'o2'")
+    assert fingerprint_duckdb_table(connection) != fingerprint
+
+
+def test_cache_roundtrip(tmp_path, episodes):
+    cache = MiningResultCache(tmp_path)
+
+    assert cache.get("key") is None
+    cache.put("key", episodes)
+    assert MiningResultCache(tmp_path).get("key") == episodes
+
+
+def test_get_or_compute_only_computes_once(tmp_path, episodes):
+    cache = MiningResultCache(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return episodes
+
+    assert cache.get_or_compute("key", compute) == episodes
+    assert cache.get_or_compute("key", compute) == episodes
+    assert len(calls) == 1
+
+
+def test_evicts_least_recently_used(tmp_path, episodes):
+    cache = MiningResultCache(tmp_path)
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.put(key, episodes)
+        os.utime(tmp_path / f"{key}.parquet", (i, i))
+    cache.get("used")
+
+    cache.max_bytes = 2 * (tmp_path / "new.parquet").stat().st_size
+    cache.evict()
+
+    assert sorted(path.stem for path in tmp_path.glob("*.parquet")) == [
+        "new",
+        "used",
+    ]
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from algorithms.emma.phase3_episode_mining import run_emma_per_trace
+from prototypes.draft.mining_jobs import MiningCancelled, MiningJobRunner
+
+FLAT_DATA = [
+    (1, "A", "p1", ["Order"]),
+    (2, "B", "p1", ["Order"]),
+    (1, "A", "p2", ["Order"]),
+    (2, "B", "p2", ["Order"]),
+    (1, "A", "p3", ["Order"]),
+]
+
+
+@pytest.fixture
+def runner():
+    return MiningJobRunner(max_workers=1)
+
+
+def test_job_reports_progress_and_result(runner):
+    job = runner.submit(
+        lambda on_progress: run_emma_per_trace(FLAT_DATA, 2, 3, on_progress),
+        total_traces=3,
+    )
+
+    episodes = job.result()
+
+    assert job.done()
+    assert {ep["Support"] for ep in episodes} == {2}
+    assert job.traces_done == 3
+    assert job.episodes_found >= len(episodes)
+    assert job.progress == 1.0
+
+
+def test_job_can_be_cancelled(runner):
+    started = threading.Event()
+
+    def mine(on_progress):
+        started.set()
+        while True:
+            on_progress(0, 0)
+
+    job = runner.submit(mine)
+    started.wait(timeout=5)
+    job.cancel()
+
+    with pytest.raises(MiningCancelled, match="cancelled"):
+        job.result(timeout=5)
+
+
+def test_job_stops_after_time_budget(runner):
+    def mine(on_progress):
+        while True:
+            on_progress(0, 0)
+
+    job = runner.submit(mine, time_budget=0.01)
+
+    with pytest.raises(MiningCancelled, match="time budget"):
+        job.result(timeout=5)
+    assert job.progress is None
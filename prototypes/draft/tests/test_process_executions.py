@@ -0,0 +1,447 @@
+import random
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from prototypes.draft import process_executions
+from prototypes.draft.process_executions import (
+    assign_process_execution_ids,
+    build_combined_eventlog_in_duckdb,
+    combined_eventlog_table_name,
+    connected_object_components,
+    isolated_process_execution_id,
+    linking_object_columns,
+    object_occurrences,
+    process_execution_size_distribution,
+    stable_process_execution_id,
+)
+
+
+@pytest.fixture
+def combined_eventlog():
+    return pd.DataFrame(
+        {
+            "EventID": ["e1", "e2", "e3", "e4", "e5"],
+            "Order_ID": ["o1", "", "o2", "o1", ""],
+            "Item_ID": ["i1", "i1", "i2", "", ""],
+            "Delivery_ID": ["", "d1", "", "", ""],
+        }
+    )
+
+
+def groups(pids):
+    return pd.factorize(pids)[0].tolist()
+
+
+def reference_components(combined_eventlog, object_columns):
+    # Naive fixpoint merging of object sets, used as ground truth
+    components = []
+    for _, row in combined_eventlog[object_columns].iterrows():
+        objects = {str(v) for v in row if pd.notna(v) and v != ""}
+        if not objects:
+            continue
+        overlapping = [c for c in components if c & objects]
+        for component in overlapping:
+            components.remove(component)
+            objects |= component
+        components.append(objects)
+    return components
+
+
+def test_object_occurrences(combined_eventlog):
+    rows, object_codes, object_ids = object_occurrences(
+        combined_eventlog, ["Order_ID", "Item_ID", "Delivery_ID"]
+    )
+    assert rows.tolist() == [0, 0, 1, 1, 2, 2, 3]
+    assert object_ids.tolist() == ["d1", "i1", "i2", "o1", "o2"]
+    assert object_ids[object_codes].tolist() == [
+        "o1",
+        "i1",
+        "i1",
+        "d1",
+        "o2",
+        "i2",
+        "o1",
+    ]
+
+
+def test_connected_object_components(combined_eventlog):
+    rows, object_codes, object_ids = object_occurrences(
+        combined_eventlog, ["Order_ID", "Item_ID", "Delivery_ID"]
+    )
+    labels = connected_object_components(rows, object_codes, len(object_ids))
+    by_id = dict(zip(object_ids, labels))
+
+    assert by_id["o1"] == by_id["i1"] == by_id["d1"]
+    assert by_id["o2"] == by_id["i2"]
+    assert by_id["o1"] != by_id["o2"]
+    # Labels are the smallest member of each component
+    assert object_ids[by_id["o1"]] == "d1"
+
+
+def test_assign_process_execution_ids(combined_eventlog):
+    pids = assign_process_execution_ids(
+        combined_eventlog, ["Order_ID", "Item_ID", "Delivery_ID"]
+    )
+    assert groups(pids) == [0, 0, 1, 0, 2]
+    # Named after the smallest object of the component
+    assert pids.iloc[0] == stable_process_execution_id("d1")
+    # e5 has no objects and gets an isolated process execution
+    assert pids.iloc[4].startswith("p_iso_")
+
+
+def test_assign_process_execution_ids_matches_reference():
+    rng = random.Random(0)
+    object_columns = ["A_ID", "B_ID", "C_ID"]
+    combined_eventlog = pd.DataFrame(
+        {
+            col: [
+                rng.choice([""] * 3 + [f"{col}{rng.randrange(40)}"]) for _ in range(300)
+            ]
+            for col in object_columns
+        }
+    )
+    pids = assign_process_execution_ids(combined_eventlog, object_columns)
+
+    for component in reference_components(combined_eventlog, object_columns):
+        in_component = combined_eventlog[object_columns].isin(component).any(axis=1)
+        assert pids[in_component].nunique() == 1
+    non_isolated = pids[~pids.str.startswith("p_iso_")]
+    assert non_isolated.nunique() == len(
+        reference_components(combined_eventlog, object_columns)
+    )
+
+
+def test_connected_object_components_without_objects():
+    empty = np.array([], dtype=np.int64)
+    assert connected_object_components(empty, empty, 0).tolist() == []
+
+
+@pytest.fixture
+def duckdb_event_tables():
+    connection = duckdb.connect(database=":memory:")
+    connection.execute("""CREATE TABLE e_celonis_CreateOrder AS SELECT * FROM (VALUES
+            ('e1', TIMESTAMP '2023-01-01 10:00:00', 'o1'),
+            ('e2', TIMESTAMP '2023-01-01 11:00:00', 'o2')
+        ) t(ID, Time, Order_ID)""")
+    connection.execute("""CREATE TABLE e_celonis_PickItem AS SELECT * FROM (VALUES
+            ('e3', TIMESTAMP '2023-01-01 12:00:00', 'o1', 'i1'),
+            ('e4', TIMESTAMP '2023-01-01 13:00:00', 'o2', 'i2'),
+            ('e5', TIMESTAMP '2023-01-01 14:00:00', NULL, 'i1')
+        ) t(ID, Time, Order_ID, Item_ID)""")
+    connection.execute("""CREATE TABLE e_celonis_Ping AS SELECT * FROM (VALUES
+            ('e6', TIMESTAMP '2023-01-01 15:00:00')
+        ) t(ID, Time)""")
+    return connection
+
+
+def test_build_combined_eventlog_in_duckdb(duckdb_event_tables):
+    object_columns = build_combined_eventlog_in_duckdb(
+        duckdb_event_tables,
+        ["e_celonis_CreateOrder", "e_celonis_PickItem", "e_celonis_Ping"],
+    )
+    result = duckdb_event_tables.execute(
+        "SELECT * FROM el_combined_eventlog"
+    ).fetch_df()
+
+    assert object_columns == ["Item_ID", "Order_ID"]
+    assert result.columns.tolist() == [
+        "EventID",
+        "Process_Execution_ID",
+        "Timestamp",
+        "EventName",
+        "Item_ID",
+        "Order_ID",
+    ]
+    assert result["EventID"].tolist() == ["e1", "e2", "e3", "e4", "e5", "e6"]
+    assert result["EventName"].tolist()[:3] == [
+        "CreateOrder",
+        "CreateOrder",
+        "PickItem",
+    ]
+    assert result["Process_Execution_ID"].tolist() == [
+        stable_process_execution_id("i1"),
+        stable_process_execution_id("i2"),
+        stable_process_execution_id("i1"),
+        stable_process_execution_id("i2"),
+        stable_process_execution_id("i1"),
+        isolated_process_execution_id("Ping", "e6"),
+    ]
+    # Temporary tables are cleaned up
+    tables = {row[0] for row in duckdb_event_tables.execute("SHOW TABLES").fetchall()}
+    assert not any(table.startswith("_el_") for table in tables)
+
+
+def test_build_combined_eventlog_in_duckdb_matches_numpy_path():
+    rng = random.Random(1)
+    connection = duckdb.connect(database=":memory:")
+    rows = [
+        (
+            f"e{i}",
+            i,
+            f"A{rng.randrange(60)}",
+            rng.choice([None, f"B{rng.randrange(60)}"]),
+        )
+        for i in range(400)
+    ]
+    connection.execute(
+        "CREATE TABLE e_celonis_X (ID VARCHAR, Time BIGINT, A_ID VARCHAR, B_ID VARCHAR)"
+    )
+    connection.executemany("INSERT INTO e_celonis_X VALUES (?, ?, ?, ?)", rows)
+
+    build_combined_eventlog_in_duckdb(connection, ["e_celonis_X"])
+    in_duckdb = connection.execute(
+        "SELECT Process_Execution_ID FROM el_combined_eventlog ORDER BY Timestamp"
+    ).fetch_df()["Process_Execution_ID"]
+    in_numpy = assign_process_execution_ids(
+        pd.DataFrame(rows, columns=["ID", "Time", "A_ID", "B_ID"]), ["A_ID", "B_ID"]
+    )
+
+    assert in_duckdb.tolist() == in_numpy.tolist()
+
+
+@pytest.fixture
+def shared_plant_eventlog():
+    # Every order is produced in plant P, which would merge all orders
+    return pd.DataFrame(
+        {
+            "ID": ["e1", "e2", "e3", "e4", "e5"],
+            "Time": [1, 2, 3, 4, 5],
+            "Order_ID": ["o1", "o2", "o1", None, None],
+            "Plant_ID": ["P", "P", None, None, "P"],
+            "Item_ID": [None, None, "i1", "i2", None],
+        }
+    )
+
+
+OBJECT_COLUMNS = ["Item_ID", "Order_ID", "Plant_ID"]
+
+
+def test_linking_object_columns():
+    assert linking_object_columns(OBJECT_COLUMNS) == (OBJECT_COLUMNS, None)
+    assert linking_object_columns(OBJECT_COLUMNS, ["Plant", "Item_ID"]) == (
+        ["Order_ID"],
+        None,
+    )
+    assert linking_object_columns(OBJECT_COLUMNS, leading_object_type="Order") == (
+        OBJECT_COLUMNS,
+        "Order_ID",
+    )
+    with pytest.raises(ValueError):
+        linking_object_columns(OBJECT_COLUMNS, ["Order"], "Order")
+
+
+def test_assign_process_execution_ids_object_type_options(shared_plant_eventlog):
+    pids = assign_process_execution_ids(shared_plant_eventlog, OBJECT_COLUMNS)
+    assert groups(pids) == [0, 0, 0, 1, 0]
+
+    pids = assign_process_execution_ids(
+        shared_plant_eventlog, OBJECT_COLUMNS, excluded_object_types=["Plant"]
+    )
+    assert groups(pids) == [0, 1, 0, 2, 3]
+    assert pids.iloc[4].startswith("p_iso_")
+
+    pids = assign_process_execution_ids(
+        shared_plant_eventlog, OBJECT_COLUMNS, leading_object_type="Order"
+    )
+    # e5 is attached to o1 via the plant, e4's item never occurs with an order
+    assert groups(pids) == [0, 1, 0, 2, 0]
+    assert pids.iloc[3].startswith("p_iso_")
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"excluded_object_types": ["Plant"]},
+        {"leading_object_type": "Order"},
+        {"leading_object_type": "Item"},
+    ],
+)
+def test_object_type_options_match_in_duckdb(shared_plant_eventlog, options):
+    connection = duckdb.connect(database=":memory:")
+    connection.register("events", shared_plant_eventlog)
+    connection.execute("CREATE TABLE e_celonis_X AS SELECT * FROM events")
+
+    build_combined_eventlog_in_duckdb(connection, ["e_celonis_X"], **options)
+    in_duckdb = connection.execute(
+        "SELECT Process_Execution_ID FROM el_combined_eventlog ORDER BY Timestamp"
+    ).fetch_df()["Process_Execution_ID"]
+    in_numpy = assign_process_execution_ids(
+        shared_plant_eventlog, OBJECT_COLUMNS, **options
+    )
+
+    for pid_duckdb, pid_numpy in zip(in_duckdb, in_numpy):
+        if pid_numpy.startswith("p_iso_"):
+            assert pid_duckdb.startswith("p_iso_")
+        else:
+            assert pid_duckdb == pid_numpy
+
+
+def test_process_execution_size_distribution(duckdb_event_tables):
+    build_combined_eventlog_in_duckdb(
+        duckdb_event_tables,
+        ["e_celonis_CreateOrder", "e_celonis_PickItem", "e_celonis_Ping"],
+    )
+    distribution = process_execution_size_distribution(duckdb_event_tables)
+
+    assert distribution["Min Size"].tolist() == [1]
+    assert distribution["Process Executions"].tolist() == [3]
+    assert distribution["Events"].tolist() == [6]
+    assert distribution["Largest"].tolist() == [3]
+    assert distribution["Share of Events"].tolist() == [1.0]
+
+
+def combined_pids(connection):
+    return dict(
+        connection.execute(
+            "SELECT EventID, Process_Execution_ID FROM el_combined_eventlog"
+        ).fetchall()
+    )
+
+
+def test_process_execution_ids_are_stable_across_reloads(duckdb_event_tables):
+    tables = ["e_celonis_CreateOrder", "e_celonis_PickItem", "e_celonis_Ping"]
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables, incremental=False)
+    first = combined_pids(duckdb_event_tables)
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables, incremental=False)
+
+    assert combined_pids(duckdb_event_tables) == first
+
+
+def test_build_combined_eventlog_in_duckdb_incremental(duckdb_event_tables):
+    tables = ["e_celonis_CreateOrder", "e_celonis_PickItem", "e_celonis_Ping"]
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+    before = combined_pids(duckdb_event_tables)
+
+    # e7 extends o1's execution, e8 starts a new one
+    duckdb_event_tables.execute("""INSERT INTO e_celonis_PickItem VALUES
+            ('e7', TIMESTAMP '2023-01-02 10:00:00', 'o1', 'i3'),
+            ('e8', TIMESTAMP '2023-01-02 11:00:00', 'o3', 'i4')""")
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+    after = combined_pids(duckdb_event_tables)
+
+    assert {k: after[k] for k in before} == before
+    assert after["e7"] == before["e1"]
+    assert after["e8"] == stable_process_execution_id("i4")
+    (components,) = duckdb_event_tables.execute(
+        "SELECT COUNT(*) FROM el_combined_eventlog_components"
+    ).fetchone()
+    assert components == 7
+
+    # e9 connects the executions of o1 and o2, which keep the smaller label
+    duckdb_event_tables.execute("""INSERT INTO e_celonis_PickItem VALUES
+            ('e9', TIMESTAMP '2023-01-02 12:00:00', 'o2', 'i1')""")
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+    incremental = combined_pids(duckdb_event_tables)
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables, incremental=False)
+
+    assert incremental == combined_pids(duckdb_event_tables)
+    assert incremental["e2"] == incremental["e1"] == before["e1"]
+
+    # e10 moves the merged execution (label i1) to the smaller label '0'; e11 only
+    # reaches it through the persisted component, whose label object is untouched
+    duckdb_event_tables.execute("""INSERT INTO e_celonis_PickItem VALUES
+            ('e10', TIMESTAMP '2023-01-02 13:00:00', '0', 'i2'),
+            ('e11', TIMESTAMP '2023-01-02 14:00:00', 'o2', NULL)""")
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+    incremental = combined_pids(duckdb_event_tables)
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables, incremental=False)
+
+    assert incremental == combined_pids(duckdb_event_tables)
+    assert incremental["e11"] == incremental["e1"] == stable_process_execution_id("0")
+
+    # e8 is updated in place and now belongs to o1's execution
+    duckdb_event_tables.execute("""UPDATE e_celonis_PickItem
+        SET Time = TIMESTAMP '2023-01-03 10:00:00', Order_ID = 'o1'
+        WHERE ID = 'e8'""")
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+    incremental = combined_pids(duckdb_event_tables)
+    timestamp, order_id = duckdb_event_tables.execute(
+        "SELECT Timestamp, Order_ID FROM el_combined_eventlog WHERE EventID = 'e8'"
+    ).fetchone()
+
+    assert str(timestamp) == "2023-01-03 10:00:00" and order_id == "o1"
+    assert incremental["e8"] == incremental["e1"]
+
+
+def test_failed_incremental_update_is_rolled_back(duckdb_event_tables, monkeypatch):
+    tables = ["e_celonis_CreateOrder", "e_celonis_PickItem", "e_celonis_Ping"]
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+    before = combined_pids(duckdb_event_tables)
+    components = duckdb_event_tables.execute(
+        "SELECT * FROM el_combined_eventlog_components ORDER BY ObjectID"
+    ).fetchall()
+
+    def failing_merge(connection, *args):
+        connection.execute("UPDATE el_combined_eventlog_components SET Label = 'x'")
+        connection.execute("DELETE FROM el_combined_eventlog")
+        raise duckdb.TransactionException("Conflict on update")
+
+    monkeypatch.setattr(process_executions, "_merge_new_events", failing_merge)
+    duckdb_event_tables.execute("""INSERT INTO e_celonis_PickItem VALUES
+            ('e7', TIMESTAMP '2023-01-02 10:00:00', 'o1', 'i3')""")
+    with pytest.raises(duckdb.TransactionException):
+        build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+
+    assert combined_pids(duckdb_event_tables) == before
+    assert (
+        duckdb_event_tables.execute(
+            "SELECT * FROM el_combined_eventlog_components ORDER BY ObjectID"
+        ).fetchall()
+        == components
+    )
+    (temp_tables,) = duckdb_event_tables.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE temporary"
+    ).fetchone()
+    assert temp_tables == 0
+
+
+def test_logs_with_different_settings_coexist(duckdb_event_tables):
+    tables = ["e_celonis_CreateOrder", "e_celonis_PickItem", "e_celonis_Ping"]
+    leading_table = combined_eventlog_table_name(leading_object_type="Item")
+
+    assert combined_eventlog_table_name() == "el_combined_eventlog"
+    assert combined_eventlog_table_name(["Item", "Order"]) == (
+        combined_eventlog_table_name(["Order", "Item"])
+    )
+    assert leading_table != combined_eventlog_table_name(["Item"])
+
+    build_combined_eventlog_in_duckdb(duckdb_event_tables, tables)
+    before = combined_pids(duckdb_event_tables)
+    build_combined_eventlog_in_duckdb(
+        duckdb_event_tables,
+        tables,
+        table_name=leading_table,
+        leading_object_type="Item",
+    )
+
+    assert combined_pids(duckdb_event_tables) == before
+    (leading_events,) = duckdb_event_tables.execute(
+        f"SELECT COUNT(*) FROM {leading_table}"
+    ).fetchone()
+    assert leading_events == len(before)
+
+
+def test_build_without_new_events_writes_nothing(duckdb_event_tables):
+    tables = ["e_celonis_CreateOrder", "e_celonis_PickItem", "e_celonis_Ping"]
+    build_combined_eventlog_in_duckdb(
+        duckdb_event_tables, tables, leading_object_type="Item"
+    )
+    # Marks the log, a rebuild would replace the marker
+    duckdb_event_tables.execute(
+        "UPDATE el_combined_eventlog SET Process_Execution_ID = 'marker' "
+        "WHERE EventID = 'e1'"
+    )
+
+    build_combined_eventlog_in_duckdb(
+        duckdb_event_tables, tables, leading_object_type="Item"
+    )
+
+    (marked,) = duckdb_event_tables.execute(
+        "SELECT COUNT(*) FROM el_combined_eventlog "
+        "WHERE Process_Execution_ID = 'marker'"
+    ).fetchone()
+    assert marked == 1